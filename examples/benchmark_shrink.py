@@ -0,0 +1,127 @@
+"""
+benchmark_shrink
+~~~~~~~~~~~~~~~~
+
+Compare :func:`imgfilt.filter_shrink` to shrinking with several
+passes of :func:`imgfilt.filter_grow`.
+"""
+from argparse import ArgumentParser
+from time import perf_counter
+from typing import Callable
+
+import numpy as np
+
+import imgfilt as ift
+
+
+# Types.
+ImgAry = np.ndarray
+
+
+# Shrinking methods.
+# Only the frames are being shrunk, not the length of the video, so
+# filter_grow is used on each frame on its own.
+def grow_passes(a: ImgAry, factor: float, step: float = 0.75) -> ImgAry:
+    """Shrink with passes of :func:`imgfilt.filter_grow` that are no
+    smaller than the given step, as its documentation suggests.
+    """
+    frames = []
+    for frame in a:
+        target = tuple(int(n * factor) for n in frame.shape)
+        while True:
+            scale = max(step, *(t / n for t, n in zip(target, frame.shape)))
+            frame = ift.filter_grow(frame, scale)
+            if scale > step:
+                break
+        frames.append(frame)
+    return np.array(frames)
+
+
+def grow_once(a: ImgAry, factor: float) -> ImgAry:
+    """Shrink with one pass of :func:`imgfilt.filter_grow`."""
+    return np.array([ift.filter_grow(frame, factor) for frame in a])
+
+
+def shrink(a: ImgAry, factor: float) -> ImgAry:
+    """Shrink with :func:`imgfilt.filter_shrink`."""
+    return ift.filter_shrink(a, factor)
+
+
+# Measurement.
+def block_mean(a: ImgAry, factor: float) -> ImgAry:
+    """Average blocks of pixels, which is the best possible result
+    for factors that divide the image evenly.
+    """
+    n = round(1 / factor)
+    z, y, x = a.shape
+    blocks = a[:, :y - y % n, :x - x % n].reshape(z, y // n, n, x // n, n)
+    return blocks.mean(axis=(2, 4))
+
+
+def measure(
+    method: Callable, a: ImgAry, factor: float, repeat: int
+) -> tuple[float, float]:
+    """Time the method and find its error against the block mean."""
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        result = method(a, factor)
+        times.append(perf_counter() - start)
+    expected = block_mean(a, factor)
+    y, x = (min(r, e) for r, e in zip(result.shape[1:], expected.shape[1:]))
+    error = np.abs(result[:, :y, :x] - expected[:, :y, :x]).mean()
+    return min(times), error
+
+
+def main(size: tuple[int, int, int], factors: list[float], repeat: int):
+    """Print a table comparing the shrinking methods."""
+    rng = np.random.default_rng(0)
+    a = rng.random(size)
+    methods = [shrink, grow_once, grow_passes]
+    print(f'Shrinking {size[0]} frames of {size[2]}x{size[1]}.')
+    print(f'{"factor":>8} {"method":>12} {"seconds":>10} {"error":>10}')
+    for factor in factors:
+        for method in methods:
+            seconds, error = measure(method, a, factor, repeat)
+            name = method.__name__
+            print(f'{factor:>8} {name:>12} {seconds:>10.4f} {error:>10.4f}')
+
+
+# Mainline.
+if __name__ == '__main__':
+    p = ArgumentParser(
+        description='Benchmark shrinking image data with imgfilt.',
+        prog='benchmark_shrink'
+    )
+    p.add_argument(
+        '--factors', '-f',
+        action='store',
+        default=[0.5, 0.25, 0.125],
+        help='The scaling factors to test.',
+        nargs='+',
+        type=float
+    )
+    p.add_argument(
+        '--repeat', '-r',
+        action='store',
+        default=3,
+        help='How many times to run each test.',
+        type=int
+    )
+    p.add_argument(
+        '--size', '-s',
+        action='store',
+        default=(1920, 1080),
+        help='The width and height of the frames.',
+        nargs=2,
+        type=int
+    )
+    p.add_argument(
+        '--frames', '-z',
+        action='store',
+        default=4,
+        help='The number of frames in the video.',
+        type=int
+    )
+    args = p.parse_args()
+    main((args.frames, args.size[1], args.size[0]), args.factors, args.repeat)
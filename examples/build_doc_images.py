@@ -14,6 +14,7 @@ import imgwriter as iw
 import numpy as np
 
 import imgfilt as ift
+from imgfilt.lazy import lazy
 
 
 # Constants.
@@ -49,17 +50,24 @@ def make_image(
     color: bool = False
 ) -> ig.ImgAry:
     """Make an example image for a filter."""
-    # Filter the image data.
-    filtered = filter(a, **kwargs)
-    
+    # Filter the image data. Only the bottom half of the filtered data
+    # is used, so the filter is set up lazily to only compute that half
+    # when it can.
+    node = lazy(a).filter(filter, **kwargs)
+    if color:
+        a = ift.filter_colorize(a)
+
+    # Replace the bottom half of the image data with the filtered data.
+    midheight = size[Y] // 2
+    if node.shape == a.shape:
+        a[:, midheight:, :] = node[:, midheight:, :].compute()
+
     # Because we are putting the filtered data back into the bottom half
     # of the original data, work needs to be done to make sure the shape
     # of the filtered data matches the shape of the bottom half of the
     # original data.
-    if color:
-        a = ift.filter_colorize(a)
-        
-    if filtered.shape != a.shape and not color:
+    else:
+        filtered = node.compute()
         mshape = tuple(max(a, b) for a, b in zip(a.shape, filtered.shape))
         m = np.zeros(mshape, dtype=filtered.dtype)
         mstarts = [(mn - fn) // 2 for mn, fn in zip(mshape, filtered.shape)]
@@ -72,10 +80,7 @@ def make_image(
         filtered = m[
             fstarts[Z]:fstops[Z], fstarts[Y]:fstops[Y], fstarts[X]:fstops[X]
         ]
-    
-    # Replace the bottom half of the image data with the filtered data.
-    midheight = size[Y] // 2
-    a[:, midheight:, :] = filtered[:, midheight:, :]
+        a[:, midheight:, :] = filtered[:, midheight:, :]
     
     # Add the label.
     label, ystart, ystop = make_label(size)
@@ -4,11 +4,16 @@ __init__
 
 Initialization for the imgfilt module.
 """
+from types import MappingProxyType
+
 from imgfilt import imgfilt
 from imgfilt.imgfilt import *
+from imgfilt.pipeline import IncrementalPipeline, Pipeline, Step
+from imgfilt.settings import configure, get_settings, override
 from imgfilt.utility import get_prefixed_functions
 
 
 # Create a dictionary to allow easier discovery and validation of
-# the filters available in the module.
-filters = get_prefixed_functions('filter_', imgfilt)
+# the filters available in the module. It is read only, so it can be
+# shared between threads.
+filters = MappingProxyType(get_prefixed_functions('filter_', imgfilt))
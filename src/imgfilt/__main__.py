@@ -0,0 +1,103 @@
+"""
+__main__
+~~~~~~~~
+
+The command line interface for :mod:`imgfilt`.
+"""
+from argparse import ArgumentParser
+from typing import Optional, Sequence
+
+from imgfilt.batch import run_batch
+from imgfilt.pipeline import Pipeline
+
+
+def build_parser() -> ArgumentParser:
+    """Build the parser for the command line arguments."""
+    p = ArgumentParser(
+        prog='imgfilt',
+        description='Filter image data files.'
+    )
+    p.add_argument(
+        'pipeline',
+        help='A JSON or YAML file defining the filters to apply.',
+        action='store',
+        type=str
+    )
+    p.add_argument(
+        'inputs',
+        help='The files or directories to filter.',
+        action='store',
+        nargs='+',
+        type=str
+    )
+    p.add_argument(
+        '-o', '--output',
+        help='The directory to save the filtered files in.',
+        action='store',
+        required=True,
+        type=str
+    )
+    p.add_argument(
+        '-f', '--force',
+        help='Replace filtered files that already exist.',
+        action='store_true'
+    )
+    p.add_argument(
+        '-p', '--processes',
+        help='The number of worker processes to use.',
+        action='store',
+        type=int
+    )
+    p.add_argument(
+        '-m', '--max-pending',
+        help='The number of files that can be in flight at once.',
+        action='store',
+        type=int
+    )
+    p.add_argument(
+        '-s', '--suffix',
+        help='The file extension to use for the filtered files.',
+        action='store',
+        type=str
+    )
+    p.add_argument(
+        '-q', '--quiet',
+        help='Do not print the files as they are filtered.',
+        action='store_true'
+    )
+    return p
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Run the command line interface.
+
+    :param argv: (Optional.) The command line arguments. Defaults to
+        the arguments passed to the script.
+    :returns: `None`.
+    :rtype: NoneType
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        pipeline = Pipeline.load(args.pipeline)
+    except (OSError, ImportError, TypeError, ValueError) as ex:
+        parser.error(f'Could not load {args.pipeline}: {ex}')
+    try:
+        results = run_batch(
+            pipeline,
+            args.inputs,
+            args.output,
+            processes=args.processes,
+            max_pending=args.max_pending,
+            suffix=args.suffix,
+            overwrite=args.force
+        )
+    except (FileExistsError, ValueError) as ex:
+        parser.error(str(ex))
+    for src, dst in results:
+        if not args.quiet:
+            print(f'{src} -> {dst}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+"""
+autotune
+~~~~~~~~
+
+Find the fastest way to apply a filter to image data of a given shape
+and type on this machine.
+
+The filters can be applied in several ways that give the same result
+but take different amounts of time. Spreading frames across worker
+processes helps long videos, passing groups of frames as channels
+helps many small frames, and filling flat tiles helps large images
+with flat backgrounds. An :class:`Autotuner` times the ways that
+apply to a filter and some image data, remembers the fastest, and
+saves its choices to a file so later runs on the same machine start
+with them.
+
+Usage::
+
+    >>> import numpy as np
+    >>>
+    >>> tuner = Autotuner(path=None, processes=1)
+    >>> a = np.zeros((4, 16, 16))
+    >>> result = tuner('box_blur', a, size=3)
+    >>> tuner.tune('box_blur', a, size=3).name in ('frames', 'batch')
+    True
+"""
+import json
+import os
+import platform
+from pathlib import Path
+from threading import RLock
+from time import perf_counter
+from typing import Any, Callable, NamedTuple, Optional, Union
+
+import cv2
+import numpy as np
+from numpy.typing import NDArray
+
+from imgfilt import backends
+from imgfilt.pipeline import get_filter
+from imgfilt.settings import BACKENDS, get_settings, override
+from imgfilt.threads import get_policy
+from imgfilt.tiles import TiledEngine
+from imgfilt.utility import Filter, X, Y
+
+
+# Types.
+ImgAry = NDArray[np.float_]
+PathLike = Union[str, Path]
+
+
+# Constants.
+BATCH_SIZES = (8, 64)
+TILE_SIZES = (256, 1024)
+
+
+# Classes.
+class Strategy(NamedTuple):
+    """A way to apply a filter.
+
+    :param name: How the filter is applied. "frames" calls the filter,
+        "batch" passes groups of frames as channels, "processes"
+        spreads the frames across worker processes, and "tiles" uses
+        a :class:`imgfilt.tiles.TiledEngine`.
+    :param backend: (Optional.) The backend to use. See
+        :mod:`imgfilt.backends`.
+    :param batch: (Optional.) The number of frames in each group for
+        the "batch" strategy.
+    :param processes: (Optional.) The number of worker processes for
+        the "processes" strategy.
+    :param tile: (Optional.) The size of the tiles for the "tiles"
+        strategy.
+    """
+    name: str = 'frames'
+    backend: str = 'cv2'
+    batch: int = 0
+    processes: int = 0
+    tile: int = 0
+
+    def apply(self, filter: Filter, a: ImgAry, **kwargs: Any) -> ImgAry:
+        """Apply a filter to image data with this strategy.
+
+        :param filter: The filter to apply.
+        :param a: The image data to filter.
+        :param kwargs: The parameters to pass to the filter.
+        :returns: A :class:`numpy.ndarray` object.
+        :rtype: numpy.ndarray
+        """
+        with override(backend=self.backend):
+            if self.name == 'batch':
+                return filter(a, batch=self.batch, **kwargs)
+            if self.name == 'processes':
+                return filter(a, processes=self.processes, **kwargs)
+            if self.name == 'tiles':
+                return TiledEngine(self.tile).apply(filter, a, **kwargs)
+            return filter(a, **kwargs)
+
+
+class Autotuner:
+    """Choose the fastest :class:`Strategy` for applying a filter to
+    image data of a given shape and type, and apply the filter with
+    it.
+
+    The choices are saved to a JSON file under a fingerprint of the
+    machine, so choices made on one machine aren't used on another.
+
+    :param path: (Optional.) The file to save the choices in. Defaults
+        to "imgfilt/autotune.json" in the user's cache directory.
+        Passing `None` keeps the choices in memory.
+    :param repeat: (Optional.) How many times to time each strategy.
+        The fastest time is used.
+    :param processes: (Optional.) The most worker processes to try.
+        Defaults to the job's share of threads. See
+        :mod:`imgfilt.threads`.
+    :returns: A :class:`Autotuner` object.
+    :rtype: imgfilt.autotune.Autotuner
+    """
+    def __init__(
+        self,
+        path: Optional[PathLike] = '',
+        repeat: int = 3,
+        processes: Optional[int] = None
+    ) -> None:
+        if path == '':
+            path = _default_path()
+        self.path = None if path is None else Path(path)
+        self.repeat = repeat
+        if processes is None:
+            processes = get_policy().share
+        self.processes = processes
+        self.fingerprint = machine_fingerprint()
+        self.choices: dict[str, Strategy] = self._load()
+        self._lock = RLock()
+
+    def __repr__(self) -> str:
+        cls = type(self).__name__
+        return f'{cls}(path={self.path!r}, repeat={self.repeat})'
+
+    def __call__(self, name: str, a: ImgAry, **kwargs: Any) -> ImgAry:
+        """Apply a filter with the fastest strategy, tuning it first
+        if this shape and type of image data haven't been seen.
+
+        :param name: The name of the filter in :data:`imgfilt.filters`.
+        :param a: The image data to filter.
+        :param kwargs: The parameters to pass to the filter.
+        :returns: A :class:`numpy.ndarray` object.
+        :rtype: numpy.ndarray
+        """
+        strategy = self.tune(name, a, **kwargs)
+        return strategy.apply(get_filter(name), a, **kwargs)
+
+    def candidates(
+        self, name: str, a: ImgAry, **kwargs: Any
+    ) -> list[Strategy]:
+        """Find the strategies that can apply a filter to image data.
+
+        :param name: The name of the filter in :data:`imgfilt.filters`.
+        :param a: The image data to filter.
+        :param kwargs: The parameters to pass to the filter. Some
+            filters can pass fewer frames as channels with some
+            parameters or settings.
+        :returns: A :class:`list` object.
+        :rtype: list
+        """
+        fn = get_filter(name)
+        strategies = [Strategy()]
+        for backend in _fast_backends():
+            strategies.append(Strategy(backend=backend))
+
+        frames = a.shape[0] if a.ndim > 2 else 1
+        max_channels: Optional[Callable[..., int]]
+        max_channels = getattr(fn, 'max_channels', None)
+        if frames > 1 and max_channels is not None:
+            limit = min(frames, max_channels(**kwargs))
+            for size in BATCH_SIZES:
+                batch = min(size, limit)
+                if batch > 1:
+                    strategies.append(Strategy('batch', batch=batch))
+        if frames > 1 and getattr(fn, 'parallel', False):
+            counts = {2, 4, self.processes}
+            for count in sorted(counts):
+                if 1 < count <= min(frames, self.processes):
+                    strategies.append(Strategy('processes', processes=count))
+        if hasattr(fn, 'halo'):
+            for tile in TILE_SIZES:
+                if tile < max(a.shape[Y], a.shape[X]):
+                    strategies.append(Strategy('tiles', tile=tile))
+        return list(dict.fromkeys(strategies))
+
+    def clear(self) -> None:
+        """Forget the choices made on this machine."""
+        with self._lock:
+            self.choices = {}
+            self._save()
+
+    def tune(self, name: str, a: ImgAry, **kwargs: Any) -> Strategy:
+        """Find the fastest strategy for a filter, its parameters,
+        the shape and type of image data, and the current settings,
+        timing the strategies if they haven't been timed on this
+        machine. Strategies that fail are skipped, but the filter's
+        own errors are raised.
+
+        :param name: The name of the filter in :data:`imgfilt.filters`.
+        :param a: The image data to filter.
+        :param kwargs: The parameters to pass to the filter.
+        :returns: A :class:`Strategy` object.
+        :rtype: imgfilt.autotune.Strategy
+        """
+        # Only one thread times strategies at a time, since timing
+        # them at the same time would make the times meaningless.
+        key = _key(name, a, kwargs)
+        with self._lock:
+            if key not in self.choices:
+                fn = get_filter(name)
+                default, *others = self.candidates(name, a, **kwargs)
+                times = {default: self._time(default, fn, a, kwargs)}
+                for strategy in others:
+                    try:
+                        times[strategy] = self._time(strategy, fn, a, kwargs)
+                    except Exception:
+                        continue
+                self.choices[key] = min(times, key=times.__getitem__)
+                self._save()
+            return self.choices[key]
+
+    def _load(self) -> dict[str, Strategy]:
+        """Load the choices made on this machine."""
+        if self.path is None or not self.path.exists():
+            return {}
+        try:
+            saved = json.loads(self.path.read_text())
+            choices = saved.get(self.fingerprint, {})
+            return {k: Strategy(**v) for k, v in choices.items()}
+        except (AttributeError, OSError, TypeError, ValueError):
+            return {}
+
+    def _save(self) -> None:
+        """Save the choices made on this machine, keeping the choices
+        made on other machines.
+        """
+        if self.path is None:
+            return
+        saved = {}
+        if self.path.exists():
+            try:
+                saved = json.loads(self.path.read_text())
+            except (OSError, ValueError):
+                saved = {}
+        saved[self.fingerprint] = {
+            key: strategy._asdict() for key, strategy in self.choices.items()
+        }
+
+        # Write to a temporary file and move it into place, so other
+        # processes never read a partly written file.
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        temp.write_text(json.dumps(saved, indent=2, sort_keys=True))
+        os.replace(temp, self.path)
+
+    def _time(
+        self, strategy: Strategy, fn: Filter, a: ImgAry, kwargs: dict
+    ) -> float:
+        """Find the fastest time of a strategy."""
+        times = []
+        for _ in range(self.repeat):
+            start = perf_counter()
+            strategy.apply(fn, a, **kwargs)
+            times.append(perf_counter() - start)
+        return min(times)
+
+
+# Functions.
+def machine_fingerprint() -> str:
+    """Describe the machine and the libraries that affect how fast
+    the filters are.
+
+    :returns: A :class:`str` object.
+    :rtype: str
+    """
+    return '|'.join((
+        platform.machine(),
+        platform.processor() or platform.system(),
+        f'cpus={os.cpu_count()}',
+        f'python={platform.python_version()}',
+        f'numpy={np.__version__}',
+        f'cv2={cv2.__version__}',
+    ))
+
+
+# Utility functions.
+def _default_path() -> Path:
+    """Find the default file to save choices in."""
+    cache = os.environ.get('XDG_CACHE_HOME', '') or Path.home() / '.cache'
+    return Path(cache) / 'imgfilt' / 'autotune.json'
+
+
+def _fast_backends() -> list[str]:
+    """Find the installed backends other than OpenCV that are meant
+    to be fast.
+    """
+    installed: set[str] = set()
+    for operation in ('box', 'convolve', 'gaussian', 'remap'):
+        installed.update(backends.implementations(operation))
+    return [name for name in BACKENDS if name in installed - {'cv2', 'numpy'}]
+
+
+def _key(name: str, a: ImgAry, kwargs: dict[str, Any]) -> str:
+    """Describe the filter, its parameters, the shape and type of
+    image data, and the current settings.
+    """
+    shape = 'x'.join(str(n) for n in a.shape)
+    params = ','.join(f'{k}={v!r}' for k, v in sorted(kwargs.items()))
+    current = get_settings()._asdict()
+    settings = ','.join(f'{k}={v!r}' for k, v in current.items())
+    return f'{name}:{shape}:{a.dtype}:{params}:{settings}'
@@ -0,0 +1,462 @@
+"""
+backends
+~~~~~~~~
+
+Interchangeable implementations of the operations the filters are
+built from.
+
+Each operation, such as convolving a frame with a kernel, can have an
+implementation for each backend. The operations are convolving,
+gaussian and box blurs, and remapping, which are what the blurs and
+the distortions built on coordinate maps spend their time in. Filters
+that use other libraries, such as :func:`imgfilt.filter_colorize`
+with Pillow or :func:`imgfilt.filter_twirl` with scikit-image, or
+that are simple NumPy arithmetic, such as :func:`imgfilt.filter_contrast`
+and :func:`imgfilt.filter_grow`, don't use the backends.
+
+*   "cv2" uses OpenCV. It is the default and the fastest for most
+    operations.
+*   "numpy" uses only NumPy. It is slow, but simple enough to check
+    the other backends against.
+*   "numba" compiles loops with Numba, if it is installed.
+
+The backend is chosen with the `backend` setting, see
+:mod:`imgfilt.settings`, or for one call by passing `backend` to a
+filter that works one frame at a time. Choosing a backend that isn't
+installed raises a :class:`ValueError`. Operations that don't have an
+implementation for the chosen backend use OpenCV, as do remaps the
+NumPy and Numba backends can't do, such as cubic and Lanczos
+interpolation or borders other than a constant.
+
+Usage::
+
+    >>> import numpy as np
+    >>> from imgfilt import override
+    >>>
+    >>> a = np.zeros((1, 5))
+    >>> a[0, 2] = 0.9
+    >>> kernel = np.full((1, 3), 1 / 3)
+    >>> with override(backend='numpy'):
+    ...     convolve(a, kernel)
+    array([[0. , 0.3, 0.3, 0.3, 0. ]])
+"""
+from threading import Lock
+from types import MappingProxyType
+from typing import Callable, Mapping, Optional
+
+import cv2
+import numpy as np
+from numpy.typing import NDArray
+
+from imgfilt.settings import get_settings
+
+
+# Types.
+ImgAry = NDArray[np.float_]
+Operation = Callable
+
+
+# Optional dependencies.
+try:
+    import numba
+except ImportError:                                     # pragma: no cover
+    numba = None
+
+
+# Registry.
+# The implementations of each operation, keyed by operation and then
+# by backend. It is never changed in place. Registering replaces it
+# with an updated copy, so it can be read from any thread without a
+# lock.
+_implementations: Mapping[str, Mapping[str, Operation]]
+_implementations = MappingProxyType({})
+_lock = Lock()
+
+
+def register(
+    operation: str, backend: str
+) -> Callable[[Operation], Operation]:
+    """Register an implementation of an operation for a backend.
+
+    :param operation: The name of the operation.
+    :param backend: The name of the backend.
+    :return: The decorator.
+    :rtype: Callable
+    """
+    def decorator(fn: Operation) -> Operation:
+        global _implementations
+        with _lock:
+            updated = dict(_implementations)
+            by_backend = {**updated.get(operation, {}), backend: fn}
+            updated[operation] = MappingProxyType(by_backend)
+            _implementations = MappingProxyType(updated)
+        return fn
+    return decorator
+
+
+def get_implementation(
+    operation: str, backend: Optional[str] = None
+) -> Operation:
+    """Get the implementation of an operation for a backend. If the
+    operation doesn't have one, the OpenCV implementation is used.
+
+    :param operation: The name of the operation.
+    :param backend: (Optional.) The name of the backend. Defaults to
+        the `backend` setting.
+    :returns: The implementation.
+    :rtype: Callable
+    :raises ValueError: If the backend isn't installed.
+    """
+    if backend is None:
+        backend = get_settings().backend
+    registry = _implementations
+    if not any(backend in by_backend for by_backend in registry.values()):
+        raise ValueError(f'The {backend!r} backend is not installed.')
+    implementations = registry[operation]
+    return implementations.get(backend, implementations['cv2'])
+
+
+def implementations(operation: str) -> dict[str, Operation]:
+    """Get the implementations of an operation.
+
+    :param operation: The name of the operation.
+    :returns: A :class:`dict` of the implementations keyed by the name
+        of their backend.
+    :rtype: dict
+    """
+    return dict(_implementations[operation])
+
+
+# Operations.
+def box(a: ImgAry, size: int) -> ImgAry:
+    """Blur a frame with a box, like :func:`cv2.blur`.
+
+    :param a: The frame to blur. It may have a channel axis.
+    :param size: The width and height of the box.
+    :returns: A :class:`numpy.ndarray` object.
+    :rtype: numpy.ndarray
+    """
+    return get_implementation('box')(a, size)
+
+
+def convolve(a: ImgAry, kernel: np.ndarray) -> ImgAry:
+    """Correlate a frame with a kernel, like :func:`cv2.filter2D`.
+    The anchor is the middle of the kernel, and the edges of the
+    frame are reflected without repeating the edge pixel.
+
+    :param a: The frame to filter. It may have a channel axis.
+    :param kernel: The two-dimensional kernel.
+    :returns: A :class:`numpy.ndarray` object.
+    :rtype: numpy.ndarray
+    """
+    return get_implementation('convolve')(a, kernel)
+
+
+def gaussian(a: ImgAry, sigma: float) -> ImgAry:
+    """Blur a frame with a gaussian, like :func:`cv2.GaussianBlur`.
+
+    :param a: The frame to blur. It may have a channel axis.
+    :param sigma: The sigma of the blur.
+    :returns: A :class:`numpy.ndarray` object.
+    :rtype: numpy.ndarray
+    """
+    return get_implementation('gaussian')(a, sigma)
+
+
+def remap(
+    a: ImgAry,
+    map_x: np.ndarray,
+    map_y: Optional[np.ndarray],
+    interpolation: int,
+    border: int
+) -> ImgAry:
+    """Move the pixels of a frame, like :func:`cv2.remap`.
+
+    :param a: The frame to remap. It may have a channel axis.
+    :param map_x: The X coordinate each pixel comes from, or both
+        coordinates in the fixed point format of
+        :func:`imgfilt.maps.fixed_point`.
+    :param map_y: The Y coordinate each pixel comes from, or `None`
+        for fixed point maps.
+    :param interpolation: The OpenCV interpolation flag.
+    :param border: The OpenCV border mode.
+    :returns: A :class:`numpy.ndarray` object.
+    :rtype: numpy.ndarray
+    """
+    return get_implementation('remap')(a, map_x, map_y, interpolation, border)
+
+
+# OpenCV implementations.
+@register('box', 'cv2')
+def _box_cv2(a: ImgAry, size: int) -> np.ndarray:
+    return cv2.blur(a, (size, size))
+
+
+@register('convolve', 'cv2')
+def _convolve_cv2(a: ImgAry, kernel: np.ndarray) -> np.ndarray:
+    return cv2.filter2D(a, -1, kernel)
+
+
+@register('gaussian', 'cv2')
+def _gaussian_cv2(a: ImgAry, sigma: float) -> np.ndarray:
+    return cv2.GaussianBlur(a, (0, 0), sigmaX=sigma, sigmaY=sigma)
+
+
+@register('remap', 'cv2')
+def _remap_cv2(
+    a: ImgAry,
+    map_x: np.ndarray,
+    map_y: Optional[np.ndarray],
+    interpolation: int,
+    border: int
+) -> np.ndarray:
+    # OpenCV takes None for the second map, but its stubs don't say so.
+    return cv2.remap(
+        a, map_x, map_y, interpolation, borderMode=border  # type: ignore
+    )
+
+
+# NumPy implementations.
+@register('box', 'numpy')
+def _box_numpy(a: ImgAry, size: int) -> ImgAry:
+    return _convolve_numpy(a, box_kernel(size))
+
+
+@register('convolve', 'numpy')
+def _convolve_numpy(a: ImgAry, kernel: np.ndarray) -> ImgAry:
+    frame = _with_channels(a).astype(np.float64)
+    padded = _pad(frame, kernel.shape)
+    height, width = frame.shape[:2]
+    out = np.zeros(frame.shape)
+    for (y, x), weight in np.ndenumerate(kernel):
+        if weight:
+            out += weight * padded[y:y + height, x:x + width]
+    return out.reshape(a.shape).astype(a.dtype)
+
+
+@register('gaussian', 'numpy')
+def _gaussian_numpy(a: ImgAry, sigma: float) -> ImgAry:
+    kernel = gaussian_kernel(sigma, a.dtype)
+    blurred = _convolve_numpy(a.astype(np.float64), kernel[None, :])
+    blurred = _convolve_numpy(blurred, kernel[:, None])
+    return blurred.astype(a.dtype)
+
+
+@register('remap', 'numpy')
+def _remap_numpy(
+    a: ImgAry,
+    map_x: np.ndarray,
+    map_y: Optional[np.ndarray],
+    interpolation: int,
+    border: int
+) -> ImgAry:
+    if not _can_remap(interpolation, border):
+        return _remap_cv2(a, map_x, map_y, interpolation, border)
+    frame = _with_channels(a)
+    xs, ys, linear = _remap_coords(map_x, map_y, interpolation)
+    if not linear:
+        out = _sample(frame, xs, ys)
+    else:
+        x0, fx = _fixed_fraction(xs)
+        y0, fy = _fixed_fraction(ys)
+        fx, fy = fx[..., None], fy[..., None]
+        out = (
+            _sample(frame, x0, y0) * (1 - fx) * (1 - fy)
+            + _sample(frame, x0 + 1, y0) * fx * (1 - fy)
+            + _sample(frame, x0, y0 + 1) * (1 - fx) * fy
+            + _sample(frame, x0 + 1, y0 + 1) * fx * fy
+        )
+    shape = (*xs.shape, *a.shape[2:])
+    return out.reshape(shape).astype(a.dtype)
+
+
+# Numba implementations.
+# The loops are plain Python that Numba can compile. They are only
+# registered when Numba is installed.
+def _convolve_loop(
+    padded: np.ndarray, kernel: np.ndarray, out: np.ndarray
+) -> None:
+    """Correlate a padded frame with channels with a kernel."""
+    height, width, channels = out.shape
+    k_height, k_width = kernel.shape
+    for y in range(height):
+        for x in range(width):
+            for c in range(channels):
+                total = 0.0
+                for i in range(k_height):
+                    for j in range(k_width):
+                        total += kernel[i, j] * padded[y + i, x + j, c]
+                out[y, x, c] = total
+
+
+def _remap_loop(
+    frame: np.ndarray,
+    xs: np.ndarray,
+    ys: np.ndarray,
+    linear: bool,
+    out: np.ndarray
+) -> None:
+    """Sample a frame with channels at the given coordinates, with
+    zero outside the frame.
+    """
+    height, width, channels = frame.shape
+    for y in range(xs.shape[0]):
+        for x in range(xs.shape[1]):
+            if linear:
+                qx = np.rint(xs[y, x] * 32)
+                qy = np.rint(ys[y, x] * 32)
+                x0 = int(np.floor(qx / 32))
+                y0 = int(np.floor(qy / 32))
+                fx = (qx - x0 * 32) / 32
+                fy = (qy - y0 * 32) / 32
+            else:
+                x0 = int(xs[y, x])
+                y0 = int(ys[y, x])
+                fx = 0.0
+                fy = 0.0
+            for c in range(channels):
+                total = 0.0
+                for dy, wy in ((0, 1 - fy), (1, fy)):
+                    for dx, wx in ((0, 1 - fx), (1, fx)):
+                        py, px = y0 + dy, x0 + dx
+                        weight = wy * wx
+                        if (
+                            weight
+                            and 0 <= py < height
+                            and 0 <= px < width
+                        ):
+                            total += weight * frame[py, px, c]
+                out[y, x, c] = total
+
+
+if numba is not None:                                   # pragma: no cover
+    _convolve_loop = numba.njit(cache=True)(_convolve_loop)
+    _remap_loop = numba.njit(cache=True)(_remap_loop)
+
+    @register('box', 'numba')
+    def _box_numba(a: ImgAry, size: int) -> ImgAry:
+        return _convolve_numba(a, box_kernel(size))
+
+    @register('convolve', 'numba')
+    def _convolve_numba(a: ImgAry, kernel: np.ndarray) -> ImgAry:
+        frame = _with_channels(a).astype(np.float64)
+        padded = _pad(frame, kernel.shape)
+        out = np.empty(frame.shape)
+        _convolve_loop(padded, kernel.astype(np.float64), out)
+        return out.reshape(a.shape).astype(a.dtype)
+
+    @register('gaussian', 'numba')
+    def _gaussian_numba(a: ImgAry, sigma: float) -> ImgAry:
+        kernel = gaussian_kernel(sigma, a.dtype)
+        blurred = _convolve_numba(a.astype(np.float64), kernel[None, :])
+        blurred = _convolve_numba(blurred, kernel[:, None])
+        return blurred.astype(a.dtype)
+
+    @register('remap', 'numba')
+    def _remap_numba(
+        a: ImgAry,
+        map_x: np.ndarray,
+        map_y: Optional[np.ndarray],
+        interpolation: int,
+        border: int
+    ) -> ImgAry:
+        if not _can_remap(interpolation, border):
+            return _remap_cv2(a, map_x, map_y, interpolation, border)
+        frame = _with_channels(a).astype(np.float64)
+        xs, ys, linear = _remap_coords(map_x, map_y, interpolation)
+        out = np.empty((*xs.shape, frame.shape[-1]))
+        _remap_loop(frame, xs, ys, linear, out)
+        shape = (*xs.shape, *a.shape[2:])
+        return out.reshape(shape).astype(a.dtype)
+
+
+# Utility functions.
+def box_kernel(size: int) -> np.ndarray:
+    """Build the kernel of a box blur.
+
+    :param size: The width and height of the box.
+    :returns: A :class:`numpy.ndarray` object.
+    :rtype: numpy.ndarray
+    """
+    return np.full((size, size), 1 / size ** 2)
+
+
+def gaussian_kernel(sigma: float, dtype: np.dtype) -> np.ndarray:
+    """Build a one-dimensional gaussian kernel the size OpenCV uses
+    for the data type.
+
+    :param sigma: The sigma of the gaussian.
+    :param dtype: The data type of the image data.
+    :returns: A :class:`numpy.ndarray` object.
+    :rtype: numpy.ndarray
+    """
+    spread = 3 if dtype == np.uint8 else 4
+    size = int(round(sigma * spread * 2 + 1)) | 1
+    distance = np.arange(size) - size // 2
+    kernel = np.exp(-distance ** 2 / (2 * sigma ** 2))
+    return kernel / kernel.sum()
+
+
+def _can_remap(interpolation: int, border: int) -> bool:
+    """Check a remap can be done by the backends other than OpenCV."""
+    return (
+        interpolation in (cv2.INTER_NEAREST, cv2.INTER_LINEAR)
+        and border == cv2.BORDER_CONSTANT
+    )
+
+
+def _fixed_fraction(coords: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Split coordinates into whole pixels and the fraction of a pixel
+    past them, rounded to 1/32 of a pixel like OpenCV.
+    """
+    fixed = np.rint(coords * 32)
+    whole = np.floor(fixed / 32)
+    return whole.astype(int), (fixed - whole * 32) / 32
+
+
+def _pad(frame: np.ndarray, shape: tuple[int, ...]) -> np.ndarray:
+    """Pad a frame with channels for a kernel anchored at its middle,
+    reflecting the edges like OpenCV's default border.
+    """
+    (k_height, k_width) = shape
+    before_y, before_x = k_height // 2, k_width // 2
+    widths = (
+        (before_y, k_height - 1 - before_y),
+        (before_x, k_width - 1 - before_x),
+        (0, 0),
+    )
+    if min(frame.shape[:2]) > 1:
+        return np.pad(frame, widths, mode='reflect')
+    return np.pad(frame, widths, mode='edge')
+
+
+def _remap_coords(
+    map_x: np.ndarray, map_y: Optional[np.ndarray], interpolation: int
+) -> tuple[np.ndarray, np.ndarray, bool]:
+    """Get the coordinates to sample from the maps, and whether to
+    interpolate between pixels.
+    """
+    if map_y is None:
+        xs, ys = map_x[..., 0], map_x[..., 1]
+        return xs.astype(np.float64), ys.astype(np.float64), False
+    linear = interpolation == cv2.INTER_LINEAR
+    xs, ys = map_x.astype(np.float64), map_y.astype(np.float64)
+    if not linear:
+        xs, ys = np.rint(xs), np.rint(ys)
+    return xs, ys, linear
+
+
+def _sample(frame: np.ndarray, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+    """Sample a frame with channels at whole pixel coordinates, with
+    zero outside the frame.
+    """
+    height, width = frame.shape[:2]
+    xs, ys = xs.astype(int), ys.astype(int)
+    inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+    values = frame[ys.clip(0, height - 1), xs.clip(0, width - 1)]
+    return np.where(inside[..., None], values, 0).astype(np.float64)
+
+
+def _with_channels(a: ImgAry) -> ImgAry:
+    """Give a frame a channel axis if it doesn't have one."""
+    return a if a.ndim > 2 else a[..., None]
@@ -0,0 +1,313 @@
+"""
+batch
+~~~~~
+
+Run a :class:`imgfilt.pipeline.Pipeline` over many files using a
+pool of worker processes.
+"""
+import os
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    wait
+)
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
+
+import numpy as np
+from numpy.typing import NDArray
+from PIL import Image, ImageSequence
+
+from imgfilt.pipeline import Pipeline
+from imgfilt.settings import Settings, get_settings, use
+from imgfilt.threads import ThreadPolicy, apply_policy, get_policy
+
+
+# Types.
+ImgAry = NDArray[np.float_]
+PathLike = Union[str, Path]
+
+
+# Constants.
+ARRAY_SUFFIXES = ('.npy', '.npz')
+IMAGE_SUFFIXES = ('.bmp', '.jpeg', '.jpg', '.png', '.tif', '.tiff')
+SUFFIXES = ARRAY_SUFFIXES + IMAGE_SUFFIXES
+
+
+# File input and output.
+def read_array(path: PathLike) -> Union[ImgAry, dict[str, ImgAry]]:
+    """Read image data from a file.
+
+    Image files are read as grayscale, three-dimensional image data
+    with one frame for each page of the image. The values of the
+    image data are scaled to be from 0.0 to 1.0. NumPy files are read
+    as they were saved, with ".npz" files returning a :class:`dict`
+    of the arrays in the file.
+
+    :param path: The location of the file.
+    :returns: The image data.
+    :rtype: numpy.ndarray
+    """
+    path = Path(path)
+    suffix = path.suffix.casefold()
+    if suffix == '.npy':
+        return np.load(path)
+    if suffix == '.npz':
+        with np.load(path) as npz:
+            return {key: npz[key] for key in npz.files}
+    if suffix in IMAGE_SUFFIXES:
+        with Image.open(path) as img:
+            frames = [
+                np.array(frame.convert('L'), dtype=float) / 0xff
+                for frame in ImageSequence.Iterator(img)
+            ]
+        return np.array(frames)
+    raise ValueError(f'Unsupported file type: {path.suffix}.')
+
+
+def write_array(
+    path: PathLike,
+    a: Union[ImgAry, dict[str, ImgAry]],
+    color: Optional[bool] = None
+) -> None:
+    """Write image data to a file.
+
+    Image data written to image files is clipped to the range 0.0 to
+    1.0 and converted to eight bit integers. Each frame of three
+    dimensional image data is written as a page of a TIFF file. Other
+    image formats only hold one frame. Color image data is written
+    as RGB.
+
+    :param path: The location of the file.
+    :param a: The image data.
+    :param color: (Optional.) Whether the last axis of the image data
+        holds color channels. Defaults to whether the image data is
+        four-dimensional, so pass it for a single color frame.
+    :returns: `None`.
+    :rtype: NoneType
+    :raises ValueError: If the image format can't hold all of the
+        frames of the image data.
+    """
+    path = Path(path)
+    suffix = path.suffix.casefold()
+    if suffix == '.npy':
+        np.save(path, np.asarray(a))
+    elif suffix == '.npz':
+        if not isinstance(a, dict):
+            a = {'arr_0': a}
+        np.savez(path, **a)
+    elif suffix in IMAGE_SUFFIXES:
+        a = np.asarray(a)
+        if color is None:
+            color = a.ndim == 4
+        if a.ndim == (3 if color else 2):
+            a = a[np.newaxis]
+        multipage = suffix in ('.tif', '.tiff')
+        if len(a) > 1 and not multipage:
+            msg = f'{path.suffix} files hold one frame, not {len(a)}.'
+            raise ValueError(msg)
+        a = (np.clip(a, 0.0, 1.0) * 0xff).round().astype(np.uint8)
+        mode = 'RGB' if color else 'L'
+        imgs = [Image.fromarray(frame, mode=mode) for frame in a]
+        save_all = len(imgs) > 1
+        imgs[0].save(path, save_all=save_all, append_images=imgs[1:])
+    else:
+        raise ValueError(f'Unsupported file type: {path.suffix}.')
+
+
+def find_files(paths: Iterable[PathLike]) -> Iterator[Path]:
+    """Expand the given paths into the supported files they contain.
+    Directories are searched recursively.
+
+    :param paths: The files and directories to search.
+    :returns: An iterator of :class:`pathlib.Path` objects.
+    :rtype: Iterator
+    """
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            for item in sorted(path.rglob('*')):
+                if item.is_file() and item.suffix.casefold() in SUFFIXES:
+                    yield item
+        else:
+            yield path
+
+
+# Batch processing.
+def plan_batch(
+    paths: Iterable[PathLike],
+    outdir: PathLike,
+    suffix: Optional[str] = None,
+    overwrite: bool = False
+) -> list[tuple[Path, Path]]:
+    """Find where the result of filtering each of the given files
+    will be saved.
+
+    Each file keeps its path relative to the folder the inputs have
+    in common, so files with the same name in different folders are
+    saved to different files. A single directory is treated as that
+    folder, so its contents are saved directly in the output
+    directory.
+
+    :param paths: The files and directories to filter.
+    :param outdir: The directory to save the filtered data in.
+    :param suffix: (Optional.) The file extension for the output
+        files. Defaults to the extension of each input file.
+    :param overwrite: (Optional.) Whether to replace output files
+        that already exist. Input files are never replaced.
+    :returns: A :class:`list` of the source and destination of each
+        file.
+    :rtype: list
+    :raises FileExistsError: If an output file exists and
+        `overwrite` is false.
+    :raises ValueError: If an output file would replace an input
+        file, or two input files would be saved to the same file.
+    """
+    resolved = [Path(path).resolve() for path in paths]
+    srcs = list(dict.fromkeys(find_files(resolved)))
+    if not srcs:
+        return []
+    roots = [path if path.is_dir() else path.parent for path in resolved]
+    root = Path(os.path.commonpath(roots))
+    outdir = Path(outdir).resolve()
+
+    jobs: list[tuple[Path, Path]] = []
+    seen: dict[Path, Path] = {}
+    for src in srcs:
+        dst = outdir / src.relative_to(root)
+        if suffix:
+            dst = dst.with_suffix(suffix)
+        if dst in srcs:
+            raise ValueError(f'Filtering {src} would overwrite {dst}.')
+        if dst in seen:
+            msg = f'{seen[dst]} and {src} would both be saved to {dst}.'
+            raise ValueError(msg)
+        if dst.exists() and not overwrite:
+            raise FileExistsError(f'{dst} already exists.')
+        seen[dst] = src
+        jobs.append((src, dst))
+    return jobs
+
+
+def process_file(pipeline: Pipeline, src: PathLike, dst: PathLike) -> Path:
+    """Apply the pipeline to the image data in a file and save the
+    result.
+
+    :param pipeline: The filters to apply.
+    :param src: The location of the image data to filter.
+    :param dst: The location to save the filtered data.
+    :returns: The location of the saved data.
+    :rtype: pathlib.Path
+    """
+    a = read_array(src)
+    out: Union[ImgAry, dict[str, ImgAry]]
+    color = None
+    if isinstance(a, dict):
+        out = {key: pipeline(value) for key, value in a.items()}
+    else:
+        out = pipeline(a)
+        color = out.ndim > a.ndim
+    dst = Path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    write_array(dst, out, color)
+    return dst
+
+
+def run_batch(
+    pipeline: Pipeline,
+    paths: Iterable[PathLike],
+    outdir: PathLike,
+    processes: Optional[int] = None,
+    max_pending: Optional[int] = None,
+    suffix: Optional[str] = None,
+    overwrite: bool = False
+) -> Iterator[tuple[Path, Path]]:
+    """Apply the pipeline to each of the given files using a pool of
+    worker processes.
+
+    Workers read and write the files themselves, so image data is
+    never copied between processes. The number of files submitted to
+    the pool at any time is limited by `max_pending`, which bounds
+    the memory used by the batch no matter how many files are given.
+    The workers use the :mod:`imgfilt.settings` of the calling
+    process, and split its share of threads from the
+    :mod:`imgfilt.threads` policy between them.
+
+    Where each file is saved is found by :func:`plan_batch` before
+    any file is filtered, so a batch that would overwrite files
+    fails before it starts.
+
+    :param pipeline: The filters to apply.
+    :param paths: The files and directories to filter.
+    :param outdir: The directory to save the filtered data in.
+    :param processes: (Optional.) The number of worker processes.
+        Defaults to the share of threads the policy from
+        :func:`imgfilt.threads.get_policy` gives this job.
+    :param max_pending: (Optional.) The number of files that can be
+        in flight at once. Defaults to twice the number of processes.
+    :param suffix: (Optional.) The file extension for the output
+        files. Defaults to the extension of each input file.
+    :param overwrite: (Optional.) Whether to replace output files
+        that already exist.
+    :returns: An iterator of the source and destination of each
+        file, in the order the files finish.
+    :rtype: Iterator
+    :raises FileExistsError: If an output file exists and
+        `overwrite` is false.
+    :raises ValueError: If an output file would replace an input
+        file, or two input files would be saved to the same file.
+    """
+    jobs = plan_batch(paths, outdir, suffix, overwrite)
+    if processes is None:
+        processes = get_policy().share
+    if max_pending is None:
+        max_pending = 2 * processes
+    return _run_jobs(pipeline, jobs, processes, max_pending)
+
+
+def _run_jobs(
+    pipeline: Pipeline,
+    jobs: list[tuple[Path, Path]],
+    processes: int,
+    max_pending: int
+) -> Iterator[tuple[Path, Path]]:
+    """Filter the planned files in a pool of worker processes."""
+    settings = get_settings()
+    policy = get_policy()
+    with ProcessPoolExecutor(processes) as executor:
+        pending: dict[Future, Path] = {}
+        for src, dst in jobs:
+            while len(pending) >= max_pending:
+                yield from _collect(pending)
+            future = executor.submit(
+                _process_file, pipeline, src, dst,
+                settings, policy, processes
+            )
+            pending[future] = src
+        while pending:
+            yield from _collect(pending)
+
+
+def _process_file(
+    pipeline: Pipeline,
+    src: Path,
+    dst: Path,
+    settings: Settings,
+    policy: ThreadPolicy,
+    workers: int
+) -> Path:
+    """Process a file in a worker using the settings of the process
+    running the batch and its share of that process's threads.
+    """
+    apply_policy(policy, workers)
+    with use(settings):
+        return process_file(pipeline, src, dst)
+
+
+def _collect(pending: dict[Future, Path]) -> Iterator[tuple[Path, Path]]:
+    """Wait for at least one pending file to finish."""
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        src = pending.pop(future)
+        yield src, future.result()
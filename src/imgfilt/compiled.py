@@ -0,0 +1,244 @@
+"""
+compiled
+~~~~~~~~
+
+Filters with their parameters bound ahead of time, for calling in a
+loop over many frames.
+
+Each call to a filter checks its parameters and builds what it needs,
+such as a kernel or a coordinate map, before it filters anything. For
+small frames, that can cost as much as the filtering. :func:`compile`
+does that work once and returns an object that only does the
+filtering when called.
+
+Usage::
+
+    >>> import numpy as np
+    >>>
+    >>> blur = compile('box_blur', size=3)
+    >>> blur
+    CompiledBoxBlur('box_blur', size=3)
+    >>> frame = np.zeros((4, 4))
+    >>> frame[1, 1] = 0.9
+    >>> blur(frame)[0]
+    array([0.4, 0.2, 0.2, 0. ])
+"""
+from abc import ABC, abstractmethod
+from inspect import signature
+from typing import Any, Callable, Optional
+
+import cv2
+import numpy as np
+from numpy.typing import NDArray
+from PIL import ImageColor
+
+from imgfilt import imgfilt as ift
+from imgfilt.backends import get_implementation
+from imgfilt.pipeline import get_filter
+from imgfilt.settings import get_quality, get_settings, use
+from imgfilt.utility import Filter, X, Y, Z, get_color_for_key
+
+
+# Types.
+ImgAry = NDArray[np.float_]
+
+
+# Classes.
+class CompiledFilter:
+    """A filter with its parameters bound. Calling it calls the filter
+    with the parameters. Use :func:`compile` to create one.
+
+    :param name: The name of the filter in :data:`imgfilt.filters`.
+    :param params: The parameters to pass to the filter.
+    :returns: A :class:`CompiledFilter` object.
+    :rtype: imgfilt.compiled.CompiledFilter
+    """
+    __slots__ = ('name', 'filter', 'params', 'settings')
+
+    def __init__(self, name: str, **params: Any) -> None:
+        self.name = name
+        self.filter = get_filter(name)
+        self.params = params
+        self.settings = get_settings()
+
+        # Check the parameters now rather than on the first call.
+        signature(self.filter).bind(None, **params)
+
+    def __repr__(self) -> str:
+        cls = type(self).__name__
+        params = ''.join(f', {k}={v!r}' for k, v in self.params.items())
+        return f'{cls}({self.name!r}{params})'
+
+    def __call__(self, a: ImgAry) -> ImgAry:
+        """Apply the filter to image data.
+
+        :param a: The image data to alter.
+        :returns: A :class:`numpy.ndarray` object.
+        :rtype: numpy.ndarray
+        """
+        with use(self.settings):
+            return self.filter(a, **self.params)
+
+
+class _CompiledFrameFilter(CompiledFilter, ABC):
+    """A compiled filter that works one frame at a time, like the
+    filters wrapped by :func:`imgfilt.utility.processes_by_grayscale_frame`.
+    Subclasses must define :meth:`frame`.
+    """
+    __slots__ = ()
+
+    def __call__(self, a: ImgAry) -> ImgAry:
+        if a.ndim > 2:
+            return np.array([self.frame(frame) for frame in a])
+        return self.frame(a)
+
+    @abstractmethod
+    def frame(self, a: ImgAry) -> ImgAry:
+        """Apply the filter to one frame."""
+
+
+class CompiledBoxBlur(_CompiledFrameFilter):
+    """A compiled :func:`imgfilt.filter_box_blur`."""
+    __slots__ = ('kernel', 'convolve')
+
+    def __init__(self, name: str, **params: Any) -> None:
+        super().__init__(name, **params)
+        self.kernel = ift._box_kernel(params['size'])
+        self.convolve = get_implementation('convolve')
+
+    def frame(self, a: ImgAry) -> ImgAry:
+        return self.convolve(a, self.kernel)
+
+
+class CompiledColorize(_CompiledFrameFilter):
+    """A compiled :func:`imgfilt.filter_colorize`, which looks up the
+    color of each pixel in a table.
+    """
+    __slots__ = ('lut',)
+
+    def __init__(self, name: str, **params: Any) -> None:
+        super().__init__(name, **params)
+        white = params.get('white', '#FFFFFF')
+        black = params.get('black', '#000000')
+        if params.get('colorkey'):
+            white, black = get_color_for_key(params['colorkey'])
+        for color in white, black:
+            ImageColor.getrgb(color)
+        self.lut = ift._colorize_lut(white, black)
+
+    def frame(self, a: ImgAry) -> ImgAry:
+        if a.dtype == np.uint8:
+            return self.lut[a]
+        gray = (a * 0xff).astype(np.uint8)
+        return self.lut[gray].astype(a.dtype) / 0xff
+
+
+class CompiledMotionBlur(_CompiledFrameFilter):
+    """A compiled :func:`imgfilt.filter_motion_blur` along the X or
+    Y axis.
+    """
+    __slots__ = ('kernel', 'convolve')
+
+    def __init__(self, name: str, **params: Any) -> None:
+        super().__init__(name, **params)
+        self.kernel = ift._motion_kernel(params['amount'], params['axis'])
+        self.convolve = get_implementation('convolve')
+
+    def frame(self, a: ImgAry) -> ImgAry:
+        return self.convolve(a, self.kernel)
+
+
+class CompiledRemap(_CompiledFrameFilter):
+    """A compiled filter that moves pixels with
+    :func:`imgfilt.backends.remap`.
+    The maps are built for the size of the first frame and rebuilt
+    only if the size of the frames changes. They are always built
+    with the settings in effect when the filter was compiled, such
+    as the `map_resolution` and `quality` settings.
+    """
+    __slots__ = ('built', 'sample')
+
+    def __init__(self, name: str, **params: Any) -> None:
+        super().__init__(name, **params)
+        if 'quality' in signature(self.filter).parameters:
+            self.params['quality'] = get_quality(params.get('quality'))
+        self.built: tuple[tuple[int, ...], tuple] = ((), ())
+        self.sample = get_implementation('remap')
+
+    def frame(self, a: ImgAry) -> ImgAry:
+        # The size and the maps built for it are read and replaced
+        # together, so threads sharing the filter never see the maps
+        # of one size with another size.
+        size, maps = self.built
+        if a.shape[:2] != size:
+            size = a.shape[:2]
+            remap: Callable[..., tuple] = getattr(self.filter, 'remap')
+            with use(self.settings):
+                maps = remap(size, **self.params)
+            self.built = (size, maps)
+        return self.sample(a, *maps)
+
+
+class CompiledSkew(_CompiledFrameFilter):
+    """A compiled :func:`imgfilt.filter_skew`. The transform is built
+    for the size of the first frame and rebuilt only if the size of
+    the frames changes.
+    """
+    __slots__ = ('built', 'flags')
+
+    def __init__(self, name: str, **params: Any) -> None:
+        super().__init__(name, **params)
+        quality = get_quality(params.get('quality'))
+        self.flags = ift.CV2_INTERPOLATION[quality]
+        self.built: tuple[tuple[int, ...], Optional[np.ndarray]] = ((), None)
+
+    def frame(self, a: ImgAry) -> np.ndarray:
+        size, matrix = self.built
+        if matrix is None or a.shape[:2] != size:
+            size = a.shape[:2]
+            matrix = ift._skew_matrix(size, self.params['slope'])
+            self.built = (size, matrix)
+        return cv2.warpAffine(
+            a, matrix, (size[X], size[Y]),
+            flags=self.flags, borderMode=cv2.BORDER_WRAP
+        )
+
+
+# Compiled forms of the filters that have them.
+COMPILERS: dict[str, type[CompiledFilter]] = {
+    'box_blur': CompiledBoxBlur,
+    'colorize': CompiledColorize,
+    'motion_blur': CompiledMotionBlur,
+    'skew': CompiledSkew,
+}
+
+
+# Functions.
+def compile(name: str, **params: Any) -> CompiledFilter:
+    """Bind parameters to a filter, doing the work the filter does
+    before it looks at the image data once rather than on every call.
+    Settings, such as the `quality` setting, are the ones in effect
+    when the filter is compiled.
+
+    Filters without a faster compiled form are returned as a
+    :class:`CompiledFilter` that calls the filter, so any filter can
+    be compiled.
+
+    :param name: The name of the filter in :data:`imgfilt.filters`.
+    :param params: The parameters to pass to the filter.
+    :returns: A :class:`CompiledFilter` object.
+    :rtype: imgfilt.compiled.CompiledFilter
+    """
+    cls = _compiler(name, params)
+    return cls(name, **params)
+
+
+# Utility functions.
+def _compiler(name: str, params: dict[str, Any]) -> Callable:
+    """Find the class that compiles the named filter."""
+    fn: Filter = get_filter(name)
+    if name == 'motion_blur' and params.get('axis') == Z:
+        return CompiledFilter
+    if hasattr(fn, 'remap'):
+        return CompiledRemap
+    return COMPILERS.get(name, CompiledFilter)
@@ -0,0 +1,138 @@
+"""
+dedupe
+~~~~~~
+
+Skip filtering frames of video that are the same as a frame that was
+already filtered.
+
+Generated video often holds on a frame, so the same frame appears
+many times in a row. A :class:`FrameDeduper` fingerprints each frame
+from a sparse grid of its pixels, which is cheap, and when the
+fingerprint matches a recent frame, checks the whole frame to be sure
+before reusing that frame's result. It is used by passing `dedupe` to
+a filter that works one frame at a time. Passing `True` uses a new
+deduper that is thrown away after the call, so pass a deduper to see
+how many frames were skipped:
+
+Usage::
+
+    >>> import numpy as np
+    >>> import imgfilt
+    >>>
+    >>> a = np.zeros((4, 8, 8))
+    >>> a[3] = 1.0
+    >>> deduper = FrameDeduper()
+    >>> _ = imgfilt.filter_box_blur(a, 3, dedupe=deduper)
+    >>> deduper.frames, deduper.skipped
+    (4, 2)
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Iterator, Union
+
+import numpy as np
+from numpy.typing import NDArray
+
+
+# Types.
+ImgAry = NDArray[np.float_]
+
+
+# Classes.
+class FrameDeduper:
+    """Filter the frames of video, reusing the result for frames that
+    are the same as a recently filtered frame.
+
+    :param size: (Optional.) How many of the most recently used unique
+        frames to remember. Consecutive repeats of a frame only need
+        one. Each remembered frame keeps its result in memory.
+    :param samples: (Optional.) About how many pixels of each frame
+        are used in its fingerprint.
+    :returns: A :class:`FrameDeduper` object.
+    :rtype: imgfilt.dedupe.FrameDeduper
+    """
+    def __init__(self, size: int = 8, samples: int = 4096) -> None:
+        self.size = size
+        self.samples = samples
+        self.frames = 0
+        self.skipped = 0
+
+    def __repr__(self) -> str:
+        cls = type(self).__name__
+        return f'{cls}(frames={self.frames}, skipped={self.skipped})'
+
+    def fingerprint(self, frame: ImgAry) -> bytes:
+        """Find a cheap fingerprint of a frame. Frames that are the
+        same always have the same fingerprint, but frames that are
+        different may also have the same fingerprint.
+
+        :param frame: The frame to fingerprint.
+        :returns: A :class:`bytes` object.
+        :rtype: bytes
+        """
+        step = max(1, int((frame.size / self.samples) ** 0.5))
+        sample = frame[::step, ::step]
+        head = f'{frame.shape}{frame.dtype}'.encode()
+        return head + sample.tobytes()
+
+    def map(
+        self, fn: Callable, a: ImgAry, *args: Any, **kwargs: Any
+    ) -> Iterator[ImgAry]:
+        """Apply a filter to each frame of the image data.
+
+        :param fn: The filter to apply to each frame.
+        :param a: The image data to filter.
+        :param args: The arguments to pass to the filter.
+        :param kwargs: The keyword arguments to pass to the filter.
+        :returns: An iterator of the filtered frames. Repeated frames
+            share the same result array.
+        :rtype: Iterator
+        """
+        recent: OrderedDict[bytes, list[tuple[ImgAry, ImgAry]]]
+        recent = OrderedDict()
+        count = 0
+        for frame in a:
+            self.frames += 1
+            key = self.fingerprint(frame)
+            matches = recent.get(key, [])
+            result = _find_result(matches, frame)
+            if result is not None:
+                self.skipped += 1
+                recent.move_to_end(key)
+                yield result
+                continue
+
+            result = fn(frame, *args, **kwargs)
+            matches.append((frame, result))
+            recent[key] = matches
+            recent.move_to_end(key)
+            count += 1
+            while count > self.size:
+                _, dropped = recent.popitem(last=False)
+                count -= len(dropped)
+            yield result
+
+
+# Functions.
+def get_deduper(dedupe: Union[bool, FrameDeduper]) -> FrameDeduper:
+    """Get the :class:`FrameDeduper` for the `dedupe` argument of a
+    filter, which is either a deduper or `True` for a new one. The
+    caller never sees a new deduper, so its counts can't be read.
+    Callers that want the counts must pass a deduper.
+
+    :param dedupe: The argument passed to the filter.
+    :returns: A :class:`FrameDeduper` object.
+    :rtype: imgfilt.dedupe.FrameDeduper
+    """
+    if isinstance(dedupe, FrameDeduper):
+        return dedupe
+    return FrameDeduper()
+
+
+def _find_result(
+    matches: list[tuple[ImgAry, ImgAry]], frame: ImgAry
+) -> Union[ImgAry, None]:
+    """Find the result of a frame that is the same as the given one."""
+    for seen, result in matches:
+        if np.array_equal(seen, frame):
+            return result
+    return None
@@ -4,7 +4,9 @@ imgfilt
 
 Filter functions for image data.
 """
-from typing import Sequence
+import threading
+import weakref
+from typing import Iterator, Optional, Sequence
 
 import cv2
 import numpy as np
@@ -12,6 +14,17 @@ import skimage.transform as sktf  # type: ignore
 from numpy.typing import NDArray
 from PIL import Image, ImageOps
 
+from imgfilt import backends
+from imgfilt.instrument import instrumented
+from imgfilt.maps import (
+    linear_to_polar_maps,
+    pinch_maps,
+    polar_to_linear_maps,
+    ripple_maps,
+    twirl_maps
+)
+from imgfilt.settings import get_quality, get_settings
+from imgfilt.temporal import box_frames, gaussian_frames
 from imgfilt.utility import *
 
 
@@ -21,8 +34,184 @@ Loc = Sequence[int]
 Size = Sequence[int]
 
 
+# The range of the image data found by the identity check of
+# filter_contrast, so the filter doesn't have to scan the image data
+# again. A pipeline calls the filter right after the check, so it is
+# only kept until the next call of the filter in the same thread, and
+# only used if that call is given the same array.
+_checked = threading.local()
+
+
+# Interpolation for each quality setting.
+CV2_INTERPOLATION = {
+    'nearest': cv2.INTER_NEAREST,
+    'linear': cv2.INTER_LINEAR,
+    'cubic': cv2.INTER_CUBIC,
+    'lanczos': cv2.INTER_LANCZOS4,
+}
+SPLINE_ORDERS = {
+    'nearest': 0,
+    'linear': 1,
+    'cubic': 3,
+    'lanczos': 5,
+}
+
+# The most channels cv2.remap and cv2.warpAffine can take with each
+# quality, which is only four for cubic and lanczos interpolation.
+REMAP_CHANNELS = {
+    'nearest': MAX_CHANNELS,
+    'linear': MAX_CHANNELS,
+    'cubic': 4,
+    'lanczos': 4,
+}
+
+# Gaussian blurs with a sigma at or below this leave image data
+# unchanged, since the neighboring pixels have a weight below 1e-21.
+MIN_SIGMA = 0.1
+
+
+# Remapping functions.
+# Each finds the arguments to cv2.remap for a filter that moves
+# pixels, so they can also be used to find where a region of the
+# filter's result comes from. See imgfilt.lazy.
+def _remap_channels(quality: Optional[str] = None, **_) -> int:
+    """Find the most frames a filter that interpolates with the
+    given quality can take as channels.
+    """
+    return REMAP_CHANNELS[get_quality(quality)]
+
+
+def _linear_to_polar_remap(size: Size) -> tuple:
+    """Find the remap arguments for :func:`filter_linear_to_polar`."""
+    map_x, map_y = linear_to_polar_maps(size)
+    return map_x, map_y, cv2.INTER_NEAREST, cv2.BORDER_CONSTANT
+
+
+def _pinch_remap(
+    size: Size,
+    amount: float,
+    radius: float,
+    scale: Sequence[float],
+    offset: Loc = (0, 0, 0),
+    quality: Optional[str] = None
+) -> tuple:
+    """Find the remap arguments for :func:`filter_pinch`."""
+    # Create maps with the barrel/pincushion formula.
+    quality = get_quality(quality)
+    center = tuple((n) / 2 + o for n, o in zip(size, offset))
+    flex_x, flex_y = pinch_maps(
+        size, amount, radius, scale, center, fixed=quality == 'nearest'
+    )
+    return flex_x, flex_y, CV2_INTERPOLATION[quality], cv2.BORDER_CONSTANT
+
+
+def _polar_to_linear_remap(size: Size) -> tuple:
+    """Find the remap arguments for :func:`filter_polar_to_linear`."""
+    map_x, map_y = polar_to_linear_maps(size)
+    return map_x, map_y, cv2.INTER_NEAREST, cv2.BORDER_CONSTANT
+
+
+def _ripple_remap(
+    size: Size,
+    wave: Sequence[float],
+    amp: Sequence[float],
+    distaxis: Sequence[int],
+    offset: Loc = (0, 0, 0),
+    quality: Optional[str] = None
+) -> tuple:
+    """Find the remap arguments for :func:`filter_ripple`."""
+    # The flex map value for each pixel will indicate how far that
+    # pixel moves in the remapped image.
+    quality = get_quality(quality)
+    flex_x, flex_y = ripple_maps(
+        size, wave, amp, distaxis, offset, fixed=quality == 'nearest'
+    )
+    return flex_x, flex_y, CV2_INTERPOLATION[quality], cv2.BORDER_CONSTANT
+
+
+def _remap(
+    a: ImgAry, map_x: ImgAry, map_y: ImgAry, interpolation: int, border: int
+) -> ImgAry:
+    """Move the pixels of a frame with :func:`imgfilt.backends.remap`."""
+    return backends.remap(a, map_x, map_y, interpolation, border)
+
+
+# Setup functions.
+# Each builds something a filter needs before it looks at the image
+# data. They are cached, so repeated calls with the same parameters
+# don't rebuild them, and shared with imgfilt.compiled.
+@shared_cache(maxsize=64)
+def _box_kernel(size: int) -> np.ndarray:
+    """Build the kernel for :func:`filter_box_blur`."""
+    kernel = np.full((size, size), 1 / size ** 2)
+    kernel.flags.writeable = False
+    return kernel
+
+
+@shared_cache(maxsize=64)
+def _colorize_lut(white: str, black: str) -> np.ndarray:
+    """Build a table of the color :func:`filter_colorize` gives each
+    8-bit gray value.
+    """
+    gray = Image.fromarray(np.arange(256, dtype=np.uint8)[None], mode='L')
+    colorized = ImageOps.colorize(
+        image=gray,
+        black=black,
+        white=white,
+        blackpoint=0x00,
+        midpoint=0x7f,
+        whitepoint=0xff
+    )
+    lut = np.array(colorized.convert('RGB'))[0]
+    lut.flags.writeable = False
+    return lut
+
+
+@shared_cache(maxsize=64)
+def _motion_kernel(amount: int, axis: int) -> np.ndarray:
+    """Build the kernel for :func:`filter_motion_blur` along the X
+    or Y axis.
+    """
+    kernel = np.zeros((amount, amount), float)
+    if axis == X:
+        kernel[amount // 2, :] = 1 / amount
+    elif axis == Y:
+        kernel[:, amount // 2] = 1 / amount
+    else:
+        msg = 'motion_blur can only affect the X, Y, or Z axis.'
+        raise ValueError(msg)
+    kernel.flags.writeable = False
+    return kernel
+
+
+@shared_cache(maxsize=64)
+def _skew_matrix(size: tuple[int, int], slope: float) -> np.ndarray:
+    """Build the affine transform matrix for :func:`filter_skew`."""
+    # Create the transform matrix by defining three points in the
+    # original image, and then showing where they move to in the
+    # new, transformed image. The order of the axes is reversed
+    # for this in comparison to how it's generally used in pjinoise.
+    # This is due to the implementation of OpenCV.
+    original = np.array([
+        [0, 0],
+        [size[X] - 1, 0],
+        [0, size[Y] - 1],
+    ], dtype=np.float32)
+    new = np.array([
+        [0, 0],
+        [size[X] - 1, 0],
+        [(size[Y] - 1) * slope, size[Y] - 1],
+    ], dtype=np.float32)
+    matrix = cv2.getAffineTransform(original, new)
+    matrix.flags.writeable = False
+    return matrix
+
+
 # Image filter functions.
+@instrumented
+@has_halo(lambda size, **_: size // 2)
 @processes_by_grayscale_frame
+@handles_channels(lambda **_: MAX_CHANNELS)
 def filter_box_blur(a: ImgAry, size: int) -> ImgAry:
     """Perform a box blur.
 
@@ -36,10 +225,42 @@ def filter_box_blur(a: ImgAry, size: int) -> ImgAry:
     :returns: A :class:`np.ndarray` object.
     :rtype: numpy.ndarray
     """
-    kernel = np.ones((size, size), float) / size ** 2
-    return cv2.filter2D(a, -1, kernel)
+    return backends.convolve(a, _box_kernel(size))
+
+
+@instrumented
+@has_halo(lambda size, **_: size // 2)
+def filter_box_blur_3d(
+    a: ImgAry,
+    size: int,
+    size_z: Optional[int] = None,
+    out: Optional[ImgAry] = None
+) -> ImgAry:
+    """Perform a box blur across the frames of a video as well as
+    within each frame. The blur along the Z axis keeps a running sum
+    of a window of frames, so only that window of frames is held in
+    memory. See :mod:`imgfilt.temporal` to blur a stream of frames.
+
+    :param a: The image data to alter.
+    :param size: The size of the box within each frame.
+    :param size_z: (Optional.) The number of frames in the box.
+        Defaults to the same as size.
+    :param out: (Optional.) An array to write the result into one
+        frame at a time. See :ref:`memmap`.
+    :returns: A :class:`np.ndarray` object.
+    :rtype: numpy.ndarray
+    """
+    if len(a.shape) < 3:
+        return filter_box_blur(a, size, out=out)
+    if size_z is None:
+        size_z = size
+    frames = (filter_box_blur(frame, size) for frame in a)
+    return _stack_frames(box_frames(frames, size_z), out)
 
 
+@instrumented
+@has_halo(lambda **_: 0)
+@adds_channels(3)
 @processes_by_grayscale_frame
 @uses_uint8
 def filter_colorize(
@@ -86,8 +307,15 @@ def filter_colorize(
     return out
 
 
+@instrumented
+@has_identity(
+    lambda a, black=0.0, white=1.0, **_: _is_in_range(a, black, white)
+)
 def filter_contrast(
-    a: ImgAry, black: float = 0.0, white: float = 1.0
+    a: ImgAry,
+    black: float = 0.0,
+    white: float = 1.0,
+    out: Optional[ImgAry] = None
 ) -> ImgAry:
     """Adjust the image to fill the full dynamic range.
 
@@ -99,12 +327,25 @@ def filter_contrast(
     :param a: The image data to alter.
     :param black: (Optional.) The minimum value in the output.
     :param white: (Optional.) The maximum value in the output.
+    :param out: (Optional.) An array to write the result into one
+        frame at a time. See :ref:`memmap`.
     :returns: A :class:`np.ndarray` object.
     :rtype: numpy.ndarray
     """
     # Normalize the values to a scale from 0.0 to 1.0.
-    a_min = np.min(a)
-    a_max = np.max(a)
+    a_min, a_max = _range(a)
+    if out is not None:
+        frames = (_contrast(frame, a_min, a_max, black, white) for frame in a)
+        return write_frames(out, frames)
+    return _contrast(a, a_min, a_max, black, white)
+
+
+def _contrast(
+    a: ImgAry, a_min: float, a_max: float, black: float, white: float
+) -> ImgAry:
+    """Scale the image data from the range of the original image
+    to the destination range.
+    """
     scale = a_max - a_min
     if scale != 0:
         a = a - a_min
@@ -120,7 +361,10 @@ def filter_contrast(
     return a
 
 
-def filter_flip(a: ImgAry, axis: int) -> ImgAry:
+@instrumented
+def filter_flip(
+    a: ImgAry, axis: int, out: Optional[ImgAry] = None
+) -> ImgAry:
     """Flip the image around an axis.
 
     .. figure:: images/filter_flip.jpg
@@ -130,13 +374,22 @@ def filter_flip(a: ImgAry, axis: int) -> ImgAry:
     
     :param a: The image data to alter.
     :param axis: The axis to flip the image data around.
+    :param out: (Optional.) An array to write the result into one
+        frame at a time. See :ref:`memmap`.
     :returns: A :class:`np.ndarray` object.
     :rtype: numpy.ndarray
     """
-    return np.flip(a, axis)
+    flipped = np.flip(a, axis)
+    if out is not None:
+        return write_frames(out, flipped)
+    return flipped
 
 
+@instrumented
+@has_identity(lambda a, sigma, **_: sigma <= MIN_SIGMA)
+@has_halo(lambda sigma, **_: _gaussian_halo(sigma))
 @processes_by_grayscale_frame
+@handles_channels(lambda **_: MAX_CHANNELS)
 def filter_gaussian_blur(a: ImgAry, sigma: float) -> ImgAry:
     """Perform a gaussian blur.
 
@@ -153,10 +406,61 @@ def filter_gaussian_blur(a: ImgAry, sigma: float) -> ImgAry:
         size of a standard deviation in that normal distribution.
     :returns: A :class:`numpy.ndarray` object.
     :rtype: numpy.ndarray
-    """
-    return cv2.GaussianBlur(a, (0, 0), sigma, sigma, 0)
 
+    .. note::
+       Large blurs of floating point image data are approximated
+       with repeated box blurs, which take the same time for any
+       sigma. See the `gaussian_engine` setting in
+       :mod:`imgfilt.settings`.
+    """
+    settings = get_settings()
+    engine = settings.gaussian_engine
+    if engine == 'auto':
+        engine = 'box' if sigma >= settings.gaussian_threshold else 'exact'
+    if engine == 'box' and np.issubdtype(a.dtype, np.floating):
+        blurred: np.ndarray = a
+        for size in gaussian_boxes(sigma):
+            blurred = backends.box(blurred, size)
+        return blurred
+    return backends.gaussian(a, sigma)
+
+
+@instrumented
+@has_halo(lambda sigma, **_: _gaussian_halo(sigma))
+def filter_gaussian_blur_3d(
+    a: ImgAry,
+    sigma: float,
+    sigma_z: Optional[float] = None,
+    out: Optional[ImgAry] = None
+) -> ImgAry:
+    """Perform a gaussian blur across the frames of a video as well
+    as within each frame. The blur along the Z axis only holds the
+    frames it needs in memory. See :mod:`imgfilt.temporal` to blur a
+    stream of frames.
 
+    :param a: The image data to alter.
+    :param sigma: The sigma value of the blur within each frame. If
+        this is zero, the frames are only blurred along the Z axis.
+    :param sigma_z: (Optional.) The sigma value of the blur along
+        the Z axis, in frames. Defaults to the same as sigma.
+    :param out: (Optional.) An array to write the result into one
+        frame at a time. See :ref:`memmap`.
+    :returns: A :class:`numpy.ndarray` object.
+    :rtype: numpy.ndarray
+    """
+    if sigma_z is None:
+        sigma_z = sigma
+    if len(a.shape) < 3:
+        return filter_gaussian_blur(a, sigma, out=out)
+    frames = iter(a)
+    if sigma:
+        frames = (filter_gaussian_blur(frame, sigma) for frame in a)
+    return _stack_frames(gaussian_frames(frames, sigma_z), out)
+
+
+@instrumented
+@has_halo(lambda sigma, **_: _glow_halo(sigma))
+@streams_by_frame
 def filter_glow(a: ImgAry, sigma: int) -> ImgAry:
     """Use gaussian blurs to create a halo around brighter objects
     in the image.
@@ -191,7 +495,13 @@ def filter_glow(a: ImgAry, sigma: int) -> ImgAry:
     return b
 
 
-def filter_grow(a: ImgAry, factor: float) -> ImgAry:
+@instrumented
+def filter_grow(
+    a: ImgAry,
+    factor: float,
+    out: Optional[ImgAry] = None,
+    quality: Optional[str] = None
+) -> ImgAry:
     """Increase the size of an image.
 
     .. figure:: images/filter_grow.jpg
@@ -201,15 +511,111 @@ def filter_grow(a: ImgAry, factor: float) -> ImgAry:
     
     :param a: The image data to alter.
     :param factor: The scaling factor to use when increasing the
+        size of the image. Use :func:`filter_shrink` to decrease the
         size of the image.
+    :param out: (Optional.) An array to write the result into one
+        frame at a time. See :ref:`memmap`.
+    :param quality: (Optional.) How to interpolate between pixels.
+        Defaults to the `quality` setting. See :mod:`imgfilt.settings`.
     :returns: A :class:`np.ndarray` object.
     :rtype: numpy.ndarray
+
+    Growing by a whole number with nearest or linear quality uses
+    :func:`imgfilt.utility.grow_whole`, which is several times faster.
     """
+    quality = get_quality(quality)
+    if _is_whole(factor) and quality in ('nearest', 'linear'):
+        if out is None:
+            return grow_whole(a, int(factor), quality)
+        if len(a.shape) == 2:
+            out[...] = grow_whole(a, int(factor), quality)
+            return out
+        frames = _grow_whole_frames(a, int(factor), quality)
+        return write_frames(out, frames)
+    if quality != 'linear':
+        if out is None:
+            return resample(a, factor, quality)
+        if len(a.shape) == 2:
+            out[...] = resample(a, factor, quality)
+            return out
+        return write_frames(out, _resample_frames(a, factor, quality))
+    if len(a.shape) == 2 and out is not None:
+        out[...] = bilinear_interpolation(a, factor)
+        return out
     if len(a.shape) == 2:
         return bilinear_interpolation(a, factor)
+    if out is not None:
+        return write_frames(out, _grow_frames(a, factor))
     return trilinear_interpolation(a, factor)
 
 
+def _grow_frames(a: ImgAry, factor: float) -> Iterator[ImgAry]:
+    """Grow three-dimensional image data one output frame at a time.
+    Trilinear interpolation is separable, so each output frame is
+    the interpolation between two input frames that have been grown
+    with bilinear interpolation. This gives the same result as
+    :func:`trilinear_interpolation` while only holding two frames.
+    """
+    whole, parts = interpolation_points(len(a), factor)
+    last = len(a) - 1
+    grown: dict[int, ImgAry] = {}
+    for z, part in zip(whole, parts):
+        ahead = min(z + 1, last)
+        for i in list(grown):
+            if i < z:
+                del grown[i]
+        for i in z, ahead:
+            if i not in grown:
+                grown[i] = bilinear_interpolation(a[i], factor)
+        yield lerp(grown[z], grown[ahead], part)
+
+
+def _grow_whole_frames(
+    a: ImgAry, factor: int, quality: str
+) -> Iterator[ImgAry]:
+    """Grow three-dimensional image data by a whole number one output
+    frame at a time, like :func:`_grow_frames` does for other factors.
+    """
+    ahead = grow_whole(a[0], factor, quality, axes=2)
+    for z in range(len(a)):
+        grown = ahead
+        if z + 1 < len(a):
+            ahead = grow_whole(a[z + 1], factor, quality, axes=2)
+        for k in range(factor):
+            if quality == 'nearest':
+                yield grown
+            else:
+                yield lerp(grown, ahead, np.array(k / factor))
+
+
+def _is_whole(factor: float) -> bool:
+    """Check whether a factor grows by a whole number."""
+    return factor > 1 and float(factor).is_integer()
+
+
+def _resample_frames(
+    a: ImgAry, factor: float, quality: str
+) -> Iterator[ImgAry]:
+    """Resample three-dimensional image data one output frame at a
+    time, like :func:`_grow_frames` does for linear interpolation.
+    Only the input frames needed by the current output frame are
+    held.
+    """
+    indices, weights = resampling_weights(len(a), factor, quality)
+    grown: dict[int, ImgAry] = {}
+    for index, weight in zip(indices, weights):
+        for i in list(grown):
+            if i < index.min():
+                del grown[i]
+        for i in index:
+            if i not in grown:
+                grown[i] = resample(a[i], factor, quality, axes=2)
+        yield weigh([grown[i] for i in index], weight)
+
+
+@instrumented
+@has_halo(lambda **_: 0)
+@streams_by_frame
 def filter_inverse(a: ImgAry) -> ImgAry:
     """Inverse the colors of an image.
 
@@ -225,8 +631,10 @@ def filter_inverse(a: ImgAry) -> ImgAry:
     return 1 - a
 
 
+@instrumented
+@remaps(_linear_to_polar_remap)
 @processes_by_grayscale_frame
-@will_square
+@handles_channels(lambda **_: MAX_CHANNELS)
 def filter_linear_to_polar(a: ImgAry) -> ImgAry:
     """Convert the linear coordinates of the image data to
     polar coordinates.
@@ -239,18 +647,24 @@ def filter_linear_to_polar(a: ImgAry) -> ImgAry:
     :param a: The image data to alter.
     :returns: A :class:`np.ndarray` object.
     :rtype: numpy.ndarray
+
+    .. note::
+       If the X and Y axes of the image are not the same size, the
+       image is transformed as if it were centered in a square image
+       with a black background, and then cropped back to its original
+       size.
     """
-    center = tuple(n / 2 for n in a.shape)
-    max_radius = np.sqrt(sum(n ** 2 for n in center))
-    flags = cv2.WARP_POLAR_LINEAR + cv2.WARP_INVERSE_MAP
-    return cv2.warpPolar(a, a.shape, center, max_radius, flags)
+    return _remap(a, *_linear_to_polar_remap(a.shape[:2]))
 
 
-@processes_by_grayscale_frame
+@instrumented
+@has_halo(lambda amount, axis, **_: 0 if axis == Z else amount // 2)
 def filter_motion_blur(
     a: ImgAry,
     amount: int,
-    axis: int
+    axis: int,
+    out: Optional[ImgAry] = None,
+    **kwargs
 ) -> ImgAry:
     """Perform a motion blur.
 
@@ -260,34 +674,49 @@ def filter_motion_blur(
        An example of :func:`filter_motion_blur` affecting an image.
     
     :param a: The image data to alter.
-    :param size: The size of the blur to apply.
-    :param direction: The axis that the blur should be performed along.
-        The index should be indicated using the imgfilt.X or imgfilt.Y
-        objects.
+    :param amount: The size of the blur to apply.
+    :param axis: The axis that the blur should be performed along.
+        The index should be indicated using the imgfilt.X, imgfilt.Y,
+        or imgfilt.Z objects. Blurring along the Z axis averages
+        each frame of a video with the frames around it.
+    :param out: (Optional.) An array to write the result into one
+        frame at a time. See :ref:`memmap`.
     :returns: A :class:`np.ndarray` object.
     :rtype: numpy.ndarray
+
+    Blurs along the X or Y axis are done one frame at a time and
+    accept the `processes` and `batch` keyword arguments, like
+    :func:`filter_box_blur`. Blurs along the Z axis keep a running
+    sum of a window of frames, so only that window of frames is held
+    in memory. See :mod:`imgfilt.temporal` to blur a stream of frames.
     """
-    kernel = np.zeros((amount, amount), float)
-    if axis == X:
-        y = int(amount // 2)
-        for x in range(amount):
-            kernel[y][x] = 1 / amount
-    elif axis == Y:
-        x = int(amount // 2)
-        for y in range(amount):
-            kernel[y][x] = 1 / amount
-    else:
-        raise ValueError('motion_blur can only affect the X or Y axis.')
-    return cv2.filter2D(a, -1, kernel)
+    if axis == Z and len(a.shape) > 2:
+        return _stack_frames(box_frames(a, amount), out)
+    if axis == Z:
+        msg = 'motion_blur can only affect the Z axis of image data with '
+        raise ValueError(msg + 'more than two dimensions.')
+    return _motion_blur(a, amount, axis, out=out, **kwargs)
+
+
+@processes_by_grayscale_frame
+@handles_channels(lambda **_: MAX_CHANNELS)
+def _motion_blur(a: ImgAry, amount: int, axis: int) -> ImgAry:
+    """Perform a motion blur along the X or Y axis of a frame."""
+    return backends.convolve(a, _motion_kernel(amount, axis))
 
 
+@instrumented
+@has_identity(lambda a, amount, **_: amount == 0)
+@remaps(_pinch_remap)
 @processes_by_grayscale_frame
+@handles_channels(_remap_channels)
 def filter_pinch(
     a: ImgAry,
     amount: float,
     radius: float,
     scale: Sequence[float],
-    offset: Loc = (0, 0, 0)
+    offset: Loc = (0, 0, 0),
+    quality: Optional[str] = None
 ) -> ImgAry:
     """Distort an image to make it appear as though it is being
     pinched or swelling.
@@ -308,48 +737,19 @@ def filter_pinch(
         distortion.
     :param offset: (Optional.) Sets how far the center of the
         distortion should be offset from the center of the image.
+    :param quality: (Optional.) How to interpolate between pixels.
+        Defaults to the `quality` setting. See :mod:`imgfilt.settings`.
     :returns: A :class:`np.ndarray` object.
     :rtype: numpy.ndarray
     """
-    # Set up for creating the maps.
-    center = tuple((n) / 2 + o for n, o in zip(a.shape, offset))
-    flex_x = np.zeros(a.shape, np.float32)
-    flex_y = np.zeros(a.shape, np.float32)
-
-    # Create a map of the distance from each pixel in the image to
-    # the center of the image.
-    indices = np.indices(a.shape)
-    y = indices[Y]
-    x = indices[X]
-    delta_y = scale[Y] * (y - center[Y])
-    delta_x = scale[X] * (x - center[X])
-    distance = delta_x ** 2 + delta_y ** 2
-
-    # Mask out the area covered by not within the radius of the effect.
-    r_mask = np.zeros(x.shape, bool)
-    r_mask[distance >= radius ** 2] = True
-    flex_x[r_mask] = x[r_mask]
-    flex_y[r_mask] = y[r_mask]
-
-    # Create maps with the barrel/pincushion formula.
-    pmask = np.zeros(x.shape, bool)
-    pmask[distance > 0.0] = True
-    pmask[r_mask] = False
-    factor = np.sin(np.pi * np.sqrt(distance) / radius / 2)
-    factor[factor > 0] = factor[factor > 0] ** -amount
-    factor[factor < 0] = -((-factor[factor < 0]) ** -amount)
-    flex_x[pmask] = factor[pmask] * delta_x[pmask] / scale[X] + center[X]
-    flex_y[pmask] = factor[pmask] * delta_y[pmask] / scale[Y] + center[Y]
-
-    flex_x[~pmask] = 1.0 * delta_x[~pmask] / scale[X] + center[X]
-    flex_y[~pmask] = 1.0 * delta_y[~pmask] / scale[Y] + center[Y]
-
-    # Perform the pinch using the maps and return.
-    return cv2.remap(a, flex_x, flex_y, cv2.INTER_LINEAR)
+    remap = _pinch_remap(a.shape[:2], amount, radius, scale, offset, quality)
+    return _remap(a, *remap)
 
 
+@instrumented
+@remaps(_polar_to_linear_remap)
 @processes_by_grayscale_frame
-@will_square
+@handles_channels(lambda **_: MAX_CHANNELS)
 def filter_polar_to_linear(a: ImgAry) -> ImgAry:
     """Convert the polar coordinates of the image data to
     linear coordinates.
@@ -362,19 +762,28 @@ def filter_polar_to_linear(a: ImgAry) -> ImgAry:
     :param a: The image data to alter.
     :returns: A :class:`np.ndarray` object.
     :rtype: numpy.ndarray
+
+    .. note::
+       If the X and Y axes of the image are not the same size, the
+       image is transformed as if it were centered in a square image
+       with a black background, and then cropped back to its original
+       size.
     """
-    center = tuple(n / 2 for n in a.shape)
-    max_radius = np.sqrt(sum(n ** 2 for n in center))
-    return cv2.linearPolar(a, center, max_radius, cv2.WARP_FILL_OUTLIERS)
+    return _remap(a, *_polar_to_linear_remap(a.shape[:2]))
 
 
+@instrumented
+@has_identity(lambda a, amp, **_: not np.any(amp))
+@remaps(_ripple_remap)
 @processes_by_grayscale_frame
+@handles_channels(_remap_channels)
 def filter_ripple(
     a: ImgAry,
     wave: Sequence[float],
     amp: Sequence[float],
     distaxis: Sequence[int],
-    offset: Loc = (0, 0, 0)
+    offset: Loc = (0, 0, 0),
+    quality: Optional[str] = None
 ) -> ImgAry:
     """Perform a ripple distortion.
 
@@ -399,33 +808,19 @@ def filter_ripple(
         of the ripples in the image. There needs to be one value
         in the sequence per dimension in the image. The default
         value for all dimensions is zero.
+    :param quality: (Optional.) How to interpolate between pixels.
+        Defaults to the `quality` setting. See :mod:`imgfilt.settings`.
     :returns: A :class:`np.ndarray` object.
     :rtype: numpy.ndarray
     """
-    # Map out the volume of the given image and make sure everything is
-    # in float32 to keep the cv2.remap function happy.
-    flex = np.indices(a.shape, np.float32)
-    flex_x = flex[X].copy()
-    flex_y = flex[Y].copy()
-
-    # Modify the mapping to apply the ripple to create the flex
-    # maps for cv.remap. The flex map value for each pixel will
-    # indicate how far that pixel moves in the remapped image.
-    *_, da_x, da_y = distaxis
-    *_, off_y, off_x = offset
-    if wave[X]:
-        flex_x = np.cos((off_x + flex[da_x]) / wave[X] * 2 * np.pi)
-        flex_x = flex[X] + flex_x * amp[X]
-    if wave[Y]:
-        flex_y = np.cos((off_y + flex[da_y]) / wave[Y] * 2 * np.pi)
-        flex_y = flex[Y] + flex_y * amp[Y]
-
-    # Remap the color values in the original image using the
-    # rippled flex map.
-    return cv2.remap(a, flex_x, flex_y, cv2.INTER_LINEAR)
-
-
-def filter_rotate_90(a: ImgAry, direction: str = 'cw') -> ImgAry:
+    remap = _ripple_remap(a.shape[:2], wave, amp, distaxis, offset, quality)
+    return _remap(a, *remap)
+
+
+@instrumented
+def filter_rotate_90(
+    a: ImgAry, direction: str = 'cw', out: Optional[ImgAry] = None
+) -> ImgAry:
     """Rotate the data 90° around the Z axis.
 
     .. figure:: images/filter_rotate_90.jpg
@@ -436,17 +831,92 @@ def filter_rotate_90(a: ImgAry, direction: str = 'cw') -> ImgAry:
     :param a: The image data to alter.
     :param direction: (Optional.) Whether to rotate the data
         clockwise or counter clockwise.
+    :param out: (Optional.) An array to write the result into one
+        frame at a time. See :ref:`memmap`.
     :returns: An array of image data.
     :rtype: A :class:numpy.ndarray object.
     """
     spin = -1
     if direction in ['ccw', 'counter clockwise', 'l', 'left']:
         spin = 1
-    return np.rot90(a, spin, (Y, X))
+    rotated = np.rot90(a, spin, (Y, X))
+    if out is not None:
+        return write_frames(out, rotated)
+    return rotated
 
 
+@instrumented
+def filter_shrink(
+    a: ImgAry,
+    factor: float,
+    out: Optional[ImgAry] = None
+) -> ImgAry:
+    """Decrease the size of an image, averaging the pixels that are
+    merged together so the result doesn't alias.
+
+    :param a: The image data to alter. This can be a single image,
+        a video, or a video with color channels as the last axis.
+    :param factor: The scaling factor to use when decreasing the
+        size of the image. It must be greater than zero and at most
+        one.
+    :param out: (Optional.) An array to write the result into one
+        frame at a time. See :ref:`memmap`.
+    :returns: A :class:`np.ndarray` object.
+    :rtype: numpy.ndarray
+
+    Unlike :func:`filter_grow`, only the height and width are
+    changed. When the factor divides the height and width evenly,
+    each block of pixels is averaged with :data:`cv2.INTER_AREA`.
+    Other large reductions first halve the image with
+    :func:`cv2.pyrDown` until it is less than twice the final size.
+    This is much faster than shrinking with several passes of
+    :func:`filter_grow`, and each frame is only read once.
+    """
+    if not 0 < factor <= 1:
+        raise ValueError('factor must be greater than 0 and at most 1.')
+    if len(a.shape) == 2:
+        size = _shrunk_size(a.shape, factor)
+        if out is None:
+            return _shrink_frame(a, size)
+        out[...] = _shrink_frame(a, size)
+        return out
+
+    size = _shrunk_size(a.shape[1:3], factor)
+    frames = (_shrink_frame(frame, size) for frame in a)
+    if out is None:
+        out = np.empty((len(a), *size, *a.shape[3:]), dtype=a.dtype)
+    return write_frames(out, frames)
+
+
+def _shrink_frame(frame: np.ndarray, size: tuple[int, int]) -> np.ndarray:
+    """Shrink one frame, which may have color channels, to the
+    given height and width.
+    """
+    # OpenCV averages whole blocks of pixels quickly, but other
+    # reductions are faster after halving the frame with pyramids.
+    height, width = size
+    while (
+        (frame.shape[0] % height or frame.shape[1] % width)
+        and frame.shape[0] >= height * 2
+        and frame.shape[1] >= width * 2
+    ):
+        frame = cv2.pyrDown(frame)
+    return cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def _shrunk_size(shape: Sequence[int], factor: float) -> tuple[int, int]:
+    """Find the height and width of a shrunk frame."""
+    height, width = (max(1, int(n * factor)) for n in shape)
+    return height, width
+
+
+@instrumented
+@has_identity(lambda a, slope, **_: slope == 0)
 @processes_by_grayscale_frame
-def filter_skew(a: ImgAry, slope: float) -> ImgAry:
+@handles_channels(_remap_channels)
+def filter_skew(
+    a: ImgAry, slope: float, quality: Optional[str] = None
+) -> ImgAry:
     """Perform a skew distort on the data.
 
     .. figure:: images/filter_skew.jpg
@@ -456,40 +926,31 @@ def filter_skew(a: ImgAry, slope: float) -> ImgAry:
     
     :param a: The image data to alter.
     :param slope: The slope of the Y axis of the image after the skew.
+    :param quality: (Optional.) How to interpolate between pixels.
+        Defaults to the `quality` setting. See :mod:`imgfilt.settings`.
     :returns: A :class:`np.ndarray` object.
     :rtype: numpy.ndarray
     """
-    # Create the transform matrix by defining three points in the
-    # original image, and then showing where they move to in the
-    # new, transformed image. The order of the axes is reversed
-    # for this in comparison to how it's generally used in pjinoise.
-    # This is due to the implementation of OpenCV.
-    original = np.array([
-        [0, 0],
-        [a.shape[X] - 1, 0],
-        [0, a.shape[Y] - 1],
-    ], dtype=np.float32)
-    new = np.array([
-        [0, 0],
-        [a.shape[X] - 1, 0],
-        [(a.shape[Y] - 1) * slope, a.shape[Y] - 1],
-    ], dtype=np.float32)
-
     # Perform the transform on the image by first creating a warp
-    # matrix from the example points. Then apply that matrix to
-    # the image, telling OpenCV to wrap pixels that are pushed off
-    # the edge of the image.
-    matrix = cv2.getAffineTransform(original, new)
-    return cv2.warpAffine(a, matrix, (a.shape[X], a.shape[Y]),
+    # matrix from example points. Then apply that matrix to the
+    # image, telling OpenCV to wrap pixels that are pushed off the
+    # edge of the image.
+    size = a.shape[:2]
+    matrix = _skew_matrix(size, slope)
+    flags = CV2_INTERPOLATION[get_quality(quality)]
+    return cv2.warpAffine(a, matrix, (size[X], size[Y]), flags=flags,
                           borderMode=cv2.BORDER_WRAP)
 
 
+@instrumented
+@has_identity(lambda a, strength, **_: strength == 0)
 @processes_by_grayscale_frame
 def filter_twirl(
     a: ImgAry,
     radius: float,
     strength: float,
-    offset: tuple[int, int] = (0, 0)
+    offset: tuple[int, int] = (0, 0),
+    quality: Optional[str] = None
 ) -> ImgAry:
     """Swirl the image data.
 
@@ -506,12 +967,81 @@ def filter_twirl(
         around the center of the distortion.
     :param offset: (Optional.) How far to offset the center of the
         distortion from the center of the image.
+    :param quality: (Optional.) How to interpolate between pixels.
+        Defaults to the `quality` setting. See :mod:`imgfilt.settings`.
     :returns: A :class:`np.ndarray` object.
     :rtype: numpy.ndarray
+
+    .. note::
+       The twirl is interpolated with splines, so the "cubic" and
+       "lanczos" qualities use third and fifth order splines.
     """
     # Determine the location of the center of the twirl effect.
     center = [n / 2 + o for n, o in zip(a.shape, offset)]
-    return sktf.swirl(a, center[::-1], strength, radius)
+    map_x, map_y = twirl_maps(a.shape, strength, radius, center)
+    order = SPLINE_ORDERS[get_quality(quality)]
+    return sktf.warp(
+        a, np.array([map_y, map_x]), order=order, mode='reflect'
+    )
+
+
+# Utility functions.
+def _gaussian_halo(sigma: float) -> int:
+    """Find how far a gaussian blur reads past each pixel, with
+    either gaussian engine.
+    """
+    if sigma <= 0:
+        return 0
+    exact = int(round(sigma * 8 + 1)) // 2
+    boxes = sum(size // 2 for size in gaussian_boxes(sigma))
+    return max(exact, boxes)
+
+
+def _glow_halo(sigma: int) -> int:
+    """Find how far the blurs of :func:`filter_glow` read past each
+    pixel, following how it reduces its sigma.
+    """
+    halo = 0
+    while sigma > 0:
+        if sigma % 2 != 1:
+            sigma -= 1
+        halo += _gaussian_halo(sigma)
+        sigma = sigma // 2
+    return halo
+
+
+def _is_in_range(a: ImgAry, black: float, white: float) -> bool:
+    """Find whether image data already fills the range that
+    :func:`filter_contrast` would scale it to. When it doesn't, the
+    range is kept for the call to the filter that follows.
+    """
+    a_min, a_max = float(np.min(a)), float(np.max(a))
+    in_range = a_min == black and a_max == white
+    _checked.range = None if in_range else (weakref.ref(a), a_min, a_max)
+    return in_range
+
+
+def _range(a: ImgAry) -> tuple[float, float]:
+    """Find the minimum and maximum of image data for
+    :func:`filter_contrast`, reusing them if :func:`_is_in_range`
+    just found them for the same array.
+    """
+    checked = getattr(_checked, 'range', None)
+    _checked.range = None
+    if checked is not None and checked[0]() is a:
+        return checked[1], checked[2]
+    return float(np.min(a)), float(np.max(a))
+
+
+def _stack_frames(
+    frames: Iterator[ImgAry], out: Optional[ImgAry] = None
+) -> ImgAry:
+    """Collect filtered frames into an array, or write them into the
+    output if there is one.
+    """
+    if out is not None:
+        return write_frames(out, frames)
+    return np.array(list(frames))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,235 @@
+"""
+instrument
+~~~~~~~~~~
+
+Opt-in timing of filters and the work done by their decorators.
+"""
+import json
+import os
+import threading
+from functools import wraps
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, NamedTuple, Optional, Union
+
+import numpy as np
+
+
+# Types.
+Filter = Callable
+
+
+# The recorders currently collecting records. The hooks in the filters
+# only check whether this is empty when nothing is being recorded.
+_recorders: list['Recorder'] = []
+
+
+# Classes.
+class Record(NamedTuple):
+    """A measurement of one piece of work done while filtering.
+
+    :param name: The name of the filter or decorator.
+    :param category: Either "filter" for the whole filter call or
+        "decorator" for work done by a decorator around the filter.
+    :param step: What the decorator was doing, such as "to uint8".
+        This is empty for filters.
+    :param start: When the work started, in seconds from an
+        arbitrary point. Only useful compared to other records.
+    :param duration: The wall time of the work in seconds.
+    :param frames: The number of frames in the input.
+    :param nbytes: The size in bytes of the array allocated for
+        the result.
+    :param dtype_in: The data type of the input.
+    :param dtype_out: The data type of the result.
+    :param thread: The identifier of the thread doing the work.
+    """
+    name: str
+    category: str
+    step: str
+    start: float
+    duration: float
+    frames: int
+    nbytes: int
+    dtype_in: str
+    dtype_out: str
+    thread: int
+
+
+class Recorder:
+    """Collects :class:`Record` objects while it is active. Use
+    :func:`record` to create one.
+    """
+    def __init__(self) -> None:
+        self.records: list[Record] = []
+
+    def __enter__(self) -> 'Recorder':
+        _recorders.append(self)
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        _recorders.remove(self)
+
+    def summary(self) -> dict[str, float]:
+        """Total the wall time spent in each filter and decorator
+        step.
+
+        :returns: A :class:`dict` of total seconds keyed by name.
+        :rtype: dict
+        """
+        totals: dict[str, float] = {}
+        for rec in self.records:
+            key = f'{rec.name} ({rec.step})' if rec.step else rec.name
+            totals[key] = totals.get(key, 0.0) + rec.duration
+        return totals
+
+    def to_chrome_trace(self) -> dict[str, Any]:
+        """Convert the records to the Chrome trace event format, which
+        can be viewed in chrome://tracing or Perfetto.
+
+        :returns: A :class:`dict` that can be serialized to JSON.
+        :rtype: dict
+        """
+        pid = os.getpid()
+        events = []
+        for rec in self.records:
+            name = f'{rec.name} ({rec.step})' if rec.step else rec.name
+            events.append({
+                'name': name,
+                'cat': rec.category,
+                'ph': 'X',
+                'ts': rec.start * 1e6,
+                'dur': rec.duration * 1e6,
+                'pid': pid,
+                'tid': rec.thread,
+                'args': {
+                    'frames': rec.frames,
+                    'nbytes': rec.nbytes,
+                    'dtype_in': rec.dtype_in,
+                    'dtype_out': rec.dtype_out,
+                },
+            })
+        return {'traceEvents': events}
+
+    def dump_chrome_trace(self, path: Union[str, Path]) -> None:
+        """Save the records as a Chrome trace JSON file.
+
+        :param path: Where to save the file.
+        :returns: `None`.
+        :rtype: NoneType
+        """
+        with open(path, 'w') as fh:
+            json.dump(self.to_chrome_trace(), fh)
+
+
+class Span:
+    """Times a piece of work and sends the result to the active
+    recorders. Use :func:`span` to create one.
+    """
+    __slots__ = ('name', 'category', 'step', 'a', 'out', 'start')
+
+    def __init__(
+        self, name: str, category: str, step: str, a: np.ndarray
+    ) -> None:
+        self.name = name
+        self.category = category
+        self.step = step
+        self.a = a
+        self.out: Optional[np.ndarray] = None
+
+    def __enter__(self) -> 'Span':
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        duration = perf_counter() - self.start
+        a, out = self.a, self.out
+        rec = Record(
+            self.name,
+            self.category,
+            self.step,
+            self.start,
+            duration,
+            a.shape[0] if a.ndim > 2 else 1,
+            out.nbytes if isinstance(out, np.ndarray) else 0,
+            str(a.dtype),
+            str(out.dtype) if isinstance(out, np.ndarray) else '',
+            threading.get_ident()
+        )
+        for recorder in list(_recorders):
+            recorder.records.append(rec)
+
+    def result(self, out: np.ndarray) -> np.ndarray:
+        """Note the result of the work."""
+        self.out = out
+        return out
+
+
+class _NullSpan:
+    """Stands in for a :class:`Span` when nothing is recording."""
+    __slots__ = ()
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+    def result(self, out: np.ndarray) -> np.ndarray:
+        return out
+
+
+_NULL_SPAN = _NullSpan()
+
+
+# Functions.
+def record() -> Recorder:
+    """Record the timing of filters run within the context.
+
+    :returns: A :class:`Recorder` object.
+    :rtype: imgfilt.instrument.Recorder
+
+    Usage::
+
+        >>> import numpy as np
+        >>> import imgfilt
+        >>>
+        >>> a = np.zeros((2, 4, 4))
+        >>> with record() as recorder:
+        ...     _ = imgfilt.filter_box_blur(a, size=2)
+        >>> for rec in recorder.records:
+        ...     print(rec.name, rec.step, rec.frames, rec.nbytes)
+        processes_by_grayscale_frame stack frames 2 256
+        box_blur  2 256
+    """
+    return Recorder()
+
+
+def span(
+    name: str, step: str, a: np.ndarray, category: str = 'decorator'
+) -> Union[Span, _NullSpan]:
+    """Time a piece of work if anything is recording.
+
+    :param name: The name of the filter or decorator doing the work.
+    :param step: What is being done.
+    :param a: The array being worked on.
+    :param category: (Optional.) The category of the work.
+    :returns: A context manager that times the work.
+    :rtype: imgfilt.instrument.Span
+    """
+    if not _recorders:
+        return _NULL_SPAN
+    return Span(name, category, step, a)
+
+
+# Decorators.
+def instrumented(fn: Filter) -> Filter:
+    """Time each call of the filter when something is recording."""
+    name = fn.__name__.replace('filter_', '', 1)
+
+    @wraps(fn)
+    def wrapper(a: np.ndarray, *args, **kwargs) -> np.ndarray:
+        if not _recorders:
+            return fn(a, *args, **kwargs)
+        with Span(name, 'filter', '', a) as s:
+            return s.result(fn(a, *args, **kwargs))
+    return wrapper
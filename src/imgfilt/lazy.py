@@ -0,0 +1,331 @@
+"""
+lazy
+~~~~
+
+Deferred filtering, where only the part of the result that is used
+gets computed.
+
+A lazy graph records the filters to apply to image data without
+applying them. Slicing the graph records the slice. When the graph is
+computed, the region that was sliced is traced back through the
+filters to find the region of the image data each of them needs, so
+filters only work on the pixels that affect the result:
+
+*   Filters marked with :func:`imgfilt.utility.has_halo` need the
+    region and the margin of pixels around it that they read.
+*   Filters marked with :func:`imgfilt.utility.remaps` need the part
+    of the image their coordinate maps point to within the region.
+*   Filters that work one frame at a time only need the frames in
+    the region.
+
+Any other filter is applied to all of its input.
+
+Usage::
+
+    >>> import numpy as np
+    >>>
+    >>> a = np.arange(16).reshape((4, 4)) / 16
+    >>> node = lazy(a).filter('inverse').filter('box_blur', size=2)
+    >>> node[2:, :2].compute()
+    array([[0.59375, 0.59375],
+           [0.34375, 0.34375]])
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Optional, Union
+
+import numpy as np
+from numpy.typing import NDArray
+
+from imgfilt.backends import remap
+from imgfilt.maps import crop_maps
+from imgfilt.pipeline import get_filter
+from imgfilt.utility import Filter, X, Y
+
+
+# Types.
+Box = tuple[tuple[int, int], ...]
+ImgAry = NDArray[np.float_]
+Key = Any
+
+
+# Classes.
+class Node(ABC):
+    """A step in a lazy graph. Use :func:`lazy` to start a graph.
+
+    Nodes can be sliced with integers and slices with a positive
+    step, like arrays, which gives a node for that part of the
+    result. Subclasses must define :attr:`shape` and :meth:`region`.
+    """
+    def __array__(self, dtype: Optional[np.dtype] = None) -> ImgAry:
+        a = self.compute()
+        return a if dtype is None else a.astype(dtype)
+
+    def __getitem__(self, key: Key) -> 'Crop':
+        return Crop(self, key)
+
+    @property
+    @abstractmethod
+    def shape(self) -> tuple[int, ...]:
+        """The shape of the result."""
+
+    def compute(self) -> ImgAry:
+        """Compute the result.
+
+        :returns: A :class:`numpy.ndarray` object.
+        :rtype: numpy.ndarray
+        """
+        return self.region(tuple((0, n) for n in self.shape))
+
+    def filter(self, filter: Union[str, Filter], **kwargs: Any) -> 'Apply':
+        """Add a filter to the graph.
+
+        :param filter: The filter or its name in :data:`imgfilt.filters`.
+        :param kwargs: The parameters to pass to the filter.
+        :returns: A :class:`Node` for the result of the filter.
+        :rtype: imgfilt.lazy.Apply
+        """
+        if isinstance(filter, str):
+            filter = get_filter(filter)
+        return Apply(self, filter, kwargs)
+
+    @abstractmethod
+    def region(self, box: Box) -> ImgAry:
+        """Compute part of the result.
+
+        :param box: The start and stop of the part along each axis.
+        :returns: A :class:`numpy.ndarray` object.
+        :rtype: numpy.ndarray
+        """
+
+
+class Source(Node):
+    """Image data at the start of a lazy graph.
+
+    :param a: The image data.
+    """
+    def __init__(self, a: ImgAry) -> None:
+        self.a = a
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}(<{self.a.shape} array>)'
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        return self.a.shape
+
+    def region(self, box: Box) -> ImgAry:
+        return self.a[tuple(slice(*span) for span in box)]
+
+
+class Apply(Node):
+    """A filter applied to the result of another node.
+
+    :param source: The node with the data to filter.
+    :param fn: The filter.
+    :param kwargs: The parameters to pass to the filter.
+    """
+    def __init__(
+        self, source: Node, fn: Filter, kwargs: dict[str, Any]
+    ) -> None:
+        self.source = source
+        self.fn = fn
+        self.kwargs = kwargs
+        self._result: Optional[ImgAry] = None
+
+    def __repr__(self) -> str:
+        name = self.fn.__name__
+        params = ''.join(f', {k}={v!r}' for k, v in self.kwargs.items())
+        return f'{type(self).__name__}({self.source!r}, {name}{params})'
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        if self._local:
+            return self.source.shape + self._channels
+        return self._computed().shape
+
+    @property
+    def _local(self) -> bool:
+        """Whether part of the result can be found from part of the
+        source.
+        """
+        return hasattr(self.fn, 'halo') or hasattr(self.fn, 'remap')
+
+    @property
+    def _channels(self) -> tuple[int, ...]:
+        """The shape of the color channels the filter adds."""
+        channels: Optional[int] = getattr(self.fn, 'channels', None)
+        return () if channels is None else (channels,)
+
+    def region(self, box: Box) -> ImgAry:
+        if not self._local:
+            return self._computed()[tuple(slice(*span) for span in box)]
+
+        # Color channels added by the filter are taken from the result
+        # after the rest of the box is filtered.
+        shape = self.source.shape
+        box, channels = box[:len(shape)], box[len(shape):]
+        keep = tuple(slice(None) for _ in box)
+        keep += tuple(slice(*span) for span in channels)
+
+        # Frames are only independent if the filter works on one
+        # frame at a time.
+        by_frame = getattr(self.fn, 'by_frame', False)
+        needed = [span if by_frame else (0, n) for span, n in zip(box, shape)]
+        if hasattr(self.fn, 'halo'):
+            return self._halo_region(box, needed)[keep]
+        return self._remap_region(box, needed)[keep]
+
+    def _computed(self) -> ImgAry:
+        """Apply the filter to all of the source."""
+        if self._result is None:
+            self._result = self.fn(self.source.compute(), **self.kwargs)
+        return self._result
+
+    def _halo_region(
+        self, box: Box, needed: list[tuple[int, int]]
+    ) -> ImgAry:
+        """Filter the region plus the margin the filter reads."""
+        halo: Callable[..., int] = getattr(self.fn, 'halo')
+        margin = halo(**self.kwargs)
+        shape = self.source.shape
+        for axis in Y, X:
+            start, stop = box[axis]
+            needed[axis] = (
+                max(start - margin, 0), min(stop + margin, shape[axis])
+            )
+        a = self.source.region(tuple(needed))
+        filtered = self.fn(a, **self.kwargs)
+        return filtered[_within(box, tuple(needed))]
+
+    def _remap_region(
+        self, box: Box, needed: list[tuple[int, int]]
+    ) -> ImgAry:
+        """Remap the region from the part of the source it comes from."""
+        shape = self.source.shape
+        size = shape[Y], shape[X]
+        remap: Callable[..., tuple] = getattr(self.fn, 'remap')
+        map_x, map_y, interpolation, border = remap(size, **self.kwargs)
+        (top, bottom), (left, right) = box[Y], box[X]
+        map_x, map_y, part = crop_maps(
+            map_x, map_y, (top, left, bottom, right), border
+        )
+        y0, x0, y1, x1 = part
+        needed[Y], needed[X] = (y0, y1), (x0, x1)
+
+        a = self.source.region(tuple(needed))
+        count = int(np.prod(a.shape[:-2]))
+        frames = a.reshape((count, *a.shape[-2:]))
+        remapped = [
+            _remap_frame(frame, map_x, map_y, interpolation, border)
+            for frame in frames
+        ]
+        result = np.array(remapped)
+        result = result.reshape((*a.shape[:-2], *map_x.shape[:2]))
+        return result[_within(box[:-2], tuple(needed[:-2]))]
+
+
+class Crop(Node):
+    """Part of the result of another node.
+
+    :param source: The node to take part of.
+    :param key: The index of the part, like an index of an array.
+    """
+    def __init__(self, source: Node, key: Key) -> None:
+        self.source = source
+        self.key = key
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.source!r}, {self.key!r})'
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        return tuple(
+            len(range(*index))
+            for index in self._indices()
+            if not isinstance(index, int)
+        )
+
+    def region(self, box: Box) -> ImgAry:
+        spans, steps = [], []
+        spans_left = iter(box)
+        for index in self._indices():
+            if isinstance(index, int):
+                spans.append((index, index + 1))
+                steps.append(0)
+                continue
+            start, _, step = index
+            first, last = next(spans_left)
+            if last <= first:
+                spans.append((start, start))
+            else:
+                stop = start + (last - 1) * step + 1
+                spans.append((start + first * step, stop))
+            steps.append(step)
+        a = self.source.region(tuple(spans))
+        return a[tuple(
+            0 if step == 0 else slice(None, None, step) for step in steps
+        )]
+
+    def _indices(self) -> list[Union[int, tuple[int, int, int]]]:
+        """Resolve the key to an integer or a start, stop, and step
+        for each axis of the source.
+        """
+        key = self.key if isinstance(self.key, tuple) else (self.key,)
+        shape = self.source.shape
+        if Ellipsis in key:
+            i = key.index(Ellipsis)
+            fill = (slice(None),) * (len(shape) - len(key) + 1)
+            key = key[:i] + fill + key[i + 1:]
+        key = key + (slice(None),) * (len(shape) - len(key))
+        if len(key) != len(shape):
+            raise IndexError(f'Too many indices for shape {shape}.')
+
+        indices: list[Union[int, tuple[int, int, int]]] = []
+        for index, size in zip(key, shape):
+            if isinstance(index, slice):
+                start, stop, step = index.indices(size)
+                if step < 1:
+                    raise IndexError('Lazy slices must have a positive step.')
+                stop = max(stop, start)
+                indices.append((start, stop, step))
+            elif isinstance(index, (int, np.integer)):
+                if not -size <= index < size:
+                    raise IndexError(f'Index {index} is out of bounds.')
+                indices.append(int(index) % size)
+            else:
+                msg = f'Lazy nodes can only be sliced, not {index!r}.'
+                raise IndexError(msg)
+        return indices
+
+
+# Functions.
+def lazy(a: ImgAry) -> Source:
+    """Start a lazy graph on the given image data.
+
+    :param a: The image data.
+    :returns: A :class:`Node` for the data.
+    :rtype: imgfilt.lazy.Source
+    """
+    return Source(a)
+
+
+# Utility functions.
+def _remap_frame(
+    frame: ImgAry,
+    map_x: np.ndarray,
+    map_y: Optional[np.ndarray],
+    interpolation: int,
+    border: int
+) -> ImgAry:
+    """Remap a frame, handling regions with no pixels."""
+    if not map_x.size:
+        return np.zeros(map_x.shape[:2], dtype=frame.dtype)
+    return remap(frame, map_x, map_y, interpolation, border)
+
+
+def _within(box: Box, needed: Box) -> tuple[slice, ...]:
+    """Find where a box is within a larger box that contains it."""
+    return tuple(
+        slice(start - outer, stop - outer)
+        for (start, stop), (outer, _) in zip(box, needed)
+    )
@@ -0,0 +1,459 @@
+"""
+maps
+~~~~
+
+Coordinate maps for the filters that remap the pixels of an image.
+Maps only depend on the shape of the image and the parameters of the
+filter, so they are cached and reused for every frame of a video.
+
+The pinch and twirl maps can be calculated on a coarse grid and
+upsampled to the size of the image, which is much faster for large
+images. How coarse the grid is comes from the `map_resolution`
+setting, see :mod:`imgfilt.settings`. :func:`map_error` measures how
+far the upsampled maps are from the exact ones.
+
+:func:`crop_maps` cuts maps down to a region of the result and finds
+the part of the image that region reads, so a region can be remapped
+without the rest of the image.
+"""
+from math import ceil
+from typing import Callable, Optional, Sequence
+
+import cv2
+import numpy as np
+from numpy.typing import NDArray
+
+from imgfilt.settings import get_settings
+from imgfilt.utility import shared_cache
+
+
+# Types.
+Map = NDArray[np.float32]
+Pair = tuple[float, float]
+Field = Callable[..., tuple[NDArray, NDArray]]
+
+
+# Map caching.
+def _freeze(map_x: Map, map_y: Map) -> tuple[Map, Map]:
+    """Make cached maps read only, so they can be shared safely."""
+    map_x.flags.writeable = False
+    map_y.flags.writeable = False
+    return map_x, map_y
+
+
+def _square_offsets(shape: tuple[int, int]) -> tuple[int, int, int]:
+    """Find the size of the square that would contain an image of
+    the given shape, and the offsets of the image within it.
+    """
+    height, width = shape
+    size = max(height, width)
+    return size, (size - height) // 2, (size - width) // 2
+
+
+# Polar maps.
+@shared_cache(maxsize=32)
+def linear_to_polar_maps(shape: tuple[int, int]) -> tuple[Map, Map]:
+    """Build the maps used by :func:`imgfilt.filter_linear_to_polar`.
+
+    The transform treats the image as if it were centered in a
+    square, zero-filled image, like :func:`cv2.warpPolar` would
+    need. Instead of building that square image, the maps point
+    straight into the original image, and anything that would have
+    come from the padding is filled by the border of the remap.
+
+    The filter samples the nearest pixel, so the maps are rounded to
+    whole pixels in the coordinates of the square before they are
+    moved into the coordinates of the image. Otherwise, moving them
+    could change which way halfway values round.
+
+    :param shape: The shape of the image.
+    :returns: The X and Y maps.
+    :rtype: tuple
+    """
+    size, y_off, x_off = _square_offsets(shape)
+    height, width = shape
+    center = size / 2
+    k_mag = np.sqrt(2 * center ** 2) / size
+    k_angle = 2 * np.pi / size
+
+    # Use OpenCV's own math, so the result matches cv2.warpPolar.
+    x = np.arange(x_off, x_off + width, dtype=np.float32) - center
+    y = np.arange(y_off, y_off + height, dtype=np.float32) - center
+    x, y = np.broadcast_arrays(x[np.newaxis, :], y[:, np.newaxis])
+    mag, angle = cv2.cartToPolar(
+        np.ascontiguousarray(x), np.ascontiguousarray(y)
+    )
+    rho = (mag.astype(float) / k_mag).astype(np.float32)
+    phi = (angle.astype(float) / k_angle).astype(np.float32)
+    map_x = np.rint(rho)
+    map_y = np.rint(phi + np.float32(1)) - 1
+
+    # The angle wraps around, so cv2.warpPolar wraps the bottom of the
+    # square back to the top.
+    map_y[map_y == size] = 0
+    map_x -= x_off
+    map_y -= y_off
+    return _freeze(map_x.astype(np.float32), map_y.astype(np.float32))
+
+
+@shared_cache(maxsize=32)
+def polar_to_linear_maps(shape: tuple[int, int]) -> tuple[Map, Map]:
+    """Build the maps used by :func:`imgfilt.filter_polar_to_linear`.
+    As with :func:`linear_to_polar_maps`, the image is treated as if
+    it were centered in a square without the square being built.
+
+    :param shape: The shape of the image.
+    :returns: The X and Y maps.
+    :rtype: tuple
+    """
+    size, y_off, x_off = _square_offsets(shape)
+    height, width = shape
+    center = size / 2
+    k_mag = np.sqrt(2 * center ** 2) / size
+    k_angle = 2 * np.pi / size
+
+    rho = (np.arange(x_off, x_off + width) * k_mag).astype(np.float32)
+    phi = np.arange(y_off, y_off + height) * k_angle
+    map_x = rho * np.cos(phi)[:, np.newaxis] + center
+    map_y = rho * np.sin(phi)[:, np.newaxis] + center
+    map_x = np.rint(map_x.astype(np.float32)) - x_off
+    map_y = np.rint(map_y.astype(np.float32)) - y_off
+    return _freeze(map_x.astype(np.float32), map_y.astype(np.float32))
+
+
+# Distortion maps.
+def pinch_maps(
+    shape: Sequence[int],
+    amount: float,
+    radius: float,
+    scale: Sequence[float],
+    center: Sequence[float],
+    resolution: Optional[float] = None,
+    fixed: bool = False
+) -> tuple[Map, Map]:
+    """Build the maps used by :func:`imgfilt.filter_pinch`.
+
+    :param shape: The shape of the image.
+    :param amount: How much the image should be distorted.
+    :param radius: The outside edge of the distortion.
+    :param scale: The scale of the distortion in (Y, X) order.
+    :param center: The center of the distortion in (Y, X) order.
+    :param resolution: (Optional.) The resolution of the grid the
+        maps are calculated on. Defaults to the `map_resolution`
+        setting.
+    :param fixed: (Optional.) Whether to return the maps in fixed
+        point for nearest neighbor sampling. See :func:`fixed_point`.
+    :returns: The X and Y maps.
+    :rtype: tuple
+    """
+    build = _build_fixed if fixed else _build
+    return build(
+        _pinch_field, _shape(shape), _step(resolution),
+        float(amount), float(radius), _pair(scale), _pair(center)
+    )
+
+
+def ripple_maps(
+    shape: Sequence[int],
+    wave: Sequence[float],
+    amp: Sequence[float],
+    distaxis: Sequence[int],
+    offset: Sequence[float],
+    fixed: bool = False
+) -> tuple[Map, Map]:
+    """Build the maps used by :func:`imgfilt.filter_ripple`. The
+    parameters are the same as the filter's.
+
+    Each displacement only changes along the axis it is distorted
+    along, so it is calculated once for each row or column and then
+    broadcast across the image. That is already cheaper than
+    upsampling a coarse map, so these maps ignore the
+    `map_resolution` setting.
+
+    :param shape: The shape of the image.
+    :param wave: The distance between peaks in the distortion.
+    :param amp: The amount of change caused by each ripple.
+    :param distaxis: The axes to distort along.
+    :param offset: The offset of the ripples.
+    :param fixed: (Optional.) Whether to return the maps in fixed
+        point for nearest neighbor sampling. See :func:`fixed_point`.
+    :returns: The X and Y maps.
+    :rtype: tuple
+    """
+    *_, da_x, da_y = distaxis
+    build = _build_fixed if fixed else _build
+    return build(
+        _ripple_field, _shape(shape), 1,
+        _pair(wave), _pair(amp), (int(da_y), int(da_x)), _pair(offset)
+    )
+
+
+def twirl_maps(
+    shape: Sequence[int],
+    strength: float,
+    radius: float,
+    center: Sequence[float],
+    resolution: Optional[float] = None
+) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+    """Build the maps used by :func:`imgfilt.filter_twirl`. These
+    use the same math as :func:`skimage.transform.swirl`.
+
+    :param shape: The shape of the image.
+    :param strength: The amount of the distortion.
+    :param radius: The outside edge of the distortion.
+    :param center: The center of the distortion in (Y, X) order.
+    :param resolution: (Optional.) The resolution of the grid the
+        maps are calculated on. Defaults to the `map_resolution`
+        setting.
+    :returns: The X and Y maps.
+    :rtype: tuple
+    """
+    return _build(
+        _twirl_field, _shape(shape), _step(resolution),
+        float(strength), float(radius), _pair(center)
+    )
+
+
+def map_error(
+    builder: Callable[..., tuple[NDArray, NDArray]],
+    shape: Sequence[int],
+    *args,
+    resolution: Optional[float] = None,
+    **kwargs
+) -> float:
+    """Find the largest distance between a map calculated at a lower
+    resolution and the exact map.
+
+    :param builder: The function that builds the maps, such as
+        :func:`pinch_maps`.
+    :param shape: The shape of the image.
+    :param args: The parameters for the builder.
+    :param resolution: (Optional.) The resolution to check. Defaults
+        to the `map_resolution` setting.
+    :param kwargs: The parameters for the builder.
+    :returns: The error in pixels.
+    :rtype: float
+
+    The error is largest where the map changes fastest, such as near
+    the center of a strong pinch, so it should be checked with the
+    parameters that will be used.
+
+    Usage::
+
+        >>> error = map_error(
+        ...     twirl_maps, (1080, 1920), 1.0, 400, (540, 960),
+        ...     resolution=0.25
+        ... )
+        >>> error < 0.1
+        True
+    """
+    exact = builder(shape, *args, resolution=1.0, **kwargs)
+    coarse = builder(shape, *args, resolution=resolution, **kwargs)
+    return max(
+        float(np.max(np.abs(c.astype(float) - e)))
+        for c, e in zip(coarse, exact)
+    )
+
+
+def fixed_point(map_x: Map, map_y: Map) -> tuple[NDArray, Optional[NDArray]]:
+    """Convert float maps to the fixed point format OpenCV uses for
+    nearest neighbor sampling. The converted maps are half the size
+    and give the same result from :func:`cv2.remap` with
+    :data:`cv2.INTER_NEAREST` a little faster.
+
+    The fixed point format can't address images larger than 32767
+    pixels along an axis, so maps for those are returned unchanged.
+
+    :param map_x: The X map.
+    :param map_y: The Y map.
+    :returns: The converted maps.
+    :rtype: tuple
+    """
+    if max(map_x.shape) > np.iinfo(np.int16).max:
+        return map_x, map_y
+    fixed, _ = cv2.convertMaps(
+        map_x, map_y, cv2.CV_16SC2, nninterpolation=True
+    )
+    fixed.flags.writeable = False
+    return fixed, None
+
+
+def crop_maps(
+    map_x: NDArray,
+    map_y: Optional[NDArray],
+    region: tuple[int, int, int, int],
+    border: int
+) -> tuple[NDArray, Optional[NDArray], tuple[int, int, int, int]]:
+    """Cut maps down to a region of the result, and find the part of
+    the image the region reads.
+
+    :param map_x: The X map, or the fixed point map.
+    :param map_y: The Y map, or `None` for a fixed point map.
+    :param region: The top, left, bottom, and right of the region.
+    :param border: The border mode the maps are used with.
+    :returns: The maps for the region, moved to read from the part of
+        the image, and the top, left, bottom, and right of the part.
+    :rtype: tuple
+    """
+    height, width = map_x.shape[:2]
+    top, left, bottom, right = region
+    map_x = map_x[top:bottom, left:right]
+    if map_y is None:
+        xs, ys = map_x[..., 0], map_x[..., 1]
+    else:
+        map_y = map_y[top:bottom, left:right]
+        xs, ys = map_x, map_y
+
+    # Pixels outside of a constant border are the border color
+    # whether or not the image was cut down, so only the part of
+    # the image the maps point to is needed. Other borders copy
+    # pixels from the image, so they need all of it.
+    part = (0, 0, height, width)
+    if border == cv2.BORDER_CONSTANT:
+        y0, y1 = _footprint(ys, height)
+        x0, x1 = _footprint(xs, width)
+        part = (y0, x0, y1, x1)
+    y0, x0 = part[:2]
+    if map_y is None:
+        map_x = map_x - np.array([x0, y0], map_x.dtype)
+    else:
+        map_x = map_x - map_x.dtype.type(x0)
+        map_y = map_y - map_y.dtype.type(y0)
+    return map_x, map_y, part
+
+
+@shared_cache(maxsize=32)
+def _build_fixed(
+    field: Field, shape: tuple[int, int], step: int, *params
+) -> tuple[NDArray, Optional[NDArray]]:
+    """Calculate a pair of maps, convert them to fixed point, and
+    cache them.
+    """
+    return fixed_point(*_build(field, shape, step, *params))
+
+
+@shared_cache(maxsize=32)
+def _build(
+    field: Field, shape: tuple[int, int], step: int, *params
+) -> tuple[NDArray, NDArray]:
+    """Calculate a pair of maps and cache them.
+
+    When the step is more than one, the maps are calculated on a grid
+    with that spacing and upsampled with :func:`cv2.resize`. The grid
+    is one cell larger than the image on every side, so the upsampled
+    maps are interpolated everywhere within the image rather than
+    being clamped near the edges.
+    """
+    height, width = shape
+    if step == 1:
+        ys = np.arange(height, dtype=float)[:, np.newaxis]
+        xs = np.arange(width, dtype=float)[np.newaxis, :]
+        map_x, map_y = field(ys, xs, *params)
+
+    else:
+        # The center of the first pixel of the upsampled map lines up
+        # with coarse point -0.5 + 0.5 / step. Putting coarse point 1
+        # at the first pixel of the image means cv2.resize lines the
+        # two up exactly, with a margin of step pixels to trim off.
+        rows = ceil(height / step) + 2
+        cols = ceil(width / step) + 2
+        ys = (np.arange(rows) - 0.5) * step - 0.5
+        xs = (np.arange(cols) - 0.5) * step - 0.5
+        coarse = field(ys[:, np.newaxis], xs[np.newaxis, :], *params)
+        map_x, map_y = (
+            cv2.resize(
+                np.ascontiguousarray(m), (cols * step, rows * step),
+                interpolation=cv2.INTER_LINEAR
+            )[step:step + height, step:step + width]
+            for m in coarse
+        )
+    return _freeze(np.ascontiguousarray(map_x), np.ascontiguousarray(map_y))
+
+
+def _footprint(coords: NDArray, size: int) -> tuple[int, int]:
+    """Find the part of an axis that the given coordinates read,
+    clipped to the axis. The margin covers the pixels read by the
+    widest interpolation.
+    """
+    if not coords.size:
+        return 0, 0
+    low = int(np.floor(np.nanmin(coords))) - 4
+    high = int(np.ceil(np.nanmax(coords))) + 5
+    start, stop = min(max(low, 0), size - 1), min(max(high, 1), size)
+    return start, max(stop, start + 1)
+
+
+def _pair(values: Sequence[float]) -> Pair:
+    """Get the (Y, X) values from a sequence as hashable floats."""
+    return float(values[-2]), float(values[-1])
+
+
+def _shape(shape: Sequence[int]) -> tuple[int, int]:
+    """Get the height and width from a shape as hashable ints."""
+    return int(shape[-2]), int(shape[-1])
+
+
+def _step(resolution: Optional[float]) -> int:
+    """Get the spacing of the grid for a map resolution."""
+    if resolution is None:
+        resolution = get_settings().map_resolution
+    return max(1, round(1 / resolution))
+
+
+# Distortion fields.
+def _pinch_field(
+    ys: NDArray, xs: NDArray, amount: float, radius: float,
+    scale: Pair, center: Pair
+) -> tuple[Map, Map]:
+    """Calculate the pinch maps at the given coordinates."""
+    # Find the distance from each pixel in the image to the center of
+    # the distortion.
+    delta_y = scale[0] * (ys - center[0])
+    delta_x = scale[1] * (xs - center[1])
+    distance = delta_x ** 2 + delta_y ** 2
+
+    # Create maps with the barrel/pincushion formula. Pixels outside
+    # the radius and at the center are not moved.
+    factor = np.sin(np.pi * np.sqrt(distance) / radius / 2)
+    factor[factor > 0] = factor[factor > 0] ** -amount
+    factor[factor < 0] = -((-factor[factor < 0]) ** -amount)
+    inside = (distance > 0.0) & ~(distance >= radius ** 2)
+    factor = np.where(inside, factor, 1.0)
+    map_x = factor * delta_x / scale[1] + center[1]
+    map_y = factor * delta_y / scale[0] + center[0]
+    return map_x.astype(np.float32), map_y.astype(np.float32)
+
+
+def _ripple_field(
+    ys: NDArray, xs: NDArray, wave: Pair, amp: Pair,
+    distaxis: tuple[int, int], offset: Pair
+) -> tuple[Map, Map]:
+    """Calculate the ripple maps at the given coordinates."""
+    indices = (ys.astype(np.float32), xs.astype(np.float32))
+    shape = (ys.shape[0], xs.shape[1])
+    maps = []
+    for axis in (1, 0):
+        moved = indices[axis]
+        if wave[axis]:
+            # The axes are given as indices into the axes of the
+            # image, so -1 and 1 mean X and -2 and 0 mean Y.
+            along = indices[distaxis[axis] % 2]
+            shift = np.cos((offset[axis] + along) / wave[axis] * 2 * np.pi)
+            moved = moved + shift * amp[axis]
+        maps.append(np.broadcast_to(moved, shape))
+    return maps[0], maps[1]
+
+
+def _twirl_field(
+    ys: NDArray, xs: NDArray, strength: float, radius: float,
+    center: Pair
+) -> tuple[NDArray, NDArray]:
+    """Calculate the twirl maps at the given coordinates."""
+    y0, x0 = center
+    rho = np.sqrt((xs - x0) ** 2 + (ys - y0) ** 2)
+
+    # Ensure that the transformation decays to approximately 1/1000-th
+    # within the specified radius.
+    radius = radius / 5 * np.log(2)
+    theta = strength * np.exp(-rho / radius) + np.arctan2(ys - y0, xs - x0)
+    return x0 + rho * np.cos(theta), y0 + rho * np.sin(theta)
@@ -0,0 +1,533 @@
+"""
+pipeline
+~~~~~~~~
+
+Chains of filters that can be defined as data and applied as a unit.
+"""
+import json
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    Mapping,
+    Optional,
+    Sequence,
+    Union
+)
+
+import numpy as np
+from numpy.typing import NDArray
+
+from imgfilt import backends
+from imgfilt import imgfilt as ift
+from imgfilt.maps import crop_maps
+from imgfilt.utility import Filter, X, Y, lerp
+
+
+# Types.
+ImgAry = NDArray[np.float_]
+Region = Sequence[int]
+StepSpec = Mapping[str, Any]
+
+
+# Optional dependencies.
+try:
+    import yaml
+except ImportError:                                     # pragma: no cover
+    yaml = None
+
+
+# Classes.
+class Step:
+    """A single filter in a :class:`Pipeline`.
+
+    :param name: The name of the filter, as used as a key in
+        :data:`imgfilt.filters`.
+    :param roi: (Optional.) Only apply the filter within this region
+        of the image. See :func:`apply_to_region`.
+    :param mask: (Optional.) Only apply the filter where this mask
+        is set. See :func:`apply_to_region`.
+    :param kwargs: The parameters to pass to the filter.
+    :returns: A :class:`Step` object.
+    :rtype: imgfilt.pipeline.Step
+    """
+    def __init__(
+        self,
+        name: str,
+        roi: Optional[Region] = None,
+        mask: Optional[ImgAry] = None,
+        **kwargs: Any
+    ) -> None:
+        self.name = name
+        self.roi = None if roi is None else tuple(roi)
+        self.mask = mask
+        self.kwargs = kwargs
+        self.filter = get_filter(name)
+
+    def __repr__(self) -> str:
+        cls = type(self).__name__
+        params = ''.join(f', {k}={v!r}' for k, v in self.kwargs.items())
+        if self.roi is not None:
+            params += f', roi={self.roi!r}'
+        if self.mask is not None:
+            params += f', mask=<{self.mask.shape} mask>'
+        return f'{cls}({self.name!r}{params})'
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Step):
+            return NotImplemented
+        if self.mask is None or other.mask is None:
+            if self.mask is not other.mask:
+                return False
+        elif not np.array_equal(self.mask, other.mask):
+            return False
+        return (
+            (self.name, self.roi, self.kwargs)
+            == (other.name, other.roi, other.kwargs)
+        )
+
+    def __call__(self, a: ImgAry, inplace: bool = False) -> ImgAry:
+        """Apply the step to image data.
+
+        :param a: The image data to alter.
+        :param inplace: (Optional.) Whether the step can write into
+            the given image data. This only matters when the step
+            has a region or mask.
+        :returns: A :class:`numpy.ndarray` object. If the step's
+            parameters mean the filter wouldn't change the image
+            data, this is the given image data.
+        :rtype: numpy.ndarray
+        """
+        if self.is_identity(a):
+            return a
+        if self.roi is None and self.mask is None:
+            return self.filter(a, **self.kwargs)
+        return apply_to_region(
+            self.filter, a, self.roi, self.mask, inplace, **self.kwargs
+        )
+
+    @property
+    def halo(self) -> Optional[int]:
+        """The margin of pixels around each pixel the step reads, or
+        `None` if the filter doesn't declare its halo.
+        """
+        halo = getattr(self.filter, 'halo', None)
+        return None if halo is None else halo(**self.kwargs)
+
+    def is_identity(self, a: ImgAry) -> bool:
+        """Find whether the step would leave the image data unchanged,
+        from the conditions its filter declares with
+        :func:`imgfilt.utility.has_identity`.
+
+        :param a: The image data the step would alter.
+        :returns: A :class:`bool` object.
+        :rtype: bool
+        """
+        identity = getattr(self.filter, 'identity', None)
+        return identity is not None and identity(a, **self.kwargs)
+
+    @classmethod
+    def from_spec(cls, spec: StepSpec) -> 'Step':
+        """Create a :class:`Step` from a mapping. The mapping must
+        have a "filter" key naming the filter. Any other keys are
+        passed to the filter as parameters.
+        """
+        kwargs = dict(spec)
+        try:
+            name = kwargs.pop('filter')
+        except KeyError:
+            raise ValueError(f'Step has no filter: {spec!r}.')
+        return cls(name, **kwargs)
+
+    def to_spec(self) -> dict[str, Any]:
+        """Serialize the step to a mapping. Masks are arrays, so
+        steps with masks can't be saved as JSON or YAML.
+        """
+        spec = {'filter': self.name, **self.kwargs}
+        if self.roi is not None:
+            spec['roi'] = list(self.roi)
+        if self.mask is not None:
+            spec['mask'] = self.mask
+        return spec
+
+
+class Pipeline:
+    """A sequence of filters applied one after the other.
+
+    :param steps: The :class:`Step` objects to apply, in order.
+    :returns: A :class:`Pipeline` object.
+    :rtype: imgfilt.pipeline.Pipeline
+
+    Usage::
+
+        >>> import numpy as np
+        >>>
+        >>> pipeline = Pipeline.from_spec([
+        ...     {'filter': 'inverse'},
+        ...     {'filter': 'flip', 'axis': -1},
+        ... ])
+        >>> a = np.array([[0.0, 0.25, 1.0]])
+        >>> pipeline(a)
+        array([[0.  , 0.75, 1.  ]])
+    """
+    def __init__(self, steps: Iterable[Step] = ()) -> None:
+        self.steps = list(steps)
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.steps!r})'
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Pipeline):
+            return NotImplemented
+        return self.steps == other.steps
+
+    def __iter__(self) -> Iterator[Step]:
+        return iter(self.steps)
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def __call__(self, a: ImgAry) -> ImgAry:
+        # Steps with regions write into the image data rather than
+        # copying it, unless it is still the caller's data.
+        source = a
+        for step in self.steps:
+            inplace = not np.may_share_memory(a, source)
+            a = step(a, inplace=inplace)
+        return a
+
+    @classmethod
+    def from_spec(
+        cls, spec: Union[Iterable[StepSpec], Mapping[str, Any]]
+    ) -> 'Pipeline':
+        """Create a :class:`Pipeline` from a sequence of step mappings
+        or from a mapping with the sequence in a "filters" key.
+        """
+        if isinstance(spec, Mapping):
+            try:
+                steps = spec['filters']
+            except KeyError:
+                raise ValueError('Pipeline spec has no filters.')
+        else:
+            steps = spec
+        return cls(Step.from_spec(item) for item in steps)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'Pipeline':
+        """Load a :class:`Pipeline` from a JSON or YAML file."""
+        path = Path(path)
+        with open(path) as fh:
+            text = fh.read()
+        if path.suffix.casefold() in ('.yaml', '.yml'):
+            if yaml is None:
+                msg = 'PyYAML must be installed to load YAML pipelines.'
+                raise ImportError(msg)
+            try:
+                spec = yaml.safe_load(text)
+            except yaml.YAMLError as ex:
+                raise ValueError(f'Invalid YAML: {ex}')
+        else:
+            spec = json.loads(text)
+        return cls.from_spec(spec)
+
+    def to_spec(self) -> list[dict[str, Any]]:
+        """Serialize the pipeline to a list of mappings."""
+        return [step.to_spec() for step in self.steps]
+
+
+class IncrementalPipeline:
+    """Apply a :class:`Pipeline` again after part of the image data
+    changed, only recomputing the part of the result the change can
+    affect. This is meant for editors, where a small part of the
+    image is changed and the whole result is shown again.
+
+    The first call applies the whole pipeline. Later calls find the
+    changed, or dirty, region of the image data, grow it by the halo
+    of each step to find the part of the result it affects, and
+    filter only that part plus the margin the steps read around it.
+    If a step doesn't declare its halo or has its own region or mask,
+    if the shape of the image data changes, or if the steps change,
+    the whole pipeline is applied again.
+
+    :param pipeline: The pipeline to apply.
+    :returns: A :class:`IncrementalPipeline` object.
+    :rtype: imgfilt.pipeline.IncrementalPipeline
+
+    Usage::
+
+        >>> import numpy as np
+        >>>
+        >>> pipeline = Pipeline.from_spec([{'filter': 'box_blur', 'size': 3}])
+        >>> incremental = IncrementalPipeline(pipeline)
+        >>> a = np.zeros((1, 32, 32))
+        >>> _ = incremental(a)
+        >>> a[0, 10, 20] = 1.0
+        >>> _ = incremental(a)
+        >>> incremental.last_region
+        (9, 19, 12, 22)
+    """
+    def __init__(self, pipeline: Pipeline) -> None:
+        self.pipeline = pipeline
+        self.last_region: Optional[tuple[int, int, int, int]] = None
+        self._input: Optional[ImgAry] = None
+        self._output: Optional[ImgAry] = None
+        self._steps: list[Step] = []
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.pipeline!r})'
+
+    def __call__(self, a: ImgAry, dirty: Optional[Region] = None) -> ImgAry:
+        """Apply the pipeline to image data.
+
+        :param a: The image data to filter.
+        :param dirty: (Optional.) The region of the image data that
+            changed since the last call, as the top, left, bottom,
+            and right of the region. It is trusted rather than
+            checked. If it isn't given, the image data is compared
+            to the image data from the last call to find it.
+        :returns: A :class:`numpy.ndarray` object.
+        :rtype: numpy.ndarray
+        """
+        halo = self._halo()
+        if (
+            halo is None
+            or self._input is None
+            or self._output is None
+            or a.shape != self._input.shape
+            or self._steps != self.pipeline.steps
+        ):
+            return self._apply_all(a)
+
+        if dirty is None:
+            dirty = _dirty_region(self._input, a)
+            if dirty is None:
+                self.last_region = None
+                return self._output.copy()
+
+        # Find the part of the result the change affects, and the part
+        # of the image data needed to recompute it.
+        height, width = a.shape[Y], a.shape[X]
+        top, left, bottom, right = (int(n) for n in dirty)
+        top, left = max(top - halo, 0), max(left - halo, 0)
+        bottom, right = min(bottom + halo, height), min(right + halo, width)
+        if top >= bottom or left >= right:
+            self.last_region = None
+            return self._output.copy()
+        y0, x0 = max(top - halo, 0), max(left - halo, 0)
+        y1, x1 = min(bottom + halo, height), min(right + halo, width)
+
+        # Recompute that part.
+        area = a[..., y0:y1, x0:x1]
+        filtered = self.pipeline(area)
+        if filtered.shape != area.shape:
+            return self._apply_all(a)
+        inner = filtered[..., top - y0:bottom - y0, left - x0:right - x0]
+        region = (..., slice(top, bottom), slice(left, right))
+        self._output[region] = inner
+        self._input[region] = a[region]
+        self.last_region = (top, left, bottom, right)
+        return self._output.copy()
+
+    def reset(self) -> None:
+        """Forget the last image data, so the next call applies the
+        whole pipeline.
+        """
+        self.last_region = None
+        self._input = None
+        self._output = None
+
+    def _apply_all(self, a: ImgAry) -> ImgAry:
+        """Apply the whole pipeline and remember the result."""
+        result = self.pipeline(a)
+        self._input = np.array(a)
+        self._output = np.array(result)
+        self._steps = Pipeline.from_spec(self.pipeline.to_spec()).steps
+        self.last_region = (0, 0, a.shape[Y], a.shape[X])
+        return result
+
+    def _halo(self) -> Optional[int]:
+        """Find the margin of pixels around each pixel the whole
+        pipeline reads, or `None` if it can't be found.
+        """
+        total = 0
+        for step in self.pipeline:
+            halo = step.halo
+            if halo is None or step.roi is not None or step.mask is not None:
+                return None
+            total += halo
+        return total
+
+
+# Utility functions.
+def apply_to_region(
+    filter: Filter,
+    a: ImgAry,
+    roi: Optional[Region] = None,
+    mask: Optional[np.ndarray] = None,
+    inplace: bool = False,
+    **kwargs: Any
+) -> ImgAry:
+    """Apply a filter to only part of the image data. Only the part
+    of the image data the region reads is filtered. The rest of the
+    image is left as it was.
+
+    What the region reads depends on how the filter is marked:
+
+    *   Filters marked with :func:`imgfilt.utility.remaps` only remap
+        the region, from the part of the image its coordinate maps
+        point to.
+    *   Filters marked with :func:`imgfilt.utility.has_halo` filter
+        the region and the margin of pixels around it that they read.
+        Filters that work on each pixel alone have a halo of zero.
+    *   Any other filter is applied to all of the image, and only the
+        region is kept.
+
+    :param filter: The filter to apply.
+    :param a: The image data to alter.
+    :param roi: (Optional.) The region to filter as the top, left,
+        bottom, and right of the region. The bottom and right are
+        not in the region, like the stop of a slice.
+    :param mask: (Optional.) Where to apply the filter. It has the
+        height and width of the image data, or the shape of the image
+        data. Where the mask is `True` or one the filtered data is
+        used, and where it is `False` or zero the original data is
+        kept. Values between zero and one blend the two, which can
+        be used to feather the edge of the region. If there is also
+        a region, the mask only applies within that region.
+    :param inplace: (Optional.) Write the result into the given image
+        data rather than a copy of it, if it can hold the result.
+    :param kwargs: The parameters to pass to the filter.
+    :returns: A :class:`numpy.ndarray` object. If the filter adds
+        color channels, like :func:`imgfilt.filter_colorize`, the
+        rest of the image is given the same value in each channel.
+    :rtype: numpy.ndarray
+
+    Usage::
+
+        >>> import numpy as np
+        >>> from imgfilt import filter_inverse
+        >>>
+        >>> a = np.zeros((3, 4))
+        >>> apply_to_region(filter_inverse, a, roi=(1, 1, 2, 3))
+        array([[0., 0., 0., 0.],
+               [0., 1., 1., 0.],
+               [0., 0., 0., 0.]])
+    """
+    # Find the region to filter.
+    height, width = a.shape[Y], a.shape[X]
+    top, left, bottom, right = (0, 0, height, width) if roi is None else roi
+    if mask is not None:
+        mask = np.asarray(mask)
+        spread = mask
+        if mask.ndim > 2:
+            spread = mask.reshape(-1, height, width).any(axis=0)
+        rows, cols = np.nonzero(spread)
+        if len(rows):
+            top, bottom = max(top, rows.min()), min(bottom, rows.max() + 1)
+            left, right = max(left, cols.min()), min(right, cols.max() + 1)
+    top, left = max(top, 0), max(left, 0)
+    bottom, right = min(bottom, height), min(right, width)
+    empty = mask is not None and not mask.any()
+    if empty or top >= bottom or left >= right:
+        return a
+    box = (top, left, bottom, right)
+
+    # Filter the part of the image the region reads, and keep only
+    # the region from the result.
+    name = filter.__name__.replace('filter_', '', 1)
+    remap = getattr(filter, 'remap', None)
+    if remap is not None:
+        inner = _remap_region(remap, a, box, kwargs)
+    else:
+        halo = getattr(filter, 'halo', None)
+        margin = max(height, width) if halo is None else halo(**kwargs)
+        y0, x0 = max(top - margin, 0), max(left - margin, 0)
+        y1, x1 = min(bottom + margin, height), min(right + margin, width)
+        area = a[..., y0:y1, x0:x1]
+        filtered = filter(area, **kwargs)
+        if filtered.shape[:area.ndim] != area.shape:
+            raise ValueError(f'{name} changed the shape of the region.')
+        channels = (slice(None),) * (filtered.ndim - area.ndim)
+        inner = filtered[(
+            ...,
+            slice(top - y0, bottom - y0),
+            slice(left - x0, right - x0),
+            *channels
+        )]
+
+    # Give the image data any color channels the filter added.
+    added = inner.shape[a.ndim:]
+    ones = tuple(1 for _ in added)
+    if added:
+        a = np.broadcast_to(a.reshape((*a.shape, *ones)), (*a.shape, *added))
+
+    # Put the region back into the image data.
+    channels = (slice(None),) * len(added)
+    region: tuple[Any, ...] = (
+        ..., slice(top, bottom), slice(left, right), *channels
+    )
+    if not inplace or a.dtype != inner.dtype or not a.flags.writeable:
+        a = a.astype(np.result_type(a, inner))
+    if mask is None:
+        a[region] = inner
+        return a
+    weights = mask[..., top:bottom, left:right]
+    weights = weights.reshape((*weights.shape, *ones))
+    if mask.dtype == bool:
+        np.copyto(a[region], inner, where=weights)
+    else:
+        a[region] = lerp(a[region], inner, weights)
+    return a
+
+
+def _dirty_region(
+    old: ImgAry, new: ImgAry
+) -> Optional[tuple[int, int, int, int]]:
+    """Find the top, left, bottom, and right of the region where two
+    arrays of image data differ, or `None` if they are the same.
+    """
+    changed = old != new
+    if changed.ndim > 2:
+        changed = changed.reshape(-1, *changed.shape[-2:]).any(axis=0)
+    rows = np.flatnonzero(changed.any(axis=1))
+    if not len(rows):
+        return None
+    cols = np.flatnonzero(changed.any(axis=0))
+    return int(rows[0]), int(cols[0]), int(rows[-1]) + 1, int(cols[-1]) + 1
+
+
+def _remap_region(
+    remap: Callable[..., tuple],
+    a: ImgAry,
+    box: tuple[int, int, int, int],
+    kwargs: dict[str, Any]
+) -> ImgAry:
+    """Remap a region of the image data from only the part of the
+    image the coordinate maps of the region point to.
+    """
+    size = a.shape[Y], a.shape[X]
+    map_x, map_y, interpolation, border = remap(size, **kwargs)
+    map_x, map_y, part = crop_maps(map_x, map_y, box, border)
+    y0, x0, y1, x1 = part
+    area = a[..., y0:y1, x0:x1]
+    frames = area.reshape((-1, *area.shape[-2:]))
+    remapped = [
+        backends.remap(frame, map_x, map_y, interpolation, border)
+        for frame in frames
+    ]
+    return np.array(remapped).reshape((*a.shape[:-2], *map_x.shape[:2]))
+
+
+def get_filter(name: str) -> Filter:
+    """Get a filter function by its registered name.
+
+    :param name: The name of the filter without the "filter\\_" prefix.
+    :returns: A filter function.
+    :rtype: Callable
+    """
+    try:
+        return getattr(ift, f'filter_{name}')
+    except AttributeError:
+        raise ValueError(f'Unknown filter: {name!r}.')
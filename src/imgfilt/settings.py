@@ -0,0 +1,174 @@
+"""
+settings
+~~~~~~~~
+
+Package-wide settings that change how filters do their work rather
+than what they do.
+
+Changes made with :func:`configure` set the defaults for the whole
+process, so every thread sees them. Changes made with :func:`override`
+are held in a :class:`contextvars.ContextVar`, so they only affect the
+current thread or task.
+
+Usage::
+
+    >>> with override(map_resolution=0.25):
+    ...     get_settings().map_resolution
+    0.25
+    >>> get_settings().map_resolution
+    1.0
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Any, Iterator, NamedTuple, Optional
+
+
+# Optional dependencies.
+try:
+    import numba
+except ImportError:                                     # pragma: no cover
+    numba = None
+
+
+# Constants.
+BACKENDS = ('cv2', 'numpy', 'numba')
+GAUSSIAN_ENGINES = ('auto', 'box', 'exact')
+QUALITIES = ('nearest', 'linear', 'cubic', 'lanczos')
+
+
+# Classes.
+class Settings(NamedTuple):
+    """The current settings.
+
+    :param map_resolution: The resolution, relative to the image,
+        at which the distortion filters calculate their coordinate
+        maps. Values below one calculate the maps on a coarse grid
+        and upsample them, which is faster but less exact. The
+        resolution is rounded to one over a whole number. See
+        :func:`imgfilt.maps.map_error`.
+    :param quality: How the filters that resample image data
+        interpolate between pixels. It is one of "nearest", "linear",
+        "cubic", or "lanczos", from fastest to best looking.
+    :param gaussian_engine: How gaussian blurs are done. "exact"
+        convolves with a gaussian kernel, which gets slower as sigma
+        grows. "box" approximates the gaussian with repeated box
+        blurs, which take the same time for any sigma. "auto" uses
+        "box" when sigma is at least `gaussian_threshold`.
+    :param gaussian_threshold: The sigma at which the "auto" gaussian
+        engine switches to box blurs.
+    :param backend: Which implementation of the operations the filters
+        are built from to use. It is one of "cv2", "numpy", or
+        "numba", which needs Numba to be installed. See
+        :mod:`imgfilt.backends`.
+    """
+    map_resolution: float = 1.0
+    quality: str = 'linear'
+    gaussian_engine: str = 'auto'
+    gaussian_threshold: float = 16.0
+    backend: str = 'cv2'
+
+
+_lock = Lock()
+_defaults = Settings()
+_settings: ContextVar[Optional[Settings]] = ContextVar(
+    'settings', default=None
+)
+
+
+# Functions.
+def configure(**changes: Any) -> Settings:
+    """Change the default settings for every thread in the process.
+    Contexts opened with :func:`override` or :func:`use` keep their
+    own settings until they end.
+
+    :param changes: The settings to change and their new values.
+    :returns: The new default settings.
+    :rtype: imgfilt.settings.Settings
+    """
+    global _defaults
+    with _lock:
+        new = _validate(_defaults._replace(**changes))
+        _defaults = new
+    return new
+
+
+def get_quality(quality: Optional[str] = None) -> str:
+    """Get the interpolation quality for a filter call.
+
+    :param quality: (Optional.) The quality passed to the filter,
+        which overrides the `quality` setting.
+    :returns: The quality to use.
+    :rtype: str
+    """
+    if quality is None:
+        return get_settings().quality
+    _validate_quality(quality)
+    return quality
+
+
+def get_settings() -> Settings:
+    """Get the settings for the current context.
+
+    :returns: The current settings.
+    :rtype: imgfilt.settings.Settings
+    """
+    settings = _settings.get()
+    return _defaults if settings is None else settings
+
+
+@contextmanager
+def override(**changes: Any) -> Iterator[Settings]:
+    """Change the settings within a context, restoring the previous
+    settings when the context ends.
+
+    :param changes: The settings to change and their new values.
+    :returns: The new settings.
+    :rtype: imgfilt.settings.Settings
+    """
+    new = _validate(get_settings()._replace(**changes))
+    with use(new):
+        yield new
+
+
+@contextmanager
+def use(settings: Settings) -> Iterator[Settings]:
+    """Replace all of the settings within a context. This is used to
+    give worker processes the settings of the process that started
+    them.
+
+    :param settings: The settings to use.
+    :returns: The settings.
+    :rtype: imgfilt.settings.Settings
+    """
+    token = _settings.set(settings)
+    try:
+        yield settings
+    finally:
+        _settings.reset(token)
+
+
+def _validate(settings: Settings) -> Settings:
+    """Check the settings have valid values."""
+    if not 0 < settings.map_resolution <= 1:
+        msg = 'map_resolution must be greater than 0 and at most 1.'
+        raise ValueError(msg)
+    _validate_quality(settings.quality)
+    if settings.gaussian_engine not in GAUSSIAN_ENGINES:
+        names = ', '.join(GAUSSIAN_ENGINES)
+        msg = f'Unknown gaussian_engine {settings.gaussian_engine!r}, '
+        raise ValueError(msg + f'use one of {names}.')
+    if settings.backend not in BACKENDS:
+        names = ', '.join(BACKENDS)
+        msg = f'Unknown backend {settings.backend!r}, '
+        raise ValueError(msg + f'use one of {names}.')
+    if settings.backend == 'numba' and numba is None:
+        raise ValueError('The numba backend needs Numba to be installed.')
+    return settings
+
+
+def _validate_quality(quality: str) -> None:
+    """Check the quality is one that the filters know."""
+    if quality not in QUALITIES:
+        names = ', '.join(QUALITIES)
+        raise ValueError(f'Unknown quality {quality!r}, use one of {names}.')
@@ -0,0 +1,264 @@
+"""
+sharedmem
+~~~~~~~~~
+
+Share image data between processes without copying it.
+"""
+import multiprocessing as mp
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import ExitStack
+from functools import partial
+from importlib import import_module
+from math import ceil
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, NamedTuple, Optional, Union
+
+import numpy as np
+from numpy.typing import DTypeLike, NDArray
+
+from imgfilt.settings import Settings, get_settings, use
+from imgfilt.threads import ThreadPolicy, apply_policy, get_policy
+
+
+# Types.
+ImgAry = NDArray[np.float_]
+
+
+# Classes.
+class ArraySpec(NamedTuple):
+    """The information needed to attach to a :class:`SharedArray`
+    from another process. Only this is sent to workers, so it is the
+    only thing pickled.
+    """
+    name: str
+    shape: tuple[int, ...]
+    dtype: str
+
+
+class SharedArray:
+    """A :class:`numpy.ndarray` stored in shared memory.
+
+    The process that creates a :class:`SharedArray` owns the memory
+    and must call :meth:`SharedArray.unlink` when done with it. Using
+    the object as a context manager does that automatically. Other
+    processes attach to the memory with :func:`attach`.
+
+    :param shape: The shape of the array.
+    :param dtype: The data type of the array.
+    :returns: A :class:`SharedArray` object.
+    :rtype: imgfilt.sharedmem.SharedArray
+
+    Usage::
+
+        >>> with SharedArray((2, 3), float) as shared:
+        ...     shared.array[:] = 0.5
+        ...     shared.array
+        array([[0.5, 0.5, 0.5],
+               [0.5, 0.5, 0.5]])
+    """
+    def __init__(self, shape: tuple[int, ...], dtype: DTypeLike) -> None:
+        dtype = np.dtype(dtype)
+        size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+        self.shm = SharedMemory(create=True, size=size)
+        self.array: NDArray = np.ndarray(shape, dtype, buffer=self.shm.buf)
+
+    def __enter__(self) -> 'SharedArray':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.unlink()
+
+    @classmethod
+    def from_array(cls, a: NDArray) -> 'SharedArray':
+        """Copy an existing array into shared memory."""
+        shared = cls(a.shape, a.dtype)
+        shared.array[...] = a
+        return shared
+
+    @property
+    def spec(self) -> ArraySpec:
+        """The information needed to attach to the array."""
+        return ArraySpec(
+            self.shm.name,
+            self.array.shape,
+            self.array.dtype.str
+        )
+
+    def unlink(self) -> None:
+        """Release the shared memory."""
+        del self.array
+        self.shm.close()
+        self.shm.unlink()
+
+
+# Functions.
+def attach(spec: ArraySpec) -> tuple[SharedMemory, NDArray]:
+    """Attach to an array in shared memory created by another
+    process. The caller must close the returned
+    :class:`multiprocessing.shared_memory.SharedMemory` object
+    after it is finished with the array.
+
+    :param spec: The location of the shared array.
+    :returns: The shared memory and a view of the array in it.
+    :rtype: tuple
+    """
+    if sys.version_info >= (3, 13):
+        shm = SharedMemory(name=spec.name, track=False)
+    else:
+        # Before Python 3.13, attaching registers the memory with the
+        # resource tracker, which would unlink it when a spawned
+        # process exits. Forked processes share the owner's tracker,
+        # so there the registration has to be left alone.
+        shm = SharedMemory(name=spec.name)
+        if mp.get_start_method() != 'fork':
+            name = shm._name                            # type: ignore
+            resource_tracker.unregister(name, 'shared_memory')
+    a: NDArray = np.ndarray(spec.shape, spec.dtype, buffer=shm.buf)
+    return shm, a
+
+
+def by_name(fn: Callable) -> Callable:
+    """Refer to a function defined at the top level of a module by
+    its name, so it can be sent to worker processes even when it has
+    been wrapped by decorators that replace the module attribute.
+
+    :param fn: The function to refer to.
+    :returns: A picklable callable that calls the module attribute.
+    :rtype: functools.partial
+    """
+    return partial(_call_by_name, fn.__module__, fn.__qualname__)
+
+
+def map_frames(
+    fn: Callable,
+    a: Union[ImgAry, SharedArray],
+    *args: Any,
+    processes: Union[int, Executor],
+    out: Union[NDArray, SharedArray, None] = None,
+    chunksize: Optional[int] = None,
+    **kwargs: Any
+) -> ImgAry:
+    """Apply a function to each frame of three-dimensional image data
+    using a pool of processes.
+
+    The image data is copied into shared memory once and the output
+    is allocated in shared memory once. Workers are only sent the
+    name of the shared memory and the frames to work on, so the
+    frames are never pickled. If the image data is already in a
+    :class:`SharedArray`, and a :class:`SharedArray` is given for the
+    output, no copies are made at all. The workers use the
+    :mod:`imgfilt.settings` of the calling process.
+
+    :param fn: The function to apply. It must be picklable, which
+        means it must be defined at the top level of a module. See
+        :func:`by_name` for decorated functions.
+    :param a: The image data to process.
+    :param processes: The number of worker processes, or an existing
+        :class:`concurrent.futures.Executor` to submit the work to.
+        No more processes are started than the job's share of threads
+        in the :mod:`imgfilt.threads` policy, and the workers split
+        that share between them. The workers of an executor split
+        the share by the executor's own number of workers.
+    :param out: (Optional.) An array to write the result into. If
+        it is a :class:`SharedArray` the workers write into it
+        directly, otherwise the result is copied into it at the end.
+    :param chunksize: (Optional.) The number of frames sent to a
+        worker at once. Defaults to spreading the frames evenly
+        across four chunks per worker.
+    :returns: A :class:`numpy.ndarray` object. If there are no
+        frames, the function is never called, and the result is
+        empty with the shape of the image data.
+    :rtype: numpy.ndarray
+    """
+    with ExitStack() as stack:
+        src = a
+        if not isinstance(src, SharedArray):
+            src = stack.enter_context(SharedArray.from_array(src))
+        frames = src.array
+        if not len(frames):
+            if out is None:
+                return np.empty(frames.shape, frames.dtype)
+            return out.array if isinstance(out, SharedArray) else out
+
+        # The first frame is processed here to find the shape and type
+        # of the output, so the output can be allocated before any of
+        # the workers need it.
+        first = fn(frames[0], *args, **kwargs)
+        dst = out
+        if not isinstance(dst, SharedArray):
+            shape = (len(frames), *first.shape)
+            dst = stack.enter_context(SharedArray(shape, first.dtype))
+        dst.array[0] = first
+
+        # The workers share the job's threads, so a pool is never
+        # bigger than the job's share. An executor's size can't be
+        # changed, so its workers split the share however many
+        # there are. Executors don't make their size public, so
+        # the job's share is assumed if it can't be found.
+        policy = get_policy()
+        if isinstance(processes, int):
+            workers = min(processes, policy.share)
+        else:
+            workers = getattr(processes, '_max_workers', policy.share)
+        if chunksize is None:
+            chunksize = ceil((len(frames) - 1) / (4 * workers)) or 1
+
+        executor: Executor
+        if isinstance(processes, int):
+            executor = stack.enter_context(ProcessPoolExecutor(workers))
+        else:
+            executor = processes
+        settings = get_settings()
+        futures = [
+            executor.submit(
+                _apply_to_frames, fn, src.spec, dst.spec,
+                start, min(start + chunksize, len(frames)), args, kwargs,
+                settings, policy, workers
+            )
+            for start in range(1, len(frames), chunksize)
+        ]
+        for future in futures:
+            future.result()
+
+        if out is None:
+            return dst.array.copy()
+        if not isinstance(out, SharedArray):
+            out[...] = dst.array
+            return out
+    return out.array
+
+
+def _call_by_name(module: str, name: str, *args: Any, **kwargs: Any) -> Any:
+    """Call a function by its module and name."""
+    return getattr(import_module(module), name)(*args, **kwargs)
+
+
+def _apply_to_frames(
+    fn: Callable,
+    src_spec: ArraySpec,
+    dst_spec: ArraySpec,
+    start: int,
+    stop: int,
+    args: tuple,
+    kwargs: dict,
+    settings: Settings,
+    policy: ThreadPolicy,
+    workers: int
+) -> None:
+    """Apply a function to a range of frames in shared memory. This
+    runs in the worker processes, using the settings of the process
+    that sent the work and its share of that process's threads.
+    """
+    apply_policy(policy, workers)
+    src_shm, src = attach(src_spec)
+    dst_shm, dst = attach(dst_spec)
+    try:
+        with use(settings):
+            for i in range(start, stop):
+                dst[i] = fn(src[i], *args, **kwargs)
+    finally:
+        del src, dst
+        src_shm.close()
+        dst_shm.close()
@@ -0,0 +1,171 @@
+"""
+temporal
+~~~~~~~~
+
+Filters that work along the Z axis of video, one window of frames at
+a time.
+
+Each function takes an iterable of two-dimensional frames and returns
+an iterator of the filtered frames. Only the frames within the window
+of the filter are held in memory, so the frames can come from a file
+or a generator that is too large to hold in memory at once. Like
+OpenCV, the frames past the start and end of the video are treated as
+reflections of the frames before them.
+
+Usage::
+
+    >>> import numpy as np
+    >>>
+    >>> frames = (np.full((1, 2), n, dtype=float) for n in range(4))
+    >>> for frame in box_frames(frames, 3):
+    ...     print(frame)
+    [[0.66666667 0.66666667]]
+    [[1. 1.]]
+    [[2. 2.]]
+    [[2.33333333 2.33333333]]
+"""
+from collections import deque
+from itertools import chain, islice
+from typing import Iterable, Iterator, Optional, Sequence
+
+import cv2
+import numpy as np
+from numpy.typing import NDArray
+
+from imgfilt.settings import get_settings
+from imgfilt.utility import gaussian_boxes
+
+
+# Types.
+ImgAry = NDArray[np.float_]
+Frames = Iterable[ImgAry]
+
+
+# Functions.
+def box_frames(
+    frames: Frames, size: int, anchor: Optional[int] = None
+) -> Iterator[ImgAry]:
+    """Average each frame with the frames around it. A running sum is
+    kept, so the cost for each frame is the same for any size. The
+    sum is found again from the window once every `size` frames, so
+    rounding errors from adding and removing frames don't build up
+    over long videos.
+
+    :param frames: The frames to blur.
+    :param size: The number of frames to average.
+    :param anchor: (Optional.) The position of the output frame in
+        the window. Defaults to the middle, like OpenCV.
+    :returns: An iterator of the blurred frames.
+    :rtype: Iterator
+    """
+    if anchor is None:
+        anchor = size // 2
+    window: deque[ImgAry] = deque()
+    total = None
+    removed = 0
+    for frame in _reflect_101(frames, anchor, size - 1 - anchor):
+        if total is None:
+            total = frame.astype(np.float64)
+        else:
+            total += frame
+        window.append(frame)
+        if len(window) > size:
+            total -= window.popleft()
+            removed += 1
+        if removed == size:
+            total = _sum(window)
+            removed = 0
+        if len(window) == size:
+            yield (total / size).astype(frame.dtype, copy=False)
+
+
+def convolve_frames(
+    frames: Frames, kernel: Sequence[float], anchor: Optional[int] = None
+) -> Iterator[ImgAry]:
+    """Convolve the frames with a one-dimensional kernel.
+
+    :param frames: The frames to filter.
+    :param kernel: The weight of each frame in the window.
+    :param anchor: (Optional.) The position of the output frame in
+        the window. Defaults to the middle, like OpenCV.
+    :returns: An iterator of the filtered frames.
+    :rtype: Iterator
+    """
+    size = len(kernel)
+    if anchor is None:
+        anchor = size // 2
+    weights = [float(w) for w in kernel]
+    window: deque[ImgAry] = deque(maxlen=size)
+    for frame in _reflect_101(frames, anchor, size - 1 - anchor):
+        window.append(frame)
+        if len(window) == size:
+            out = weights[0] * window[0]
+            for w, f in zip(weights[1:], islice(window, 1, None)):
+                out += w * f
+            yield out.astype(frame.dtype, copy=False)
+
+
+def gaussian_frames(frames: Frames, sigma: float) -> Iterator[ImgAry]:
+    """Blur the frames with a gaussian. Large blurs are approximated
+    with repeated box blurs, following the `gaussian_engine` setting
+    used by :func:`imgfilt.filter_gaussian_blur`.
+
+    :param frames: The frames to blur.
+    :param sigma: The sigma of the blur, in frames.
+    :returns: An iterator of the blurred frames.
+    :rtype: Iterator
+    """
+    settings = get_settings()
+    engine = settings.gaussian_engine
+    if engine == 'auto':
+        engine = 'box' if sigma >= settings.gaussian_threshold else 'exact'
+    if engine == 'box':
+        for size in gaussian_boxes(sigma):
+            frames = box_frames(frames, size)
+        return iter(frames)
+
+    # Use the same size of kernel that OpenCV uses for floats.
+    size = int(round(sigma * 8 + 1)) | 1
+    kernel = cv2.getGaussianKernel(size, sigma, cv2.CV_64F)
+    return convolve_frames(frames, kernel[:, 0].tolist())
+
+
+def _reflect_101(frames: Frames, before: int, after: int) -> Iterator[ImgAry]:
+    """Pad the frames with reflections of the frames at the start and
+    end, without the first and last frame being repeated.
+    """
+    frames = iter(frames)
+    head = list(islice(frames, max(before, after) + 1))
+
+    # Short videos may need to be reflected more than once, so all of
+    # the frames are needed anyway.
+    if len(head) <= max(before, after):
+        length = len(head)
+        for i in range(-before, length + after):
+            yield head[_reflect_index(i, length)]
+        return
+
+    yield from head[before:0:-1]
+    tail: deque[ImgAry] = deque(maxlen=after + 1)
+    for frame in chain(head, frames):
+        tail.append(frame)
+        yield frame
+    yield from list(tail)[-2::-1]
+
+
+def _reflect_index(i: int, length: int) -> int:
+    """Find the frame a position outside of the video reflects."""
+    if length == 1:
+        return 0
+    period = 2 * (length - 1)
+    i %= period
+    return i if i < length else period - i
+
+
+def _sum(window: Iterable[ImgAry]) -> np.ndarray:
+    """Add up the frames in a window."""
+    frames = iter(window)
+    total = next(frames).astype(np.float64)
+    for frame in frames:
+        total += frame
+    return total
@@ -0,0 +1,212 @@
+"""
+threads
+~~~~~~~
+
+Control how many threads imgfilt and the libraries it uses start.
+
+OpenCV keeps its own pool of threads, the BLAS library under NumPy may
+start more, and Numba has its own pool. Each defaults to one thread
+per CPU, and when frames are spread across worker processes each
+worker starts its own pools, so a few jobs on a large machine can run
+many times more threads than there are CPUs. A :class:`ThreadPolicy`
+gives each job an equal share of a budget of threads, and that share
+is split between the worker processes the job starts.
+
+The policy applies to the whole process, since the libraries' pools
+are shared by every thread in it. It starts from the `IMGFILT_THREADS`
+and `IMGFILT_JOBS` environment variables, if they are set.
+
+Usage::
+
+    >>> with threads(budget=8, jobs=2) as policy:
+    ...     policy.share, policy.split(3)
+    (4, 1)
+"""
+import os
+from contextlib import contextmanager
+from threading import RLock
+from typing import Iterator, NamedTuple, Optional
+
+import cv2
+
+
+# Optional libraries that keep their own pools of threads.
+try:
+    import numba
+except ImportError:                                 # pragma: no cover
+    numba = None
+try:
+    import threadpoolctl
+except ImportError:                                 # pragma: no cover
+    threadpoolctl = None
+
+
+# Classes.
+class ThreadPolicy(NamedTuple):
+    """How many threads a job may use.
+
+    :param budget: The number of threads shared by all the jobs on the
+        machine. It defaults to the number of CPUs.
+    :param jobs: The number of jobs sharing the budget.
+    """
+    budget: int = os.cpu_count() or 1
+    jobs: int = 1
+
+    @property
+    def share(self) -> int:
+        """The number of threads this job may use."""
+        return max(1, self.budget // self.jobs)
+
+    def split(self, workers: int) -> int:
+        """Find the number of threads each of the job's worker
+        processes may use.
+
+        :param workers: The number of worker processes.
+        :returns: A :class:`int` object.
+        :rtype: int
+        """
+        return max(1, self.share // max(1, workers))
+
+
+_lock = RLock()
+_policy = ThreadPolicy()
+
+# The open :func:`threads` blocks, oldest first. Each holds the policy
+# to restore when it ends, which is handed to the next block if that
+# block is still open.
+_blocks: list[list[ThreadPolicy]] = []
+
+
+# Functions.
+def apply_policy(policy: ThreadPolicy, workers: int = 1) -> int:
+    """Set the number of threads of each library's pool in this
+    process. This is called by worker processes with the policy of
+    the process that started them.
+
+    :param policy: The policy to apply.
+    :param workers: (Optional.) The number of processes sharing the
+        policy's share of threads.
+    :returns: The number of threads each pool may use.
+    :rtype: int
+    """
+    count = policy.split(workers)
+    cv2.setNumThreads(count)
+    if numba is not None:
+        numba.set_num_threads(min(count, numba.config.NUMBA_NUM_THREADS))
+    if threadpoolctl is not None:
+        threadpoolctl.threadpool_limits(count)
+    return count
+
+
+def get_policy() -> ThreadPolicy:
+    """Get the thread policy of this process.
+
+    :returns: A :class:`ThreadPolicy` object.
+    :rtype: imgfilt.threads.ThreadPolicy
+    """
+    return _policy
+
+
+def set_policy(
+    budget: Optional[int] = None,
+    jobs: Optional[int] = None
+) -> ThreadPolicy:
+    """Change the thread policy of this process and apply it.
+
+    :param budget: (Optional.) The number of threads shared by all the
+        jobs on the machine.
+    :param jobs: (Optional.) The number of jobs sharing the budget.
+    :returns: A :class:`ThreadPolicy` object.
+    :rtype: imgfilt.threads.ThreadPolicy
+    """
+    global _policy
+    with _lock:
+        given = {'budget': budget, 'jobs': jobs}
+        changes = {k: v for k, v in given.items() if v is not None}
+        policy = _validate(_policy._replace(**changes))
+        apply_policy(policy)
+        _policy = policy
+    return policy
+
+
+def thread_counts() -> dict[str, int]:
+    """Find the number of threads each library's pool may use in
+    this process.
+
+    :returns: A :class:`dict` object.
+    :rtype: dict
+    """
+    counts = {'cv2': cv2.getNumThreads()}
+    if numba is not None:
+        counts['numba'] = numba.get_num_threads()
+    if threadpoolctl is not None:
+        for pool in threadpoolctl.threadpool_info():
+            counts[pool['internal_api']] = pool['num_threads']
+    return counts
+
+
+@contextmanager
+def threads(
+    budget: Optional[int] = None,
+    jobs: Optional[int] = None
+) -> Iterator[ThreadPolicy]:
+    """Change the thread policy within a context, restoring the
+    previous policy when the context ends.
+
+    Since the policy applies to the whole process, blocks opened in
+    different threads can overlap. When a block ends while a later
+    block is still open, the later block's policy is kept, and the
+    policy from before the first block is restored when the last of
+    them ends.
+
+    :param budget: (Optional.) The number of threads shared by all the
+        jobs on the machine.
+    :param jobs: (Optional.) The number of jobs sharing the budget.
+    :returns: A :class:`ThreadPolicy` object.
+    :rtype: imgfilt.threads.ThreadPolicy
+    """
+    with _lock:
+        block = [_policy]
+        policy = set_policy(budget, jobs)
+        _blocks.append(block)
+    try:
+        yield policy
+    finally:
+        with _lock:
+            index = next(i for i, b in enumerate(_blocks) if b is block)
+            del _blocks[index]
+            if index < len(_blocks):
+                _blocks[index][0] = block[0]
+            else:
+                set_policy(*block[0])
+
+
+# Utility functions.
+def _from_environment() -> Optional[ThreadPolicy]:
+    """Find the policy set by the environment, if any."""
+    budget = os.environ.get('IMGFILT_THREADS')
+    jobs = os.environ.get('IMGFILT_JOBS')
+    if budget is None and jobs is None:
+        return None
+    policy = ThreadPolicy()
+    if budget is not None:
+        policy = policy._replace(budget=int(budget))
+    if jobs is not None:
+        policy = policy._replace(jobs=int(jobs))
+    return _validate(policy)
+
+
+def _validate(policy: ThreadPolicy) -> ThreadPolicy:
+    """Check the policy has valid values."""
+    if policy.budget < 1:
+        raise ValueError('budget must be at least 1.')
+    if policy.jobs < 1:
+        raise ValueError('jobs must be at least 1.')
+    return policy
+
+
+# Apply the policy from the environment when imgfilt is imported, so
+# a job launcher can set it without changing the job's code.
+_environment = _from_environment()
+if _environment is not None:
+    set_policy(*_environment)
@@ -0,0 +1,220 @@
+"""
+tiles
+~~~~~
+
+Apply filters to image data one tile at a time, skipping tiles where
+the image data is constant.
+
+Generated images often have large areas of a flat color. Filters that
+only read the pixels near each pixel, such as the blurs, turn a flat
+area into the same flat area, so there is no need to filter them. A
+:class:`TiledEngine` first finds the tiles where the image data and
+the margin around them the filter reads, its halo, are constant. It
+fills those tiles with the value the filter gives a constant image,
+and only filters the rest.
+
+Usage::
+
+    >>> import numpy as np
+    >>> from imgfilt import filter_box_blur
+    >>>
+    >>> a = np.zeros((1, 64, 64))
+    >>> a[0, 40:, 40:] = 1.0
+    >>> engine = TiledEngine(tile=16)
+    >>> result = engine.apply(filter_box_blur, a, size=5)
+    >>> engine.skipped_fraction
+    0.8125
+"""
+from typing import Any, Iterator, Optional
+
+import numpy as np
+from numpy.typing import NDArray
+
+from imgfilt.utility import Filter, X, Y
+
+
+# Types.
+ImgAry = NDArray[np.float_]
+
+
+# Classes.
+class TiledEngine:
+    """Apply filters to image data one tile at a time.
+
+    The filter must declare its halo with
+    :func:`imgfilt.utility.has_halo`. Filters with a halo give the
+    same result for the same pixels wherever they are in the image, so
+    they can be applied to tiles.
+
+    :param tile: (Optional.) The height and width of the tiles.
+    :param skip_constant: (Optional.) Whether to skip filtering tiles
+        where the image data is constant.
+    :returns: A :class:`TiledEngine` object.
+    :rtype: imgfilt.tiles.TiledEngine
+    """
+    def __init__(self, tile: int = 256, skip_constant: bool = True) -> None:
+        if tile < 1:
+            raise ValueError('tile must be at least 1.')
+        self.tile = tile
+        self.skip_constant = skip_constant
+        self.pixels = 0
+        self.skipped = 0
+
+    def __repr__(self) -> str:
+        cls = type(self).__name__
+        return f'{cls}(tile={self.tile}, skip_constant={self.skip_constant})'
+
+    @property
+    def skipped_fraction(self) -> float:
+        """The fraction of the pixels given to the engine that were
+        filled rather than filtered.
+        """
+        if not self.pixels:
+            return 0.0
+        return self.skipped / self.pixels
+
+    def apply(self, filter: Filter, a: ImgAry, **kwargs: Any) -> ImgAry:
+        """Apply a filter to image data.
+
+        :param filter: The filter to apply.
+        :param a: The image data to filter.
+        :param kwargs: The parameters to pass to the filter.
+        :returns: A :class:`numpy.ndarray` object.
+        :rtype: numpy.ndarray
+        """
+        halo = getattr(filter, 'halo', None)
+        if halo is None:
+            name = filter.__name__.replace('filter_', '', 1)
+            raise ValueError(f'{name} cannot be applied in tiles.')
+        margin = halo(**kwargs)
+        height, width = a.shape[Y], a.shape[X]
+        self.pixels += a.size
+
+        # Find the tiles that can be filled, then work through each
+        # row of tiles in runs of tiles that are filled or filtered
+        # together, so the halo is only filtered again where a run
+        # of filtered tiles is split.
+        values = self._constant_values(a, margin)
+        frames = a.size // (height * width)
+        out: Optional[ImgAry] = None
+        fills: dict[float, ImgAry] = {}
+        for i, top in enumerate(range(0, height, self.tile)):
+            bottom = min(top + self.tile, height)
+            for left, right, value in _runs(values[i], self.tile, width):
+                box = (top, left, bottom, right)
+                if np.isnan(value):
+                    part = _filter_box(filter, a, box, margin, kwargs)
+                else:
+                    if value not in fills:
+                        fills[value] = _fill(filter, a, value, kwargs)
+                    part = fills[value]
+                    self.skipped += frames * (bottom - top) * (right - left)
+                out = _put(out, a, box, part)
+        if out is None:
+            return filter(a, **kwargs)
+        return out
+
+    def _constant_values(self, a: ImgAry, margin: int) -> np.ndarray:
+        """Find the value of each tile that can be filled, or NaN for
+        the tiles that must be filtered.
+        """
+        rows = range(0, a.shape[Y], self.tile)
+        cols = range(0, a.shape[X], self.tile)
+        values = np.full((len(rows), len(cols)), np.nan)
+        if not self.skip_constant:
+            return values
+
+        # A tile can only be filled if the margin around it that the
+        # filter reads is also constant, but the tile is checked on its
+        # own first, since it is cheaper to find most tiles aren't.
+        height, width = a.shape[Y], a.shape[X]
+        for i, top in enumerate(rows):
+            for j, left in enumerate(cols):
+                bottom, right = top + self.tile, left + self.tile
+                part = a[..., top:bottom, left:right]
+                value = part.min()
+                if value != part.max():
+                    continue
+                window = a[
+                    ...,
+                    max(top - margin, 0):min(bottom + margin, height),
+                    max(left - margin, 0):min(right + margin, width)
+                ]
+                if window.min() == value == window.max():
+                    values[i, j] = value
+        return values
+
+
+# Utility functions.
+def _fill(
+    filter: Filter, a: ImgAry, value: float, kwargs: dict[str, Any]
+) -> ImgAry:
+    """Find what the filter gives for constant image data."""
+    size = (min(a.shape[Y], 3), min(a.shape[X], 3))
+    flat = np.full((*a.shape[:-2], *size), value, dtype=a.dtype)
+    return _inner(filter(flat, **kwargs), a.ndim, slice(0, 1), slice(0, 1))
+
+
+def _filter_box(
+    filter: Filter,
+    a: ImgAry,
+    box: tuple[int, int, int, int],
+    margin: int,
+    kwargs: dict[str, Any]
+) -> ImgAry:
+    """Filter a box of the image data plus its halo, and return the
+    part of the result within the box.
+    """
+    height, width = a.shape[Y], a.shape[X]
+    top, left, bottom, right = box
+    y0, x0 = max(top - margin, 0), max(left - margin, 0)
+    y1, x1 = min(bottom + margin, height), min(right + margin, width)
+    filtered = filter(a[..., y0:y1, x0:x1], **kwargs)
+    rows, cols = slice(top - y0, bottom - y0), slice(left - x0, right - x0)
+    return _inner(filtered, a.ndim, rows, cols)
+
+
+def _inner(filtered: ImgAry, ndim: int, rows: slice, cols: slice) -> ImgAry:
+    """Take rows and columns from a result, keeping any color
+    channels the filter added after the X axis.
+    """
+    channels = (slice(None),) * (filtered.ndim - ndim)
+    index: tuple[Any, ...] = (..., rows, cols, *channels)
+    return filtered[index]
+
+
+def _runs(
+    values: np.ndarray, tile: int, width: int
+) -> Iterator[tuple[int, int, float]]:
+    """Find the left, right, and value of each run of tiles in a row
+    that have the same value, where NaN marks tiles to filter.
+    """
+    start = 0
+    for j in range(1, len(values) + 1):
+        if j < len(values) and (
+            values[j] == values[start]
+            or np.isnan(values[j]) and np.isnan(values[start])
+        ):
+            continue
+        yield start * tile, min(j * tile, width), values[start]
+        start = j
+
+
+def _put(
+    out: Optional[ImgAry],
+    a: ImgAry,
+    box: tuple[int, int, int, int],
+    part: ImgAry
+) -> ImgAry:
+    """Put part of the result into the output, creating the output
+    when the first part is ready.
+    """
+    if out is None:
+        out = np.empty((*a.shape, *part.shape[a.ndim:]), dtype=part.dtype)
+    top, left, bottom, right = box
+    channels = (slice(None),) * (part.ndim - a.ndim)
+    index: tuple[Any, ...] = (
+        ..., slice(top, bottom), slice(left, right), *channels
+    )
+    out[index] = part
+    return out
@@ -4,26 +4,50 @@ utility
 
 Utility functions for the imgfilt module.
 """
-from functools import wraps
-from inspect import getmembers, isfunction
-from typing import Callable, NewType, Union
+from concurrent.futures import Executor
+from functools import lru_cache, wraps
+from inspect import getmembers, isfunction, signature
+from threading import RLock
+from types import MappingProxyType
+from typing import (
+    Callable,
+    Iterable,
+    Mapping,
+    NewType,
+    Optional,
+    Sequence,
+    Union
+)
 
 import numpy as np
 from numpy.typing import NDArray
 from typing_extensions import Protocol
 
+from imgfilt.dedupe import FrameDeduper, get_deduper
+from imgfilt.instrument import span
+from imgfilt.settings import override
+from imgfilt.sharedmem import by_name, map_frames
+
 
 # Exportable names.
 __all__ = [
-    'X', 'Y', 'Z', 'bilinear_interpolation', 'get_color_for_key',
-    'grayscale_to_rgb', 'processes_by_grayscale_frame',
-    'trilinear_interpolation', 'uses_uint8', 'will_square',
+    'MAX_CHANNELS', 'X', 'Y', 'Z', 'adds_channels',
+    'bilinear_interpolation',
+    'gaussian_boxes',
+    'InterpolationPlan', 'get_color_for_key', 'grayscale_to_rgb',
+    'grow_whole', 'handles_channels', 'has_halo', 'has_identity',
+    'interpolation_plan',
+    'interpolation_points', 'lerp', 'processes_by_grayscale_frame',
+    'remaps', 'resample', 'resampling_weights', 'shared_cache',
+    'streams_by_frame',
+    'trilinear_interpolation', 'uses_uint8', 'weigh', 'will_square',
+    'write_frames',
 ]
 
 
 # Types.
 Color = NewType('Color', tuple[str, str])
-ColorDict = NewType('ColorDict', dict[str, Color])
+ColorDict = Mapping[str, Color]
 Filter = Callable
 ImgAry = NDArray[np.float_]
 Numeric = Union[
@@ -37,7 +61,10 @@ Numeric = Union[
 
 # Useful constants.
 X, Y, Z = -1, -2, -3
-COLORS = ColorDict({
+# The most channels an image passed to OpenCV can have, CV_CN_MAX.
+MAX_CHANNELS = 512
+LOCK_STRIPES = 16
+COLORS: ColorDict = MappingProxyType({
     # Grayscale
     'a': Color(('hsv(0, 0%, 100%)', 'hsv(0, 0%, 0%)')),
     'A': Color(('hsl(0, 0%, 75%)', 'hsl(0, 0%, 25%)')),
@@ -118,6 +145,78 @@ COLORS = ColorDict({
 })
 
 
+# Classes.
+class InterpolationPlan:
+    """The positions and weights for resizing arrays of one shape
+    with linear interpolation. Linear interpolation is separable,
+    so each axis is resized in turn, from last to first, using the
+    positions behind and ahead of each new position on that axis.
+    Finding the positions is most of the work of planning, so reuse
+    the plan when resizing many arrays of the same shape, such as
+    the frames of a video. :func:`interpolation_plan` caches plans.
+
+    :param shape: The shape of the axes to resize. Arrays resized by
+        the plan can have more axes after these, such as color
+        channels, which are not resized.
+    :param factor: The amount to resize the axes.
+
+    Usage::
+
+        >>> import numpy as np
+        >>>
+        >>> plan = InterpolationPlan((2, 2), 2)
+        >>> plan.new_shape
+        (4, 4)
+        >>> a = np.array([[0, 1], [1, 0]])
+        >>> plan(a)
+        array([[0. , 0.5, 1. , 1. ],
+               [0.5, 0.5, 0.5, 0.5],
+               [1. , 0.5, 0. , 0. ],
+               [1. , 0.5, 0. , 0. ]])
+    """
+    __slots__ = ('shape', 'factor', 'new_shape', 'behind', 'ahead', 'parts')
+
+    def __init__(self, shape: Sequence[int], factor: float) -> None:
+        self.shape = tuple(shape)
+        self.factor = factor
+        behind, aheads, points = [], [], []
+        for size in self.shape:
+            whole, parts = interpolation_points(size, factor)
+            ahead = np.minimum(whole + 1, size - 1)
+            for value in whole, ahead, parts:
+                value.flags.writeable = False
+            behind.append(whole)
+            aheads.append(ahead)
+            points.append(parts)
+
+        # Plans are shared between threads by interpolation_plan, so
+        # nothing in them can be changed once they are made.
+        self.behind: tuple[NDArray[np.int_], ...] = tuple(behind)
+        self.ahead: tuple[NDArray[np.int_], ...] = tuple(aheads)
+        self.parts: tuple[NDArray[np.float_], ...] = tuple(points)
+        self.new_shape = tuple(len(parts) for parts in self.parts)
+
+    def __call__(self, a: ImgAry) -> ImgAry:
+        """Resize an array.
+
+        :param a: The array to resize. Its first axes must have the
+            shape of the plan.
+        :return: A :class:ndarray object.
+        :rtype: numpy.ndarray
+        """
+        if a.shape[:len(self.shape)] != self.shape:
+            msg = f'Plan for shape {self.shape} cannot resize {a.shape}.'
+            raise ValueError(msg)
+        for axis in reversed(range(len(self.shape))):
+            parts = self.parts[axis].reshape((-1, *[1] * (a.ndim - axis - 1)))
+            a = lerp(
+                np.take(a, self.behind[axis], axis),
+                np.take(a, self.ahead[axis], axis),
+                parts
+            )
+        return a
+
+
 # Color functions.
 def get_color_for_key(colorkey: str) -> Color:
     return COLORS[colorkey]
@@ -158,6 +257,9 @@ def processes_by_grayscale_frame(fn: Filter) -> Filter:
     through each two dimensional slice. This is used when the
     filter can't handle more than two dimensions in an array.
     """
+    name = 'processes_by_grayscale_frame'
+    max_channels: Optional[Callable[..., int]]
+    max_channels = getattr(fn, 'max_channels', None)
     if fn.__doc__:
         fn.__doc__ += '\n'.join((
             '',
@@ -165,20 +267,260 @@ def processes_by_grayscale_frame(fn: Filter) -> Filter:
             '   This filter uses a third-party library that cannot handle ',
             '   color or three-dimensional arrays. The filter itself will ',
             '   be able to handle three-dimensional arrays, but the filter ',
-            '   will affect each two-dimensional slice individually.'
+            '   will affect each two-dimensional slice individually.',
+            '',
+            'The frames of three-dimensional arrays can be spread across ',
+            'worker processes by passing the number of processes or a ',
+            ':class:`concurrent.futures.Executor` as the `processes` ',
+            'keyword argument. See :func:`imgfilt.sharedmem.map_frames`.',
+            '',
+            'If an array is passed as the `out` keyword argument, the ',
+            'result is written into it one frame at a time. See ',
+            ':ref:`memmap`.',
+            '',
+            'Passing `dedupe=True` reuses the result for frames that are ',
+            'the same as a recent frame. Pass a ',
+            ':class:`imgfilt.dedupe.FrameDeduper` instead to read how ',
+            'many frames were skipped. See :mod:`imgfilt.dedupe`.',
+            '',
+            'Passing `backend` overrides the `backend` setting for the ',
+            'call. See :mod:`imgfilt.backends`.',
         ))
-    
+        if max_channels is not None:
+            fn.__doc__ += '\n'.join((
+                '',
+                '',
+                'Passing `batch=True` processes the frames of ',
+                'three-dimensional arrays as the channels of a single ',
+                'image, so the third-party library is called once for ',
+                'every group of frames rather than once for every frame. ',
+                'Passing an :class:`int` sets the number of frames in ',
+                'each group. Groups are never larger than the number of ',
+                'channels the library can take for the call.',
+            ))
+
     @wraps(fn)
-    def wrapper(a: np.ndarray, *args, **kwargs) -> np.ndarray:
-        if len(a.shape) > 2:
-            frames = [fn(frame, *args, **kwargs) for frame in a]
-            out = np.array(frames)
+    def wrapper(
+        a: np.ndarray,
+        *args,
+        processes: Union[int, Executor, None] = None,
+        out: Optional[np.ndarray] = None,
+        batch: Union[bool, int] = False,
+        dedupe: Union[bool, FrameDeduper] = False,
+        backend: Optional[str] = None,
+        **kwargs
+    ) -> np.ndarray:
+        if backend is not None:
+            with override(backend=backend):
+                return wrapper(
+                    a, *args, processes=processes, out=out, batch=batch,
+                    dedupe=dedupe, **kwargs
+                )
+        if len(a.shape) > 2 and dedupe:
+            frames = get_deduper(dedupe).map(fn, a, *args, **kwargs)
+            out = _collect_frames(name, a, frames, out)
+        elif len(a.shape) > 2 and batch and max_channels is not None:
+            limit = max_channels(**_params(fn, args, kwargs))
+            size = limit if batch is True else min(batch, limit)
+            out = _process_as_channels(fn, a, size, out, args, kwargs)
+        elif len(a.shape) > 2 and processes:
+            with span(name, 'map frames', a) as s:
+                out = s.result(map_frames(
+                    by_name(fn), a, *args,
+                    processes=processes, out=out, **kwargs
+                ))
+        elif len(a.shape) > 2 and out is not None:
+            frames = (fn(frame, *args, **kwargs) for frame in a)
+            out = write_frames(out, frames)
+        elif len(a.shape) > 2:
+            results = [fn(frame, *args, **kwargs) for frame in a]
+            with span(name, 'stack frames', a) as s:
+                out = s.result(np.array(results))
+        elif out is not None:
+            out[...] = fn(a, *args, **kwargs)
         else:
             out = fn(a, *args, **kwargs)
         return out
+    setattr(wrapper, 'by_frame', True)
+    setattr(wrapper, 'parallel', True)
     return wrapper
 
 
+def handles_channels(
+    max_channels: Callable[..., int]
+) -> Callable[[Filter], Filter]:
+    """Mark a two-dimensional filter as able to handle the frames of
+    three-dimensional arrays passed as the channels of one image.
+    This lets :func:`processes_by_grayscale_frame` process whole
+    groups of frames in one call when asked to. It must be applied
+    beneath :func:`processes_by_grayscale_frame`.
+
+    This is only true of filters that treat every channel of an
+    image the same way and use only the Y and X axes of the image's
+    shape.
+
+    :param max_channels: A function that is given the parameters of
+        a call to the filter and returns the most channels the
+        third-party library can take for that call. OpenCV takes at
+        most :data:`MAX_CHANNELS`, but some of its operations take
+        fewer.
+    :return: The decorator.
+    :rtype: Callable
+    """
+    def decorator(fn: Filter) -> Filter:
+        setattr(fn, 'max_channels', max_channels)
+        return fn
+    return decorator
+
+
+def adds_channels(channels: int) -> Callable[[Filter], Filter]:
+    """Mark a filter as returning color image data from grayscale
+    image data, so its result has a channel axis after the X axis.
+
+    :param channels: The number of color channels in the result.
+    :return: The decorator.
+    :rtype: Callable
+    """
+    def decorator(fn: Filter) -> Filter:
+        setattr(fn, 'channels', channels)
+        return fn
+    return decorator
+
+
+def has_halo(halo: Callable[..., int]) -> Callable[[Filter], Filter]:
+    """Mark a filter as only using the pixels near each pixel, so it
+    can be applied to a region of an image by filtering the region
+    and a margin around it. See :func:`imgfilt.pipeline.apply_to_region`.
+
+    :param halo: A function that is given the parameters of a call
+        to the filter and returns how many pixels past a pixel along
+        the Y and X axes the filter uses to find that pixel's value.
+    :return: The decorator.
+    :rtype: Callable
+    """
+    def decorator(fn: Filter) -> Filter:
+        setattr(fn, 'halo', halo)
+        return fn
+    return decorator
+
+
+def has_identity(
+    condition: Callable[..., bool]
+) -> Callable[[Filter], Filter]:
+    """Mark a filter as not changing the image data for some values
+    of its parameters, so a :class:`imgfilt.Pipeline` can skip it.
+
+    :param condition: A function that is given the image data and the
+        parameters of a call to the filter and returns whether the
+        filter would return the image data unchanged.
+    :return: The decorator.
+    :rtype: Callable
+    """
+    def decorator(fn: Filter) -> Filter:
+        setattr(fn, 'identity', condition)
+        return fn
+    return decorator
+
+
+def streams_by_frame(fn: Filter) -> Filter:
+    """If given an array to write the output into, process each
+    frame of the given array separately and write it into the
+    output. This is used for filters that work on whole arrays
+    but don't need more than one frame at a time.
+    """
+    if fn.__doc__:
+        fn.__doc__ += '\n'.join((
+            '',
+            'If an array is passed as the `out` keyword argument, the ',
+            'result is written into it one frame at a time. See ',
+            ':ref:`memmap`.',
+            '',
+            'Passing `dedupe=True` filters three-dimensional arrays one ',
+            'frame at a time, reusing the result for frames that are the ',
+            'same as a recent frame. Pass a ',
+            ':class:`imgfilt.dedupe.FrameDeduper` instead to read how ',
+            'many frames were skipped. See :mod:`imgfilt.dedupe`.',
+            '',
+            'Passing `backend` overrides the `backend` setting for the ',
+            'call. See :mod:`imgfilt.backends`.',
+        ))
+
+    @wraps(fn)
+    def wrapper(
+        a: np.ndarray,
+        *args,
+        out: Optional[np.ndarray] = None,
+        dedupe: Union[bool, FrameDeduper] = False,
+        backend: Optional[str] = None,
+        **kwargs
+    ) -> np.ndarray:
+        if backend is not None:
+            with override(backend=backend):
+                return wrapper(a, *args, out=out, dedupe=dedupe, **kwargs)
+        if len(a.shape) > 2 and dedupe:
+            frames = get_deduper(dedupe).map(fn, a, *args, **kwargs)
+            out = _collect_frames('streams_by_frame', a, frames, out)
+        elif out is None:
+            out = fn(a, *args, **kwargs)
+        elif len(a.shape) > 2:
+            frames = (fn(frame, *args, **kwargs) for frame in a)
+            out = write_frames(out, frames)
+        else:
+            out[...] = fn(a, *args, **kwargs)
+        return out
+    setattr(wrapper, 'by_frame', True)
+    return wrapper
+
+
+def remaps(maps: Callable[..., tuple]) -> Callable[[Filter], Filter]:
+    """Mark a filter as moving pixels with :func:`cv2.remap`, so the
+    part of the image that a region of the result comes from can be
+    found from the maps. See :mod:`imgfilt.lazy`.
+
+    :param maps: A function that is given the height and width of a
+        frame and the parameters of a call to the filter, and returns
+        the two maps, the interpolation, and the border mode the
+        filter passes to :func:`cv2.remap`.
+    :return: The decorator.
+    :rtype: Callable
+    """
+    def decorator(fn: Filter) -> Filter:
+        setattr(fn, 'remap', maps)
+        return fn
+    return decorator
+
+
+def shared_cache(maxsize: int = 32) -> Callable[[Callable], Callable]:
+    """Cache the results of a function that builds something to be
+    shared by many calls, such as a kernel or a coordinate map, so it
+    can be called from many threads at once.
+
+    The cache is a :func:`functools.lru_cache` guarded by a set of
+    locks. Calls with the same arguments always take the same lock, so
+    only one thread builds each result and the others wait for it,
+    while calls with other arguments usually take another lock and
+    don't wait. The results are shared, so arrays in them should be
+    made read only.
+
+    :param maxsize: (Optional.) The most results to keep.
+    :return: The decorator.
+    :rtype: Callable
+    """
+    def decorator(fn: Callable) -> Callable:
+        cached = lru_cache(maxsize=maxsize)(fn)
+        locks = tuple(RLock() for _ in range(LOCK_STRIPES))
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = hash((args, tuple(kwargs.items())))
+            with locks[key % LOCK_STRIPES]:
+                return cached(*args, **kwargs)
+        setattr(wrapper, 'cache_clear', cached.cache_clear)
+        setattr(wrapper, 'cache_info', cached.cache_info)
+        return wrapper
+    return decorator
+
+
 def uses_uint8(fn: Filter) -> Filter:
     """Converts the image data from floats to ints."""
     @wraps(fn)
@@ -187,7 +529,8 @@ def uses_uint8(fn: Filter) -> Filter:
         # unsigned integers. If it's not, do the conversion.
         original_type = a.dtype
         if original_type != np.uint8:
-            a = (a * 0xff).astype(np.uint8)
+            with span('uses_uint8', 'to uint8', a) as s:
+                a = s.result((a * 0xff).astype(np.uint8))
 
         # Pass the converted array to the wrapped function.
         a = fn(a, *args, **kwargs)
@@ -195,7 +538,8 @@ def uses_uint8(fn: Filter) -> Filter:
         # Ensure the image data is back to the type that was
         # originally passed to the function when it is returned.
         if original_type != a.dtype:
-            a = a.astype(original_type) / 0xff
+            with span('uses_uint8', 'from uint8', a) as s:
+                a = s.result(a.astype(original_type) / 0xff)
         return a
     return wrapper
 
@@ -224,12 +568,13 @@ def will_square(fn: Filter) -> Filter:
             old_size = a.shape
             largest = max(a.shape[Y:])
             new_size = (*a.shape[:Y], largest, largest)
-            new_a = np.zeros(new_size, dtype=a.dtype)
-            x_start = (largest - old_size[X]) // 2
-            x_end = x_start + old_size[X]
-            y_start = (largest - old_size[Y]) // 2
-            y_end = y_start + old_size[Y]
-            new_a[..., y_start:y_end, x_start:x_end] = a
+            with span('will_square', 'pad', a) as s:
+                new_a = s.result(np.zeros(new_size, dtype=a.dtype))
+                x_start = (largest - old_size[X]) // 2
+                x_end = x_start + old_size[X]
+                y_start = (largest - old_size[Y]) // 2
+                y_end = y_start + old_size[Y]
+                new_a[..., y_start:y_end, x_start:x_end] = a
             a = new_a
             del new_a
 
@@ -248,6 +593,81 @@ def will_square(fn: Filter) -> Filter:
     return wrapper
 
 
+def _process_as_channels(
+    fn: Filter,
+    a: np.ndarray,
+    size: int,
+    out: Optional[np.ndarray],
+    args: tuple,
+    kwargs: dict
+) -> np.ndarray:
+    """Apply a filter to groups of frames as the channels of a
+    single image, writing the result into the output.
+    """
+    name = 'processes_by_grayscale_frame'
+    for start in range(0, len(a), size):
+        group = a[start:start + size]
+        with span(name, 'to channels', group) as s:
+            channels = np.ascontiguousarray(np.moveaxis(group, 0, -1))
+            s.result(channels)
+        result = fn(channels, *args, **kwargs)
+
+        # Single channel results lose their channel axis.
+        result = result.reshape((*result.shape[:2], len(group)))
+        if out is None:
+            out = np.empty((len(a), *result.shape[:2]), dtype=result.dtype)
+        with span(name, 'from channels', group) as s:
+            out[start:start + size] = np.moveaxis(result, -1, 0)
+            s.result(out)
+
+    # Arrays without frames have nothing to filter.
+    if out is None:
+        out = np.empty_like(a)
+    return out
+
+
+def _params(fn: Filter, args: tuple, kwargs: dict) -> dict:
+    """Find the parameters of a call to a filter by name, leaving
+    out the image data.
+    """
+    bound = signature(fn).bind_partial(None, *args, **kwargs)
+    params = dict(bound.arguments)
+    params.pop(next(iter(params)))
+    return params
+
+
+# Output functions.
+def write_frames(out: np.ndarray, frames: Iterable[np.ndarray]) -> np.ndarray:
+    """Write each of the given frames into the output array in order.
+    Since only one frame is handled at a time, this keeps memory use
+    down when the output is a :class:`numpy.memmap`.
+
+    :param out: The array to write into.
+    :param frames: The frames to write.
+    :return: The output array.
+    :rtype: numpy.ndarray
+    """
+    for i, frame in enumerate(frames):
+        out[i] = frame
+    return out
+
+
+def _collect_frames(
+    name: str,
+    a: np.ndarray,
+    frames: Iterable[np.ndarray],
+    out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Write the filtered frames into the output array, or stack them
+    into a new array if there isn't one.
+    """
+    if out is not None:
+        return write_frames(out, frames)
+    frames = list(frames)
+    with span(name, 'stack frames', a) as s:
+        return s.result(np.array(frames))
+
+
 # Discovery functions.
 def get_prefixed_functions(prefix: str, obj: object) -> dict:
     """Return the functions within the given object that start with
@@ -259,109 +679,175 @@ def get_prefixed_functions(prefix: str, obj: object) -> dict:
     return fns
 
 
+# Kernel functions.
+def gaussian_boxes(sigma: float, passes: int = 6) -> list[int]:
+    """Find the sizes of the box blurs that, applied one after the
+    other, best approximate a gaussian blur. The sizes are odd, so
+    the boxes are centered, and are chosen so the variance of the
+    boxes together matches the variance of the gaussian.
+
+    :param sigma: The sigma of the gaussian blur.
+    :param passes: (Optional.) The number of box blurs. More passes
+        are closer to a gaussian.
+    :return: The size of each box.
+    :rtype: list
+
+    Usage::
+
+        >>> gaussian_boxes(16)
+        [21, 23, 23, 23, 23, 23]
+    """
+    ideal = np.sqrt(12 * sigma ** 2 / passes + 1)
+    lower = int(ideal)
+    if lower % 2 == 0:
+        lower -= 1
+    upper = lower + 2
+    n_lower = 12 * sigma ** 2 - passes * (lower ** 2 + 4 * lower + 3)
+    n_lower = round(n_lower / (-4 * lower - 4))
+    return [lower] * n_lower + [upper] * (passes - n_lower)
+
+
 # Interpolation functions.
 def bilinear_interpolation(a: ImgAry, factor: float) -> ImgAry:
-    """Resize an two dimensional array using trilinear
-    interpolation.
+    """Resize the first two axes of an array using bilinear
+    interpolation. Any other axes, such as color channels, are
+    not resized.
 
     :param a: The array to resize. The array is expected to have at
         least two dimensions.
     :param factor: The amount to resize the array. Given how the
         interpolation works, you probably don't get great results
-        with factor less than or equal to .5. Consider multiple
-        passes of interpolation with larger factors in those cases.
+        with factor less than or equal to .5. Consider
+        :func:`imgfilt.filter_shrink` in those cases.
     :return: A :class:ndarray object.
     :rtype: numpy.ndarray
     """
     # Return the array unchanged if the array won't be magnified.
     if factor == 1:
         return a
+    return interpolation_plan(a.shape[:2], factor)(a)
+
+
+def grow_whole(
+    a: ImgAry, factor: int, quality: str = 'linear', axes: int = 3
+) -> ImgAry:
+    """Grow the first three axes of an array by a whole number. Any
+    other axes, such as color channels, are not resized. This gives
+    the same result as :func:`trilinear_interpolation` or
+    :func:`resample`, but since the new pixels fall the same distance
+    past the original pixels in every block, the weights are only
+    found once and applied to slices of the array instead of
+    gathering the original pixels for each new pixel.
+
+    :param a: The array to resize.
+    :param factor: The amount to resize the array. It must be a
+        whole number.
+    :param quality: (Optional.) The interpolation to use. It is
+        either "nearest" or "linear".
+    :param axes: (Optional.) How many of the first axes to resize,
+        such as two for a single frame of color image data.
+    :return: A :class:ndarray object.
+    :rtype: numpy.ndarray
 
-    # Perform a defensive copy of the original array to avoid
-    # unexpected side effects.
-    a = a.copy()
-
-    # Since we are magnifying the given array, the new array's shape
-    # will increase by the magnification factor.
-    mag_size = tuple(int(s * factor) for s in a.shape)
+    Usage::
 
-    # Map out the relationship between the old space and the
-    # new space.
-    indices = np.indices(mag_size)
+        >>> import numpy as np
+        >>>
+        >>> a = np.array([[0.0, 1.0], [1.0, 0.0]])
+        >>> grow_whole(a, 2)
+        array([[0. , 0.5, 1. , 1. ],
+               [0.5, 0.5, 0.5, 0.5],
+               [1. , 0.5, 0. , 0. ],
+               [1. , 0.5, 0. , 0. ]])
+    """
+    if quality not in ('nearest', 'linear'):
+        raise ValueError(f'Cannot grow by a whole number with {quality!r}.')
+
+    # Nearest neighbor repeats each pixel. Once the rows have been
+    # repeated, the other axes can be repeated at once by
+    # broadcasting the rows into the blocks.
+    count = min(a.ndim, axes)
+    grown = [size * factor for size in a.shape[:count]]
+    if quality == 'nearest':
+        rows = np.repeat(a, factor, count - 1)
+        shape = [n for size in a.shape[:count - 1] for n in (size, factor)]
+        blocks = np.empty((*shape, *rows.shape[count - 1:]), a.dtype)
+        blocks[...] = np.expand_dims(rows, tuple(range(1, count * 2 - 1, 2)))
+        return blocks.reshape((*grown, *a.shape[count:]))
+
+    a = a.astype(float, copy=False)
+    for axis in reversed(range(count)):
+        a = _grow_axis(a, factor, axis)
+    return a
+
+
+def _grow_axis(a: ImgAry, factor: int, axis: int) -> ImgAry:
+    """Grow an array along one axis by a whole number with linear
+    interpolation.
+    """
+    # Each original pixel becomes a block of new pixels along the
+    # axis. The new axis after the original one is the position
+    # within the block.
+    pre, size, post = a.shape[:axis], a.shape[axis], a.shape[axis + 1:]
+    out = np.empty((*pre, size, factor, *post), a.dtype)
+
+    # Past the last pixel, the last pixel is used again.
+    before = (slice(None),) * axis
+    behind = a[(*before, slice(None, -1))]
+    ahead = a[(*before, slice(1, None))]
+    last = a[(*before, slice(-1, None))]
+    for k in range(factor):
+        part = k / factor
+        block = out[before + (slice(None), k)]
+        block[(*before, slice(None, -1))] = behind * (1 - part) + ahead * part
+        block[(*before, slice(-1, None))] = last * (1 - part) + last * part
+    return out.reshape((*pre, size * factor, *post))
+
+
+def interpolation_points(
+    size: int, factor: float
+) -> tuple[NDArray[np.int_], NDArray[np.float_]]:
+    """Map the positions along one axis of an array resized by
+    :func:`trilinear_interpolation` back to the original array.
+
+    :param size: The length of the axis in the original array.
+    :param factor: The amount the array is being resized.
+    :return: The index of the original position behind each new
+        position, and how far the new position is past it.
+    :rtype: tuple
+    """
+    indices = np.arange(int(size * factor))
+    if factor == 1:
+        return indices, np.zeros(indices.shape)
     if factor > 1:
         whole = (indices // factor).astype(int)
-        parts = (indices / factor - whole).astype(float)
-    else:
-        new_ends = [s - 1 for s in mag_size]
-        old_ends = [s - 1 for s in a.shape]
-        true_factors = [n / o for n, o in zip(new_ends, old_ends)]
-        for i in range(len(true_factors)):
-            if true_factors[i] == 0:
-                true_factors[i] = .5
-        whole = indices.copy()
-        parts = indices.copy()
-        for i in Y, X:
-            whole[i] = (indices[i] // true_factors[i]).astype(int)
-            parts[i] = (indices[i] / true_factors[i] - whole[i]).astype(float)
-    del indices
-
-    # Trilinear interpolation determines the value of a new pixel by
-    # comparing the values of the eight old pixels that surround it.
-    # The hashes are the keys to the dictionary that contains those
-    # old pixel values. The key indicates the position of the pixel
-    # on each axis, with one meaning the position is ahead of the
-    # new pixel, and zero meaning the position is behind it.
-    hashes = [f'{n:>02b}'[::-1] for n in range(2 ** 2)]
-    hash_table = {}
-
-    # The original array needs to be made one dimensional for the
-    # numpy.take operation that will occur as we build the tables.
-    raveled = np.ravel(a)
-
-    # Build the table that contains the old pixel values to
-    # interpolate.
-    for hash in hashes:
-        hash_whole = whole.copy()
-
-        # Use the hash key to adjust the which old pixel we are
-        # looking at.
-        for axis in Y, X:
-            if hash[axis] == '1':
-                hash_whole[axis] += 1
-
-                # Handle the pixels that were pushed off the far
-                # edge of the original array by giving them the
-                # value of the last pixel along that axis in the
-                # original array.
-                m = np.zeros(hash_whole[axis].shape, dtype=bool)
-                m[hash_whole[axis] >= a.shape[axis]] = True
-                hash_whole[axis][m] = a.shape[axis] - 1
-
-        # Since numpy.take() only works in one dimension, we need to
-        # map the three dimensional indices of the original array to
-        # the one dimensional indices used by the raveled version of
-        # that array.
-        raveled_indices = hash_whole[Y] * a.shape[X]
-        raveled_indices += hash_whole[X]
-
-        # Get the value of the pixel in the original array.
-        hash_table[hash] = np.take(raveled, raveled_indices.astype(int))
-
-    # Once the hash table has been built, clean up the working arrays
-    # in case we are running short on memory.
-    else:
-        del hash_whole, raveled_indices, whole
-
-    # Everything before this was to set up the interpolation. Now that
-    # it's set up, we perform the interpolation. Since we are doing
-    # this across three dimensions, it's a three stage process. Stage
-    # one is along the X axis.
-    x1 = lerp(hash_table['00'], hash_table['01'], parts[X])
-    x2 = lerp(hash_table['10'], hash_table['11'], parts[X])
-
-    # And stage three is along the Z axis. Since this is the last step
-    # we can just return the result.
-    return lerp(x1, x2, parts[Y])
+        return whole, (indices / factor - whole).astype(float)
+
+    # When shrinking, the distance past the original position has
+    # always been truncated to a whole number. It is usually zero, but
+    # rounding in the division can make it one, so keep truncating
+    # rather than assuming it is zero.
+    true_factor = (len(indices) - 1) / (size - 1)
+    if true_factor == 0:
+        true_factor = .5
+    whole = (indices // true_factor).astype(int)
+    return whole, np.trunc(indices / true_factor - whole)
+
+
+@shared_cache(maxsize=32)
+def interpolation_plan(
+    shape: tuple[int, ...], factor: float
+) -> InterpolationPlan:
+    """Get the plan for resizing arrays of the given shape. Plans
+    are cached, so resizing many arrays of the same shape only
+    plans the resize once.
+
+    :param shape: The shape of the axes to resize.
+    :param factor: The amount to resize the axes.
+    :return: A :class:`InterpolationPlan` object.
+    :rtype: imgfilt.utility.InterpolationPlan
+    """
+    return InterpolationPlan(tuple(shape), factor)
 
 
 def lerp(a: ImgAry, b: ImgAry, x: np.ndarray) -> ImgAry:
@@ -387,16 +873,103 @@ def lerp(a: ImgAry, b: ImgAry, x: np.ndarray) -> ImgAry:
     return a.astype(float) * (1 - x.astype(float)) + b.astype(float) * x
 
 
+def resample(
+    a: ImgAry, factor: float, quality: str, axes: int = 3
+) -> ImgAry:
+    """Resize the first three axes of an array with the given
+    interpolation quality. Any other axes, such as color channels,
+    are not resized. The new pixels are in the same positions as
+    those from :func:`trilinear_interpolation`.
+
+    :param a: The array to resize.
+    :param factor: The amount to resize the array.
+    :param quality: The interpolation to use. See
+        :func:`resampling_weights`.
+    :param axes: (Optional.) How many of the first axes to resize,
+        such as two for a single frame of color image data.
+    :return: A :class:ndarray object.
+    :rtype: numpy.ndarray
+
+    Usage::
+
+        >>> import numpy as np
+        >>>
+        >>> a = np.array([[0.0, 1.0], [1.0, 0.0]])
+        >>> resample(a, 2, 'nearest')
+        array([[0., 0., 1., 1.],
+               [0., 0., 1., 1.],
+               [1., 1., 0., 0.],
+               [1., 1., 0., 0.]])
+    """
+    # The axes are resized from last to first, so a video can be
+    # resized one frame at a time with the same result.
+    for axis in reversed(range(min(a.ndim, axes))):
+        indices, weights = resampling_weights(a.shape[axis], factor, quality)
+        a = weigh(
+            [np.take(a, i, axis) for i in indices.T],
+            [w.reshape((-1, *[1] * (a.ndim - axis - 1))) for w in weights.T]
+        )
+    return a
+
+
+def resampling_weights(
+    size: int, factor: float, quality: str
+) -> tuple[NDArray[np.int_], NDArray[np.float_]]:
+    """Find the original positions that make up each new position
+    along one axis of a resized array, and how much each of them
+    contributes.
+
+    :param size: The length of the axis in the original array.
+    :param factor: The amount the array is being resized.
+    :param quality: The interpolation to use. It is one of "nearest",
+        "linear", "cubic", or "lanczos". Nearest uses the original
+        position behind the new one, so growing by a whole number
+        repeats each pixel. The cubic and Lanczos kernels are the
+        ones used by OpenCV.
+    :return: The indices and weights for each new position, with one
+        column for each original position used.
+    :rtype: tuple
+    """
+    whole, parts = interpolation_points(size, factor)
+    parts = parts[:, np.newaxis]
+    if quality == 'nearest':
+        offsets = np.array([0])
+        weights = np.ones(parts.shape)
+    elif quality == 'linear':
+        offsets = np.array([0, 1])
+        weights = np.hstack((1 - parts, parts))
+    elif quality == 'cubic':
+        offsets = np.arange(-1, 3)
+        weights = _cubic_kernel(parts - offsets)
+    elif quality == 'lanczos':
+        offsets = np.arange(-3, 5)
+        weights = np.sinc(parts - offsets) * np.sinc((parts - offsets) / 4)
+        weights /= weights.sum(axis=1, keepdims=True)
+    else:
+        raise ValueError(f'Unknown quality {quality!r}.')
+    indices = np.clip(whole[:, np.newaxis] + offsets, 0, size - 1)
+    return indices, weights
+
+
+def _cubic_kernel(distance: np.ndarray, a: float = -0.75) -> np.ndarray:
+    """The cubic convolution kernel used by OpenCV."""
+    d = np.abs(distance)
+    near = ((a + 2) * d - (a + 3)) * d * d + 1
+    far = ((a * d - 5 * a) * d + 8 * a) * d - 4 * a
+    return np.where(d <= 1, near, np.where(d < 2, far, 0.0))
+
+
 def trilinear_interpolation(a: ImgAry, factor: float) -> ImgAry:
-    """Resize an three dimensional array using trilinear
-    interpolation.
+    """Resize the first three axes of an array using trilinear
+    interpolation. Any other axes, such as color channels, are
+    not resized.
 
     :param a: The array to resize. The array is expected to have at
         least three dimensions.
     :param factor: The amount to resize the array. Given how the
         interpolation works, you probably don't get great results
-        with factor less than or equal to .5. Consider multiple
-        passes of interpolation with larger factors in those cases.
+        with factor less than or equal to .5. Consider
+        :func:`imgfilt.filter_shrink` in those cases.
     :return: A :class:ndarray object.
     :rtype: numpy.ndarray
 
@@ -438,97 +1011,23 @@ def trilinear_interpolation(a: ImgAry, factor: float) -> ImgAry:
     # Return the array unchanged if the array won't be magnified.
     if factor == 1:
         return a
+    return interpolation_plan(a.shape[:3], factor)(a)
 
-    # Perform a defensive copy of the original array to avoid
-    # unexpected side effects.
-    a = a.copy()
 
-    # Since we are magnifying the given array, the new array's shape
-    # will increase by the magnification factor.
-    mag_size = tuple(int(s * factor) for s in a.shape)
+def weigh(
+    values: Sequence[np.ndarray], weights: Sequence[np.ndarray]
+) -> np.ndarray:
+    """Sum the values multiplied by their weights. A single value
+    is returned as is, without being multiplied.
 
-    # Map out the relationship between the old space and the
-    # new space.
-    indices = np.indices(mag_size)
-    if factor > 1:
-        whole = (indices // factor).astype(int)
-        parts = (indices / factor - whole).astype(float)
-    else:
-        new_ends = [s - 1 for s in mag_size]
-        old_ends = [s - 1 for s in a.shape]
-        true_factors = [n / o for n, o in zip(new_ends, old_ends)]
-        for i in range(len(true_factors)):
-            if true_factors[i] == 0:
-                true_factors[i] = .5
-        whole = indices.copy()
-        parts = indices.copy()
-        for i in Z, Y, X:
-            whole[i] = (indices[i] // true_factors[i]).astype(int)
-            parts[i] = (indices[i] / true_factors[i] - whole[i]).astype(float)
-    del indices
-
-    # Trilinear interpolation determines the value of a new pixel by
-    # comparing the values of the eight old pixels that surround it.
-    # The hashes are the keys to the dictionary that contains those
-    # old pixel values. The key indicates the position of the pixel
-    # on each axis, with one meaning the position is ahead of the
-    # new pixel, and zero meaning the position is behind it.
-    hashes = [f'{n:>03b}'[::-1] for n in range(2 ** 3)]
-    hash_table = {}
-
-    # The original array needs to be made one dimensional for the
-    # numpy.take operation that will occur as we build the tables.
-    raveled = np.ravel(a)
-
-    # Build the table that contains the old pixel values to
-    # interpolate.
-    for hash in hashes:
-        hash_whole = whole.copy()
-
-        # Use the hash key to adjust the which old pixel we are
-        # looking at.
-        for axis in Z, Y, X:
-            if hash[axis] == '1':
-                hash_whole[axis] += 1
-
-                # Handle the pixels that were pushed off the far
-                # edge of the original array by giving them the
-                # value of the last pixel along that axis in the
-                # original array.
-                m = np.zeros(hash_whole[axis].shape, dtype=bool)
-                m[hash_whole[axis] >= a.shape[axis]] = True
-                hash_whole[axis][m] = a.shape[axis] - 1
-
-        # Since numpy.take() only works in one dimension, we need to
-        # map the three dimensional indices of the original array to
-        # the one dimensional indices used by the raveled version of
-        # that array.
-        raveled_indices = hash_whole[Z] * a.shape[Y] * a.shape[X]
-        raveled_indices += hash_whole[Y] * a.shape[X]
-        raveled_indices += hash_whole[X]
-
-        # Get the value of the pixel in the original array.
-        hash_table[hash] = np.take(raveled, raveled_indices.astype(int))
-
-    # Once the hash table has been built, clean up the working arrays
-    # in case we are running short on memory.
-    else:
-        del hash_whole, raveled_indices, whole
-
-    # Everything before this was to set up the interpolation. Now that
-    # it's set up, we perform the interpolation. Since we are doing
-    # this across three dimensions, it's a three stage process. Stage
-    # one is along the X axis.
-    x1 = lerp(hash_table['000'], hash_table['001'], parts[X])
-    x2 = lerp(hash_table['010'], hash_table['011'], parts[X])
-    x3 = lerp(hash_table['100'], hash_table['101'], parts[X])
-    x4 = lerp(hash_table['110'], hash_table['111'], parts[X])
-
-    # Stage two is along the Y axis.
-    y1 = lerp(x1, x2, parts[Y])
-    y2 = lerp(x3, x4, parts[Y])
-    del x1, x2, x3, x4
-
-    # And stage three is along the Z axis. Since this is the last step
-    # we can just return the result.
-    return lerp(y1, y2, parts[Z])
+    :param values: The values to sum.
+    :param weights: The weight of each value.
+    :return: A :class:ndarray object.
+    :rtype: numpy.ndarray
+    """
+    if len(values) == 1:
+        return values[0]
+    out = values[0] * weights[0]
+    for value, weight in zip(values[1:], weights[1:]):
+        out += value * weight
+    return out
@@ -0,0 +1,186 @@
+"""
+test_autotune
+~~~~~~~~~~~~~
+
+Unit tests for the imgfilt.autotune module.
+"""
+import json
+
+import numpy as np
+import pytest as pt
+
+import imgfilt as f
+from imgfilt import autotune as at
+from imgfilt import settings
+
+
+# Fixtures.
+@pt.fixture
+def image():
+    """Video with a flat background and a noisy patch."""
+    a = np.full((3, 40, 300), 0.25)
+    a[:, 10:30, 100:200] = np.random.default_rng(0).random((3, 20, 100))
+    yield a
+
+
+@pt.fixture
+def path(tmp_path):
+    """A file to save choices in."""
+    yield tmp_path / 'imgfilt' / 'autotune.json'
+
+
+# Test cases.
+class TestAutotuner:
+    @pt.mark.parametrize('name,kwargs', [
+        ('box_blur', {'size': 5}),
+        ('colorize', {'colorkey': 'r'}),
+        ('glow', {'sigma': 3}),
+        ('twirl', {'radius': 12, 'strength': 1}),
+    ])
+    def test_call(self, name, kwargs, image, path):
+        """Given the name of a filter and image data,
+        :class:`Autotuner` should apply the filter with the fastest
+        strategy, giving the same result as the filter.
+        """
+        tuner = at.Autotuner(path, repeat=1, processes=1)
+        result = tuner(name, image, **kwargs)
+        assert np.allclose(result, f.filters[name](image, **kwargs))
+
+    def test_candidates(self, image):
+        """Given the name of a filter and image data,
+        :meth:`Autotuner.candidates` should return the strategies
+        that can apply the filter.
+        """
+        tuner = at.Autotuner(None, processes=2)
+        names = [s.name for s in tuner.candidates('box_blur', image)]
+        assert names == ['frames', 'batch', 'processes', 'tiles']
+        names = [s.name for s in tuner.candidates('twirl', image)]
+        assert names == ['frames', 'processes']
+
+    @pt.mark.parametrize('quality,batches', [
+        ('linear', [8, 9]),
+        ('lanczos', [4]),
+    ])
+    def test_candidates_batch(self, quality, batches):
+        """Given a filter that can pass fewer frames as channels with
+        some settings, :meth:`Autotuner.candidates` should only offer
+        batches the settings allow.
+        """
+        a = np.zeros((9, 16, 16))
+        kwargs = {'amount': 0.5, 'radius': 6, 'scale': (1, 1)}
+        tuner = at.Autotuner(None, processes=1)
+        with settings.override(quality=quality):
+            strategies = tuner.candidates('pinch', a, **kwargs)
+        assert [s.batch for s in strategies if s.name == 'batch'] == batches
+
+    @pt.mark.parametrize('strategy', [
+        at.Strategy(),
+        at.Strategy('batch', batch=2),
+        at.Strategy('processes', processes=2),
+        at.Strategy('tiles', tile=64),
+        at.Strategy(backend='numpy'),
+    ])
+    def test_strategies(self, strategy, image):
+        """Given a strategy, :meth:`Strategy.apply` should give the
+        same result as the filter.
+        """
+        result = strategy.apply(f.filter_box_blur, image, size=5)
+        assert np.allclose(result, f.filter_box_blur(image, 5))
+
+    def test_saves_choices(self, image, path):
+        """Given a file, :class:`Autotuner` should save its choices
+        under the fingerprint of the machine, and a new
+        :class:`Autotuner` should use them without timing again.
+        """
+        tuner = at.Autotuner(path, repeat=1, processes=1)
+        strategy = tuner.tune('box_blur', image, size=5)
+        saved = json.loads(path.read_text())
+        key = (
+            "box_blur:3x40x300:float64:size=5:map_resolution=1.0,"
+            "quality='linear',gaussian_engine='auto',"
+            "gaussian_threshold=16.0,backend='cv2'"
+        )
+        assert saved[at.machine_fingerprint()][key] == strategy._asdict()
+
+        tuner = at.Autotuner(path, processes=1)
+        tuner._time = None
+        assert tuner.tune('box_blur', image, size=5) == strategy
+
+    def test_keeps_other_machines(self, image, path):
+        """Given a file with choices from another machine,
+        :class:`Autotuner` should keep them and not use them.
+        """
+        other = {'other': {'box_blur:3x40x300:float64': {'name': 'batch'}}}
+        path.parent.mkdir(parents=True)
+        path.write_text(json.dumps(other))
+        tuner = at.Autotuner(path, repeat=1, processes=1)
+        assert tuner.choices == {}
+        tuner.tune('box_blur', image, size=5)
+        saved = json.loads(path.read_text())
+        assert saved['other'] == other['other']
+        assert at.machine_fingerprint() in saved
+
+    def test_retunes_new_shape(self, image):
+        """Given image data of a shape not seen before,
+        :meth:`Autotuner.tune` should time the strategies again.
+        """
+        tuner = at.Autotuner(None, repeat=1, processes=1)
+        tuner.tune('box_blur', image, size=5)
+        tuner.tune('box_blur', image[0], size=5)
+        tuner.tune('box_blur', image.astype(np.float32), size=5)
+        assert len(tuner.choices) == 3
+
+    def test_retunes_new_params(self, image):
+        """Given new parameters or settings, :meth:`Autotuner.tune`
+        should time the strategies again.
+        """
+        tuner = at.Autotuner(None, repeat=1, processes=1)
+        tuner.tune('box_blur', image, size=5)
+        tuner.tune('box_blur', image, size=7)
+        with settings.override(quality='nearest'):
+            tuner.tune('box_blur', image, size=5)
+        assert len(tuner.choices) == 3
+
+    def test_skips_failures(self, image, monkeypatch):
+        """Given a strategy that fails, :meth:`Autotuner.tune` should
+        skip it, but raise the errors of the filter itself.
+        """
+        def candidates(self, name, a, **kwargs):
+            return [at.Strategy(), at.Strategy(backend='spam')]
+
+        monkeypatch.setattr(at.Autotuner, 'candidates', candidates)
+        tuner = at.Autotuner(None, repeat=1, processes=1)
+        assert tuner.tune('box_blur', image, size=5) == at.Strategy()
+        with pt.raises(TypeError):
+            tuner.tune('box_blur', image)
+
+    def test_quality(self, path):
+        """Given a filter that can pass fewer frames as channels with
+        the current settings, :class:`Autotuner` should apply it.
+        """
+        a = np.random.default_rng(0).random((9, 16, 16))
+        kwargs = {'amount': 0.5, 'radius': 6, 'scale': (1, 1)}
+        tuner = at.Autotuner(path, repeat=1, processes=1)
+        with settings.override(quality='lanczos'):
+            result = tuner('pinch', a, **kwargs)
+            expected = f.filter_pinch(a, **kwargs)
+        assert np.allclose(result, expected)
+
+    def test_default_path(self, monkeypatch, tmp_path):
+        """Given no path, :class:`Autotuner` should save its choices
+        in the user's cache directory.
+        """
+        monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+        tuner = at.Autotuner()
+        assert tuner.path == tmp_path / 'imgfilt' / 'autotune.json'
+
+    def test_unreadable_file(self, image, path):
+        """Given a file that isn't JSON, :class:`Autotuner` should
+        start with no choices and replace the file.
+        """
+        path.parent.mkdir(parents=True)
+        path.write_text('not json')
+        tuner = at.Autotuner(path, repeat=1, processes=1)
+        assert tuner.choices == {}
+        tuner.tune('box_blur', image, size=5)
+        assert at.machine_fingerprint() in json.loads(path.read_text())
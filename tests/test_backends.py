@@ -0,0 +1,191 @@
+"""
+test_backends
+~~~~~~~~~~~~~
+
+Unit tests for the imgfilt.backends module.
+"""
+import numpy as np
+import pytest as pt
+
+import imgfilt as f
+from imgfilt import backends as b
+from imgfilt import settings
+
+
+# Fixtures.
+@pt.fixture
+def frame():
+    """A random frame for testing."""
+    yield np.random.default_rng(0).random((24, 32)).astype(np.float32)
+
+
+@pt.fixture
+def maps():
+    """Float maps that move pixels partly off the frame."""
+    ys, xs = np.indices((24, 32), dtype=np.float32)
+    yield xs * 1.1 - 2.3, ys * 0.9 + np.sin(xs / 3) * 2
+
+
+# Utility functions.
+def fast_backends(operation):
+    """The backends of an operation other than the reference."""
+    return [name for name in b.implementations(operation) if name != 'numpy']
+
+
+def loop(fn):
+    """Get the plain Python version of a loop Numba may compile."""
+    return getattr(fn, 'py_func', fn)
+
+
+# Test cases.
+class TestOperations:
+    @pt.mark.parametrize('backend', fast_backends('box'))
+    @pt.mark.parametrize('size', [1, 3, 4])
+    def test_box(self, backend, size, frame):
+        """Each backend should blur like the NumPy reference."""
+        expected = b.get_implementation('box', 'numpy')(frame, size)
+        result = b.get_implementation('box', backend)(frame, size)
+        assert np.allclose(result, expected, atol=1e-5)
+
+    @pt.mark.parametrize('backend', fast_backends('convolve'))
+    @pt.mark.parametrize('shape', [(3, 3), (1, 5), (4, 4), (7, 1)])
+    def test_convolve(self, backend, shape, frame):
+        """Each backend should convolve like the NumPy reference."""
+        kernel = np.random.default_rng(1).random(shape)
+        expected = b.get_implementation('convolve', 'numpy')(frame, kernel)
+        result = b.get_implementation('convolve', backend)(frame, kernel)
+        assert np.allclose(result, expected, atol=1e-5)
+
+    @pt.mark.parametrize('backend', fast_backends('gaussian'))
+    @pt.mark.parametrize('sigma', [0.5, 1.5, 3])
+    def test_gaussian(self, backend, sigma, frame):
+        """Each backend should blur like the NumPy reference."""
+        expected = b.get_implementation('gaussian', 'numpy')(frame, sigma)
+        result = b.get_implementation('gaussian', backend)(frame, sigma)
+        assert np.allclose(result, expected, atol=1e-5)
+
+    @pt.mark.parametrize('backend', fast_backends('remap'))
+    @pt.mark.parametrize('interpolation', [
+        b.cv2.INTER_NEAREST, b.cv2.INTER_LINEAR,
+    ])
+    def test_remap(self, backend, interpolation, frame, maps):
+        """Each backend should remap like the NumPy reference."""
+        args = (*maps, interpolation, b.cv2.BORDER_CONSTANT)
+        expected = b.get_implementation('remap', 'numpy')(frame, *args)
+        result = b.get_implementation('remap', backend)(frame, *args)
+        assert np.allclose(result, expected, atol=1e-5)
+
+    def test_remap_fixed(self, frame, maps):
+        """Given fixed point maps, the NumPy reference should remap
+        like OpenCV.
+        """
+        fixed = f.maps.fixed_point(*maps)
+        args = (*fixed, b.cv2.INTER_NEAREST, b.cv2.BORDER_CONSTANT)
+        expected = b.get_implementation('remap', 'cv2')(frame, *args)
+        result = b.get_implementation('remap', 'numpy')(frame, *args)
+        assert (result == expected).all()
+
+    @pt.mark.parametrize('interpolation,border', [
+        (b.cv2.INTER_CUBIC, b.cv2.BORDER_CONSTANT),
+        (b.cv2.INTER_LANCZOS4, b.cv2.BORDER_CONSTANT),
+        (b.cv2.INTER_LINEAR, b.cv2.BORDER_REFLECT),
+    ])
+    def test_remap_unsupported(self, interpolation, border, frame, maps):
+        """Given an interpolation or border the NumPy reference can't
+        do, it should remap with OpenCV.
+        """
+        args = (*maps, interpolation, border)
+        expected = b.get_implementation('remap', 'cv2')(frame, *args)
+        result = b.get_implementation('remap', 'numpy')(frame, *args)
+        assert (result == expected).all()
+
+    def test_loops(self, frame, maps):
+        """The loops compiled by Numba should give the same result as
+        the NumPy reference.
+        """
+        kernel = np.random.default_rng(1).random((3, 5))
+        channels = frame[..., None].astype(np.float64)
+        out = np.empty(channels.shape)
+        loop(b._convolve_loop)(b._pad(channels, kernel.shape), kernel, out)
+        expected = b.get_implementation('convolve', 'numpy')(frame, kernel)
+        assert np.allclose(out[..., 0], expected, atol=1e-5)
+
+        xs, ys = (m.astype(np.float64) for m in maps)
+        loop(b._remap_loop)(channels, xs, ys, True, out)
+        args = (*maps, b.cv2.INTER_LINEAR, b.cv2.BORDER_CONSTANT)
+        expected = b.get_implementation('remap', 'numpy')(frame, *args)
+        assert np.allclose(out[..., 0], expected, atol=1e-5)
+
+
+class TestSelection:
+    def test_setting(self, frame):
+        """The `backend` setting should choose the implementation."""
+        with settings.override(backend='numpy'):
+            assert b.get_implementation('convolve') is b._convolve_numpy
+        assert b.get_implementation('convolve') is b._convolve_cv2
+
+    def test_fallback(self, monkeypatch):
+        """Given an installed backend the operation doesn't have, the
+        OpenCV implementation should be used.
+        """
+        registry = {**b._implementations, 'remap': {'cv2': b._remap_cv2}}
+        monkeypatch.setattr(b, '_implementations', registry)
+        assert b.get_implementation('remap', 'numpy') is b._remap_cv2
+
+    def test_not_installed(self):
+        """Given a backend that isn't installed,
+        :func:`get_implementation` should raise a :class:`ValueError`.
+        """
+        with pt.raises(ValueError, match='not installed'):
+            b.get_implementation('remap', 'spam')
+
+    @pt.mark.skipif(b.numba is not None, reason='Numba is installed.')
+    def test_numba_not_installed(self):
+        """Given the numba backend when Numba isn't installed,
+        :func:`imgfilt.configure` should raise a :class:`ValueError`.
+        """
+        with pt.raises(ValueError, match='needs Numba'):
+            settings.configure(backend='numba')
+
+    def test_invalid_setting(self):
+        """Given an unknown backend, :func:`imgfilt.configure` should
+        raise a :class:`ValueError`.
+        """
+        with pt.raises(ValueError, match='Unknown backend'):
+            settings.configure(backend='spam')
+
+    @pt.mark.parametrize('name,kwargs', [
+        ('box_blur', {'size': 5}),
+        ('gaussian_blur', {'sigma': 2}),
+        ('gaussian_blur', {'sigma': 20}),
+        ('glow', {'sigma': 3}),
+        ('motion_blur', {'amount': 5, 'axis': f.Y}),
+        ('pinch', {'amount': 0.5, 'radius': 10, 'scale': (1, 1)}),
+        ('polar_to_linear', {}),
+        ('ripple', {'wave': (8, 8), 'amp': (2, 2), 'distaxis': (f.X, f.Y)}),
+    ])
+    def test_filter(self, name, kwargs, frame):
+        """Given a backend, a filter should use it for the call and
+        give the same result as with OpenCV.
+        """
+        video = np.stack([frame, frame[::-1]])
+        expected = f.filters[name](video, **kwargs)
+        result = f.filters[name](video, backend='numpy', **kwargs)
+        assert np.allclose(result, expected, atol=1e-5)
+        assert settings.get_settings().backend == 'cv2'
+
+    @pt.mark.parametrize('backend', [
+        name for name in b.implementations('remap') if name != 'cv2'
+    ])
+    @pt.mark.parametrize('quality', ['cubic', 'lanczos'])
+    def test_filter_quality(self, backend, quality, frame):
+        """Given a backend and a quality it can't remap with, a
+        filter should remap with OpenCV instead of failing.
+        """
+        video = np.stack([frame, frame[::-1]])
+        kwargs = {'amount': 0.5, 'radius': 10, 'scale': (1, 1)}
+        with settings.override(quality=quality):
+            expected = f.filter_pinch(video, **kwargs)
+        with settings.override(backend=backend, quality=quality):
+            result = f.filter_pinch(video, **kwargs)
+        assert (result == expected).all()
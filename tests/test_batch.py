@@ -0,0 +1,266 @@
+"""
+test_batch
+~~~~~~~~~~
+
+Unit tests for the imgfilt.batch module and command line interface.
+"""
+import json
+
+import cv2
+import numpy as np
+import pytest as pt
+from PIL import Image
+
+from imgfilt import __main__ as m
+from imgfilt import batch as b
+from imgfilt import imgfilt as f
+from imgfilt import threads as th
+from imgfilt.pipeline import Pipeline
+from imgfilt.settings import get_settings
+
+
+# Fixtures.
+@pt.fixture
+def video_2_3_3():
+    """An array of video data for testing."""
+    yield np.array([
+        [
+            [1.0, 0.5, 0.0, ],
+            [0.5, 0.0, 0.5, ],
+            [0.0, 0.5, 1.0, ],
+        ],
+        [
+            [0.0, 0.5, 1.0, ],
+            [0.5, 1.0, 0.5, ],
+            [1.0, 0.5, 0.0, ],
+        ],
+    ], dtype=float)
+
+
+@pt.fixture
+def pipeline_file(tmp_path):
+    """A pipeline definition file for testing."""
+    path = tmp_path / 'pipeline.json'
+    path.write_text(json.dumps([{'filter': 'inverse'}]))
+    yield path
+
+
+# Test cases.
+class TestReadWrite:
+    def test_npy(self, tmp_path, video_2_3_3):
+        """Image data written to a ".npy" file by :func:`write_array`
+        should be read back by :func:`read_array` unchanged.
+        """
+        path = tmp_path / 'spam.npy'
+        b.write_array(path, video_2_3_3)
+        assert (b.read_array(path) == video_2_3_3).all()
+
+    def test_npz(self, tmp_path, video_2_3_3):
+        """Arrays written to a ".npz" file by :func:`write_array`
+        should be read back by :func:`read_array` by key.
+        """
+        path = tmp_path / 'spam.npz'
+        b.write_array(path, {'eggs': video_2_3_3})
+        result = b.read_array(path)
+        assert list(result) == ['eggs']
+        assert (result['eggs'] == video_2_3_3).all()
+
+    def test_tiff(self, tmp_path, video_2_3_3):
+        """Video written to a ".tiff" file by :func:`write_array`
+        should be saved as one page per frame and read back by
+        :func:`read_array` as three-dimensional image data.
+        """
+        path = tmp_path / 'spam.tiff'
+        b.write_array(path, video_2_3_3)
+        result = b.read_array(path)
+        assert result.shape == (2, 3, 3)
+        assert (np.around(result, 2) == np.around(video_2_3_3, 2)).all()
+
+
+    def test_png_frames(self, tmp_path, video_2_3_3):
+        """Given video and a file type that holds one frame,
+        :func:`write_array` should raise a :class:`ValueError` rather
+        than drop frames.
+        """
+        with pt.raises(ValueError, match='hold one frame'):
+            b.write_array(tmp_path / 'spam.png', video_2_3_3)
+
+    def test_color_frame(self, tmp_path, video_2_3_3):
+        """Given a single color frame, :func:`process_file` should
+        save it as one RGB image.
+        """
+        src, dst = tmp_path / 'spam.npy', tmp_path / 'eggs.png'
+        np.save(src, video_2_3_3[0])
+        pipeline = Pipeline.from_spec([{'filter': 'colorize'}])
+        b.process_file(pipeline, src, dst)
+        with Image.open(dst) as img:
+            assert img.mode == 'RGB'
+            assert img.size == (3, 3)
+            assert getattr(img, 'n_frames', 1) == 1
+
+
+class TestRunBatch:
+    def test_run_batch(self, tmp_path, video_2_3_3):
+        """Given a pipeline, input files, and an output directory,
+        :func:`run_batch` should filter each file and save the
+        result in the output directory.
+        """
+        indir = tmp_path / 'in'
+        indir.mkdir()
+        for name in 'spam', 'eggs', 'bacon':
+            np.save(indir / f'{name}.npy', video_2_3_3)
+        outdir = tmp_path / 'out'
+        pipeline = Pipeline.from_spec([{'filter': 'inverse'}])
+
+        results = list(b.run_batch(
+            pipeline, [indir], outdir, processes=2, max_pending=1
+        ))
+
+        assert sorted(src.name for src, _ in results) == [
+            'bacon.npy', 'eggs.npy', 'spam.npy',
+        ]
+        for _, dst in results:
+            result = np.load(dst)
+            assert (result == f.filter_inverse(video_2_3_3)).all()
+
+    def test_processes(self, monkeypatch, tmp_path):
+        """Given no number of processes, :func:`run_batch` should
+        start as many workers as the thread policy's share.
+        """
+        calls = []
+        monkeypatch.setattr(b, '_run_jobs', lambda *args: calls.append(args))
+        pipeline = Pipeline.from_spec([{'filter': 'inverse'}])
+        with th.threads(budget=8, jobs=2):
+            b.run_batch(pipeline, [], tmp_path)
+        assert calls[0][2:] == (4, 8)
+
+    def test_worker_threads(self, tmp_path, video_2_3_3):
+        """Workers should split the share of threads of the process
+        running the batch between them.
+        """
+        src, dst = tmp_path / 'spam.npy', tmp_path / 'eggs.npy'
+        np.save(src, video_2_3_3)
+        pipeline = Pipeline.from_spec([{'filter': 'inverse'}])
+        policy = th.ThreadPolicy(budget=8, jobs=2)
+        try:
+            b._process_file(pipeline, src, dst, get_settings(), policy, 2)
+            assert cv2.getNumThreads() == 2
+        finally:
+            th.apply_policy(th.get_policy())
+
+    def test_same_names(self, tmp_path, video_2_3_3):
+        """Given files with the same name in different folders,
+        :func:`run_batch` should keep their relative paths in the
+        output directory.
+        """
+        for folder in 'spam', 'eggs':
+            (tmp_path / folder).mkdir()
+            np.save(tmp_path / folder / 'bacon.npy', video_2_3_3)
+        srcs = [tmp_path / 'spam' / 'bacon.npy', tmp_path / 'eggs']
+        outdir = tmp_path / 'out'
+        pipeline = Pipeline.from_spec([{'filter': 'inverse'}])
+
+        results = dict(b.run_batch(pipeline, srcs, outdir, processes=1))
+
+        assert sorted(results.values()) == [
+            outdir.resolve() / 'eggs' / 'bacon.npy',
+            outdir.resolve() / 'spam' / 'bacon.npy',
+        ]
+
+    def test_refuses_input(self, tmp_path, video_2_3_3):
+        """Given an output directory that would overwrite an input
+        file, :func:`run_batch` should raise a ValueError before
+        filtering anything.
+        """
+        src = tmp_path / 'spam.npy'
+        np.save(src, video_2_3_3)
+        pipeline = Pipeline.from_spec([{'filter': 'inverse'}])
+        with pt.raises(ValueError, match='overwrite'):
+            b.run_batch(pipeline, [src], tmp_path)
+        assert (np.load(src) == video_2_3_3).all()
+
+    def test_refuses_collision(self, tmp_path, video_2_3_3):
+        """Given two files that would be saved to the same file,
+        :func:`run_batch` should raise a ValueError.
+        """
+        np.save(tmp_path / 'spam.npy', video_2_3_3)
+        np.savez(tmp_path / 'spam.npz', video_2_3_3)
+        pipeline = Pipeline.from_spec([{'filter': 'inverse'}])
+        with pt.raises(ValueError, match='both'):
+            b.run_batch(pipeline, [tmp_path], tmp_path / 'out', suffix='.png')
+
+    def test_overwrite(self, tmp_path, video_2_3_3):
+        """Given an output file that exists, :func:`run_batch` should
+        raise a FileExistsError, unless told to overwrite it.
+        """
+        src = tmp_path / 'spam.npy'
+        np.save(src, video_2_3_3)
+        outdir = tmp_path / 'out'
+        outdir.mkdir()
+        np.save(outdir / 'spam.npy', np.zeros(1))
+        pipeline = Pipeline.from_spec([{'filter': 'inverse'}])
+        with pt.raises(FileExistsError):
+            b.run_batch(pipeline, [src], outdir)
+
+        list(b.run_batch(pipeline, [src], outdir, overwrite=True))
+        result = np.load(outdir / 'spam.npy')
+        assert (result == f.filter_inverse(video_2_3_3)).all()
+
+
+class TestMain:
+    def test_main(self, capsys, pipeline_file, tmp_path, video_2_3_3):
+        """When invoked from the command line, :func:`main` should
+        filter the given files with the given pipeline.
+        """
+        src = tmp_path / 'spam.npy'
+        np.save(src, video_2_3_3)
+        outdir = tmp_path / 'out'
+
+        m.main([
+            str(pipeline_file), str(src),
+            '-o', str(outdir), '-p', '1', '-s', '.npz',
+        ])
+
+        result = np.load(outdir / 'spam.npz')['arr_0']
+        assert (result == f.filter_inverse(video_2_3_3)).all()
+        assert capsys.readouterr().out == f'{src} -> {outdir / "spam.npz"}\n'
+
+    def test_main_requires_output(self, capsys, pipeline_file, tmp_path):
+        """Given no output directory, :func:`main` should exit with
+        an error rather than write into the current directory.
+        """
+        src = tmp_path / 'spam.npy'
+        np.save(src, np.zeros((1, 2, 2)))
+        with pt.raises(SystemExit):
+            m.main([str(pipeline_file), str(src)])
+        assert '--output' in capsys.readouterr().err
+
+    @pt.mark.parametrize('text', ['[{"filter": "spam"}]', '[{', '[1]'])
+    def test_main_bad_pipeline(self, capsys, tmp_path, text):
+        """Given a pipeline file that can't be loaded, :func:`main`
+        should exit with an error.
+        """
+        path = tmp_path / 'pipeline.json'
+        path.write_text(text)
+        with pt.raises(SystemExit):
+            m.main([str(path), str(tmp_path), '-o', str(tmp_path / 'out')])
+        assert 'Could not load' in capsys.readouterr().err
+
+    def test_main_force(self, capsys, pipeline_file, tmp_path, video_2_3_3):
+        """Given an output file that exists, :func:`main` should exit
+        with an error, unless passed `--force`.
+        """
+        src = tmp_path / 'spam.npy'
+        np.save(src, video_2_3_3)
+        outdir = tmp_path / 'out'
+        outdir.mkdir()
+        np.save(outdir / 'spam.npy', np.zeros(1))
+        argv = [str(pipeline_file), str(src), '-o', str(outdir), '-p', '1']
+
+        with pt.raises(SystemExit):
+            m.main(argv)
+        assert 'already exists' in capsys.readouterr().err
+
+        m.main([*argv, '--force', '-q'])
+        result = np.load(outdir / 'spam.npy')
+        assert (result == f.filter_inverse(video_2_3_3)).all()
@@ -0,0 +1,121 @@
+"""
+test_compiled
+~~~~~~~~~~~~~
+
+Unit tests for the imgfilt.compiled module.
+"""
+import numpy as np
+import pytest as pt
+
+import imgfilt as f
+from imgfilt import compiled as c
+from imgfilt import settings
+
+
+# Fixtures.
+@pt.fixture
+def video():
+    """Random video data for testing."""
+    yield np.random.default_rng(0).random((2, 24, 32)).astype(np.float32)
+
+
+# Test cases.
+class TestCompile:
+    @pt.mark.parametrize('name,kwargs,cls', [
+        ('box_blur', {'size': 5}, c.CompiledBoxBlur),
+        ('colorize', {'colorkey': 'r'}, c.CompiledColorize),
+        ('colorize', {'white': 'red', 'black': 'navy'}, c.CompiledColorize),
+        ('gaussian_blur', {'sigma': 2}, c.CompiledFilter),
+        ('motion_blur', {'amount': 5, 'axis': f.X}, c.CompiledMotionBlur),
+        ('motion_blur', {'amount': 5, 'axis': f.Y}, c.CompiledMotionBlur),
+        ('pinch', {'amount': 0.5, 'radius': 10, 'scale': (1, 1)},
+         c.CompiledRemap),
+        ('polar_to_linear', {}, c.CompiledRemap),
+        ('skew', {'slope': 0.3}, c.CompiledSkew),
+    ])
+    def test_compile(self, name, kwargs, cls, video):
+        """Given the name of a filter and its parameters,
+        :func:`compile` should return an object that gives the same
+        result as the filter.
+        """
+        compiled = c.compile(name, **kwargs)
+        assert type(compiled) is cls
+        assert (compiled(video) == f.filters[name](video, **kwargs)).all()
+        frame = video[0]
+        assert (compiled(frame) == f.filters[name](frame, **kwargs)).all()
+
+    def test_motion_blur_z(self, video):
+        """Given a motion blur along the Z axis, :func:`compile`
+        should return a filter that calls the filter.
+        """
+        compiled = c.compile('motion_blur', amount=3, axis=f.Z)
+        assert type(compiled) is c.CompiledFilter
+        assert (compiled(video) == f.filter_motion_blur(video, 3, f.Z)).all()
+
+    def test_new_size(self, video):
+        """Given frames of a new size, a compiled filter should rebuild
+        what depends on the size of the frames.
+        """
+        compiled = c.compile('skew', slope=0.3)
+        compiled(video)
+        frame = video[0, :16, :20]
+        assert (compiled(frame) == f.filter_skew(frame, 0.3)).all()
+
+    def test_quality(self, video):
+        """A compiled filter should use the settings in effect when it
+        was compiled.
+        """
+        with settings.override(quality='nearest'):
+            compiled = c.compile('pinch', amount=0.5, radius=10, scale=(1, 1))
+            expected = f.filter_pinch(video, 0.5, 10, (1, 1))
+        assert (compiled(video) == expected).all()
+
+    @pt.mark.parametrize('name,kwargs', [
+        ('pinch', {'amount': 0.5, 'radius': 10, 'scale': (1, 1)}),
+        ('twirl', {'radius': 12, 'strength': 1}),
+    ])
+    def test_settings_changed(self, name, kwargs, video):
+        """Given settings changed between compiling and calling, a
+        compiled filter should build its maps with the settings in
+        effect when it was compiled.
+        """
+        changes = {'map_resolution': 0.25, 'quality': 'nearest'}
+        with settings.override(**changes):
+            compiled = c.compile(name, **kwargs)
+            expected = f.filters[name](video, **kwargs)
+        assert (compiled(video) == expected).all()
+
+        compiled = c.compile(name, **kwargs)
+        with settings.override(**changes):
+            result = compiled(video)
+        assert (result == f.filters[name](video, **kwargs)).all()
+
+    def test_slots(self):
+        """Compiled filters shouldn't have a :attr:`__dict__`."""
+        compiled = c.compile('box_blur', size=3)
+        assert not hasattr(compiled, '__dict__')
+
+    @pt.mark.parametrize('name,kwargs,exc', [
+        ('box_blur', {}, TypeError),
+        ('box_blur', {'size': 3, 'spam': 1}, TypeError),
+        ('colorize', {'white': 'not a color'}, ValueError),
+        ('motion_blur', {'amount': 3, 'axis': 0}, ValueError),
+        ('spam', {}, ValueError),
+    ])
+    def test_invalid(self, name, kwargs, exc):
+        """Given invalid parameters, :func:`compile` should raise an
+        exception before the filter is called.
+        """
+        with pt.raises(exc):
+            c.compile(name, **kwargs)
+
+    def test_abstract(self):
+        """Given a subclass that doesn't define a :meth:`frame`
+        method, creating the compiled filter should raise a
+        :class:`TypeError`.
+        """
+        class Incomplete(c._CompiledFrameFilter):
+            __slots__ = ()
+
+        with pt.raises(TypeError):
+            Incomplete('box_blur', size=3)
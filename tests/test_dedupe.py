@@ -0,0 +1,68 @@
+"""
+test_dedupe
+~~~~~~~~~~~
+
+Unit tests for the imgfilt.dedupe module.
+"""
+import numpy as np
+import pytest as pt
+
+import imgfilt as f
+from imgfilt import dedupe as d
+
+
+# Fixtures.
+@pt.fixture
+def video():
+    """Video with held frames and a frame repeated later."""
+    rng = np.random.default_rng(0)
+    frames = rng.random((3, 32, 32))
+    yield frames[[0, 0, 0, 1, 2, 2, 0]]
+
+
+# Test cases.
+class TestFrameDeduper:
+    @pt.mark.parametrize('name,kwargs', [
+        ('box_blur', {'size': 3}),
+        ('gaussian_blur', {'sigma': 2}),
+        ('glow', {'sigma': 3}),
+        ('inverse', {}),
+    ])
+    def test_filter(self, name, kwargs, video):
+        """Given `dedupe`, a filter should give the same result as
+        filtering every frame and skip the repeated frames.
+        """
+        deduper = d.FrameDeduper()
+        result = f.filters[name](video, dedupe=deduper, **kwargs)
+        assert (result == f.filters[name](video, **kwargs)).all()
+        assert deduper.frames == 7
+        assert deduper.skipped == 4
+
+    def test_out(self, video):
+        """Given `dedupe` and an output array, the filter should write
+        each frame into the output.
+        """
+        out = np.zeros_like(video)
+        result = f.filter_box_blur(video, 3, dedupe=True, out=out)
+        assert result is out
+        assert (out == f.filter_box_blur(video, 3)).all()
+
+    def test_size(self, video):
+        """Given a size, the deduper should only reuse the results of
+        that many of the most recent unique frames.
+        """
+        deduper = d.FrameDeduper(size=1)
+        f.filter_inverse(video, dedupe=deduper)
+        assert deduper.skipped == 3
+
+    def test_fingerprint_collision(self):
+        """Given frames that only differ where they aren't sampled for
+        the fingerprint, the deduper should filter both frames.
+        """
+        a = np.zeros((2, 64, 64))
+        a[1, 1, 1] = 1.0
+        deduper = d.FrameDeduper(samples=16)
+        assert deduper.fingerprint(a[0]) == deduper.fingerprint(a[1])
+        result = f.filter_inverse(a, dedupe=deduper)
+        assert deduper.skipped == 0
+        assert result[1, 1, 1] == 0.0
@@ -2,10 +2,22 @@
 test_imgfilt
 ~~~~~~~~~~
 """
+import random
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
 import numpy as np
 import pytest as pt
+from numpy.lib.format import open_memmap
 
+from imgfilt import filters
 from imgfilt import imgfilt as f
+from imgfilt import maps, settings, utility
+
+
+# Constants.
+MEMORY_CAP = 2 ** 22
 
 
 # Fixtures.
@@ -31,6 +43,16 @@ def image_1_3_3():
     ], dtype=float)
 
 
+@pt.fixture
+def image_3_5():
+    """An array with unequal X and Y axes for testing."""
+    yield np.array([
+        [0.00, 0.25, 0.50, 0.75, 1.00,],
+        [0.25, 0.50, 0.75, 1.00, 0.75,],
+        [0.50, 0.75, 1.00, 0.75, 0.50,],
+    ], dtype=float)
+
+
 @pt.fixture
 def image_5_5_low_contrast():
     """An image array for testing low contrast situations."""
@@ -95,6 +117,21 @@ def video_2_5_5():
     ], dtype=float)
 
 
+@pt.fixture
+def video_memmap(tmp_path):
+    """A memory mapped array of video data larger than the memory
+    cap for testing.
+    """
+    path = tmp_path / 'video.npy'
+    rng = np.random.default_rng(1138)
+    a = open_memmap(path, 'w+', float, (64, 128, 128))
+    for frame in a:
+        frame[:] = rng.random(frame.shape)
+    a.flush()
+    del a
+    yield np.load(path, mmap_mode='r')
+
+
 # Test cases.
 class TestFilterBoxBlur:
     def test_filter(self, a):
@@ -368,6 +405,35 @@ class TestFilterGaussianBlue:
             ],
         ], dtype=float)).all()
 
+    @pt.mark.parametrize('sigma', [4, 16, 40])
+    def test_filter_box_engine(self, sigma):
+        """Given the box gaussian engine, :func:`filter_gaussian_blur`
+        should closely approximate the exact gaussian blur of noise
+        and of a hard edge.
+        """
+        rng = np.random.default_rng(1138)
+        noise = rng.random((200, 240))
+        edge = np.zeros((200, 240))
+        edge[:, 120:] = 1.0
+        for a in noise, edge:
+            with settings.override(gaussian_engine='exact'):
+                expected = f.filter_gaussian_blur(a, sigma=sigma)
+            with settings.override(gaussian_engine='box'):
+                result = f.filter_gaussian_blur(a, sigma=sigma)
+            assert np.abs(result - expected).max() < 0.01
+
+    def test_filter_auto_engine(self, a):
+        """Given a sigma below the threshold of the auto engine,
+        :func:`filter_gaussian_blur` should do an exact gaussian blur,
+        and given one above it should use box blurs.
+        """
+        with settings.override(gaussian_engine='exact'):
+            expected = f.filter_gaussian_blur(a, sigma=2)
+        with settings.override(gaussian_threshold=2.5):
+            assert (f.filter_gaussian_blur(a, sigma=2) == expected).all()
+        with settings.override(gaussian_threshold=1.5):
+            assert (f.filter_gaussian_blur(a, sigma=2) != expected).any()
+
 
 class TestFilterGlow:
     def test_filter(self, video_2_5_5):
@@ -448,6 +514,28 @@ class TestFilterGrow:
             [0.0000, 0.2500, 0.5000, 0.7500, 1.0000, 1.0000],
         ], dtype=float)).all()
 
+    @pt.mark.parametrize('quality', ['nearest', 'linear'])
+    def test_filter_whole_factor(self, quality, video_2_5_5):
+        """Given a whole number factor, :func:`filter_grow` should
+        give the same result as resampling with any other factor.
+        """
+        result = f.filter_grow(video_2_5_5, factor=3, quality=quality)
+        expected = f.resample(video_2_5_5, 3, quality)
+        assert np.allclose(result, expected)
+
+    @pt.mark.parametrize('quality', ['nearest', 'linear', 'cubic'])
+    def test_filter_color(self, quality):
+        """Given color video and a whole number factor,
+        :func:`filter_grow` should leave the color channels alone,
+        whether or not it writes into an array.
+        """
+        a = np.random.default_rng(0).random((2, 8, 8, 3))
+        result = f.filter_grow(a, factor=2, quality=quality)
+        assert result.shape == (4, 16, 16, 3)
+        out = np.zeros(result.shape)
+        f.filter_grow(a, factor=2, quality=quality, out=out)
+        assert np.allclose(out, result)
+
 
 class TestFilterInverse:
     def test_filter(self, a):
@@ -471,7 +559,7 @@ class TestFilterLinearToPolar:
         """
         result = f.filter_linear_to_polar(a)
         assert (np.around(result, 4) == np.array([
-            [1.0000, 0.2500, 0.0000, 0.0000, 0.0000],
+            [0.0000, 0.2500, 0.0000, 0.0000, 0.0000],
             [0.2500, 0.5000, 0.7500, 0.5000, 0.2500],
             [0.2500, 0.7500, 1.0000, 0.7500, 0.5000],
             [0.5000, 1.0000, 0.7500, 0.5000, 0.5000],
@@ -493,7 +581,7 @@ class TestFilterLinearToPolar:
                 [0.5000, 0.7500, 1.0000, 0.7500, 1.0000],
             ],
             [
-                [1.0000, 0.7500, 1.0000, 1.0000, 1.0000],
+                [0.0000, 0.7500, 1.0000, 1.0000, 1.0000],
                 [0.7500, 1.0000, 0.7500, 0.5000, 0.7500],
                 [0.7500, 0.7500, 0.5000, 0.2500, 0.5000],
                 [0.5000, 1.0000, 0.7500, 1.0000, 0.5000],
@@ -501,6 +589,28 @@ class TestFilterLinearToPolar:
             ],
         ], dtype=float)).all()
 
+    def test_filter_outliers(self, a):
+        """Given image data, :func:`filter_linear_to_polar` should fill
+        pixels that map from outside the image with zero, and the result
+        should be the same every time.
+        """
+        a = np.ones_like(a)
+        result = f.filter_linear_to_polar(a)
+        assert result[0, 0] == 0.0
+        assert (result == f.filter_linear_to_polar(a)).all()
+
+    def test_filter_rectangle(self, image_3_5):
+        """Given image data with unequal X and Y axes,
+        :func:`filter_linear_to_polar` should transform the image
+        as if it were centered in a black square.
+        """
+        result = f.filter_linear_to_polar(image_3_5)
+        assert (np.around(result, 4) == np.array([
+            [0.5000, 0.7500, 1.0000, 0.0000, 0.0000],
+            [0.5000, 1.0000, 0.7500, 0.0000, 0.0000],
+            [0.7500, 0.7500, 0.5000, 0.2500, 0.0000],
+        ], dtype=float)).all()
+
 
 class TestFilterMotionBlur:
     def test_filter(self, a):
@@ -559,10 +669,69 @@ class TestFilterMotionBlur:
         """If given an invalid axis, :func:`filter_motion_blur` should
         raise a :class:`ValueError` exception.
         """
-        with pt.raises(
-            ValueError, match='motion_blur can only affect the X or Y axis.'
-        ):
-            _ = f.filter_motion_blur(a, amount=2, axis=f.Z)
+        msg = 'motion_blur can only affect the X, Y, or Z axis.'
+        with pt.raises(ValueError, match=msg):
+            _ = f.filter_motion_blur(a, amount=2, axis=0)
+
+    def test_filter_z_axis_two_dimensions(self, image_3_5):
+        """If given the Z axis and two-dimensional image data,
+        :func:`filter_motion_blur` should raise a :class:`ValueError`
+        exception that says the data has no Z axis to blur.
+        """
+        msg = 'only affect the Z axis of image data with more than two'
+        with pt.raises(ValueError, match=msg):
+            _ = f.filter_motion_blur(image_3_5, amount=2, axis=f.Z)
+
+    def test_filter_z_axis(self, video_2_5_5):
+        """Given video data, an amount, and the Z axis,
+        :func:`motion_blur` should average each frame with the
+        frames around it.
+        """
+        a = np.stack([video_2_5_5[0], video_2_5_5[1], video_2_5_5[0]])
+        result = f.filter_motion_blur(a, amount=3, axis=f.Z)
+        assert np.allclose(result[0], (a[0] + 2 * a[1]) / 3)
+        assert np.allclose(result[1], (2 * a[0] + a[1]) / 3)
+        assert np.allclose(result[2], (a[0] + 2 * a[1]) / 3)
+
+
+class TestFilterBlur3d:
+    def test_filter_box_blur(self, video_2_5_5):
+        """Given video data and a size, :func:`filter_box_blur_3d`
+        should blur each frame and then blur across the frames.
+        """
+        result = f.filter_box_blur_3d(video_2_5_5, size=2)
+        blurred = f.filter_box_blur(video_2_5_5, size=2)
+        expected = (blurred[0] + blurred[1]) / 2
+        assert np.allclose(result, expected)
+
+    def test_filter_box_blur_image(self, a):
+        """Given image data, :func:`filter_box_blur_3d` should do
+        the same as :func:`filter_box_blur`.
+        """
+        result = f.filter_box_blur_3d(a, size=2)
+        assert (result == f.filter_box_blur(a, size=2)).all()
+
+    def test_filter_gaussian_blur(self, video_2_5_5):
+        """Given video data and sigmas, :func:`filter_gaussian_blur_3d`
+        should blur with a three-dimensional gaussian.
+        """
+        a = np.tile(video_2_5_5, (4, 1, 1))
+        result = f.filter_gaussian_blur_3d(a, sigma=1, sigma_z=1.5)
+        blurred = f.filter_gaussian_blur(a, sigma=1)
+        flat = blurred.reshape(len(a), -1)
+        expected = cv2.GaussianBlur(flat, (0, 0), 0.0001, sigmaY=1.5)
+        assert np.allclose(result, expected.reshape(a.shape))
+
+    def test_filter_gaussian_blur_z_only(self, video_2_5_5):
+        """Given a sigma of zero, :func:`filter_gaussian_blur_3d`
+        should only blur across the frames.
+        """
+        result = f.filter_gaussian_blur_3d(video_2_5_5, sigma=0, sigma_z=1)
+        # With two frames, the even offsets from the middle of the
+        # kernel reflect to the same frame.
+        w = cv2.getGaussianKernel(9, 1, cv2.CV_64F)[::2, 0].sum()
+        expected = w * video_2_5_5[0] + (1 - w) * video_2_5_5[1]
+        assert np.allclose(result[0], expected)
 
 
 class TestFilterPinch:
@@ -653,6 +822,18 @@ class TestFilterPolarToLinear:
             ],
         ], dtype=float)).all()
 
+    def test_filter_rectangle(self, image_3_5):
+        """Given image data with unequal X and Y axes,
+        :func:`filter_polar_to_linear` should transform the image
+        as if it were centered in a black square.
+        """
+        result = f.filter_polar_to_linear(image_3_5)
+        assert (np.around(result, 4) == np.array([
+            [0.7500, 0.7500, 0.0000, 0.0000, 0.0000],
+            [0.7500, 1.0000, 0.7500, 0.0000, 0.0000],
+            [0.7500, 0.7500, 0.5000, 0.2500, 0.0000],
+        ], dtype=float)).all()
+
 
 class TestFilterRipple:
     def test_filter(self, a):
@@ -736,6 +917,46 @@ class TestFilterRotate90:
         ], dtype=float)).all()
 
 
+class TestFilterShrink:
+    def test_filter(self, a):
+        """Given image data and a factor, :func:`filter_shrink` should
+        shrink the image, averaging the pixels that are merged.
+        """
+        a = np.tile(a, (2, 2))
+        result = f.filter_shrink(a, factor=0.5)
+        assert (np.around(result, 4) == np.array([
+            [0.2500, 0.7500, 0.5000, 0.5000, 0.8750],
+            [0.7500, 0.7500, 0.5000, 0.8750, 0.5000],
+            [0.5000, 0.5000, 0.5000, 0.5000, 0.5000],
+            [0.5000, 0.8750, 0.5000, 0.7500, 0.7500],
+            [0.8750, 0.5000, 0.5000, 0.7500, 0.2500],
+        ], dtype=float)).all()
+
+    @pt.mark.parametrize('shape', [(2, 40, 30), (2, 40, 30, 3)])
+    def test_filter_video(self, shape):
+        """Given video data, which may have color channels, and a
+        factor, :func:`filter_shrink` should shrink each frame and
+        keep the number of frames and channels.
+        """
+        rng = np.random.default_rng(1138)
+        a = rng.random(shape)
+        result = f.filter_shrink(a, factor=0.3)
+        assert result.shape == (2, 12, 9, *shape[3:])
+        means = result.mean(axis=(1, 2))
+        assert np.allclose(means, a.mean(axis=(1, 2)), atol=0.02)
+        frame = a[1].reshape((40, 30, -1))[..., 0]
+        expected = f.filter_shrink(frame, factor=0.3)
+        assert np.allclose(result[1].reshape((12, 9, -1))[..., 0], expected)
+
+    def test_filter_invalid_factor(self, a):
+        """If given a factor greater than one, :func:`filter_shrink`
+        should raise a :class:`ValueError` exception.
+        """
+        msg = 'factor must be greater than 0 and at most 1.'
+        with pt.raises(ValueError, match=msg):
+            _ = f.filter_shrink(a, factor=2)
+
+
 class TestFilterSkew:
     def test_filter(self, a):
         """Given image data and a slope, :func:`filter_skew` should
@@ -837,3 +1058,232 @@ class TestFilterSkew:
                 [0.0001, 0.2500, 0.4999, 0.7495, 0.9985],
             ],
         ], dtype=float)).all()
+
+
+class TestBatch:
+    @pt.mark.parametrize('name,kwargs', [
+        ('box_blur', {'size': 3}),
+        ('gaussian_blur', {'sigma': 2}),
+        ('linear_to_polar', {}),
+        ('motion_blur', {'amount': 3, 'axis': f.X}),
+        ('pinch', {'amount': 0.5, 'radius': 4, 'scale': (1, 1)}),
+        ('polar_to_linear', {}),
+        ('ripple', {
+            'wave': (0, 4, 4), 'amp': (0, 2, 2), 'distaxis': (0, f.X, f.Y)
+        }),
+        ('skew', {'slope': 0.5}),
+    ])
+    @pt.mark.parametrize('batch', [True, 4])
+    def test_filter_batch(self, name, kwargs, batch):
+        """Given three-dimensional image data and a batch, filters
+        that can handle channels should process the frames as
+        channels and return the same result as processing them
+        one frame at a time.
+        """
+        fn = getattr(f, f'filter_{name}')
+        a = np.random.default_rng(0).random((10, 6, 8))
+        expected = fn(a, **kwargs)
+        result = fn(a, batch=batch, **kwargs)
+        assert result.shape == expected.shape
+        assert (result == expected).all()
+
+    @pt.mark.parametrize('name,kwargs', [
+        ('pinch', {'amount': 0.5, 'radius': 4, 'scale': (1, 1)}),
+        ('ripple', {
+            'wave': (0, 4, 4), 'amp': (0, 2, 2), 'distaxis': (0, f.X, f.Y)
+        }),
+        ('skew', {'slope': 0.5}),
+    ])
+    @pt.mark.parametrize('quality', ['nearest', 'linear', 'cubic', 'lanczos'])
+    @pt.mark.parametrize('batch', [True, 6])
+    def test_filter_batch_quality(self, name, kwargs, quality, batch):
+        """Given a batch larger than the number of channels OpenCV can
+        interpolate with the quality, filters that resample should
+        process smaller groups and return the same result as
+        processing them one frame at a time, whether the quality is
+        passed or comes from the settings.
+        """
+        fn = getattr(f, f'filter_{name}')
+        a = np.random.default_rng(0).random((10, 6, 8))
+        expected = fn(a, quality=quality, **kwargs)
+        result = fn(a, batch=batch, quality=quality, **kwargs)
+        assert (result == expected).all()
+        with settings.override(quality=quality):
+            assert (fn(a, batch=batch, **kwargs) == expected).all()
+
+    def test_filter_batch_out(self, video_2_5_5):
+        """Given a batch and an output array, filters that can handle
+        channels should write the result into the output.
+        """
+        expected = f.filter_skew(video_2_5_5, slope=0.5)
+        out = np.zeros_like(video_2_5_5)
+        result = f.filter_skew(video_2_5_5, slope=0.5, batch=1, out=out)
+        assert result is out
+        assert (out == expected).all()
+
+
+class TestQuality:
+    @pt.mark.parametrize('name,kwargs', [
+        ('grow', {'factor': 2}),
+        ('pinch', {'amount': 0.5, 'radius': 4, 'scale': (1, 1)}),
+        ('ripple', {'wave': (3, 3), 'amp': (1, 1), 'distaxis': (f.X, f.Y)}),
+        ('skew', {'slope': 0.5}),
+        ('twirl', {'radius': 4, 'strength': 1}),
+    ])
+    @pt.mark.parametrize('quality', ['nearest', 'linear', 'cubic', 'lanczos'])
+    def test_filter_quality(self, name, kwargs, quality, video_2_5_5):
+        """Given a quality, resampling filters should use it in place
+        of the `quality` setting, and the default quality should be
+        linear.
+        """
+        fn = getattr(f, f'filter_{name}')
+        result = fn(video_2_5_5, quality=quality, **kwargs)
+        with settings.override(quality=quality):
+            assert (fn(video_2_5_5, **kwargs) == result).all()
+        with settings.override(quality='nearest'):
+            linear = fn(video_2_5_5, quality='linear', **kwargs)
+        assert (linear == fn(video_2_5_5, **kwargs)).all()
+        assert (result == linear).all() == (quality == 'linear')
+
+    def test_filter_grow_nearest(self):
+        """Given nearest quality and a whole number factor,
+        :func:`filter_grow` should repeat each pixel.
+        """
+        a = np.array([[0.0, 1.0], [0.5, 0.25]])
+        result = f.filter_grow(a, 2, quality='nearest')
+        assert (result == a.repeat(2, 0).repeat(2, 1)).all()
+
+    def test_filter_invalid_quality(self, image_1_3_3):
+        """Given an unknown quality, filters should raise a
+        ValueError.
+        """
+        with pt.raises(ValueError):
+            f.filter_skew(image_1_3_3, 0.5, quality='best')
+
+
+class TestMemmap:
+    @pt.mark.parametrize('name,kwargs', [
+        ('box_blur', {'size': 3}),
+        ('box_blur_3d', {'size': 3}),
+        ('colorize', {'colorkey': 's'}),
+        ('contrast', {}),
+        ('flip', {'axis': f.Z}),
+        ('gaussian_blur', {'sigma': 2}),
+        ('gaussian_blur_3d', {'sigma': 2}),
+        ('glow', {'sigma': 4}),
+        ('grow', {'factor': 1.25}),
+        ('grow', {'factor': 1.25, 'quality': 'cubic'}),
+        ('grow', {'factor': 2}),
+        ('grow', {'factor': 2, 'quality': 'nearest'}),
+        ('inverse', {}),
+        ('linear_to_polar', {}),
+        ('motion_blur', {'amount': 3, 'axis': f.X}),
+        ('motion_blur', {'amount': 3, 'axis': f.Z}),
+        ('pinch', {'amount': 0.5, 'radius': 40, 'scale': (0, 1, 1)}),
+        ('polar_to_linear', {}),
+        ('ripple', {
+            'wave': (0, 8, 8), 'amp': (0, 2, 2), 'distaxis': (0, f.X, f.Y)
+        }),
+        ('rotate_90', {}),
+        ('shrink', {'factor': 0.3}),
+        ('skew', {'slope': 0.5}),
+        ('twirl', {'radius': 40, 'strength': 0.5}),
+    ])
+    def test_filter_out(self, name, kwargs, tmp_path, video_memmap):
+        """Given memory mapped image data larger than the memory cap
+        and a memory mapped output, filters should write the result
+        into the output one frame at a time without exceeding the cap.
+        """
+        fn = getattr(f, f'filter_{name}')
+        expected = fn(np.asarray(video_memmap), **kwargs)
+        assert video_memmap.nbytes > MEMORY_CAP
+        out = open_memmap(
+            tmp_path / 'out.npy', 'w+', expected.dtype, expected.shape
+        )
+
+        tracemalloc.start()
+        try:
+            result = fn(video_memmap, out=out, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert result is out
+        assert peak < MEMORY_CAP
+        assert np.allclose(result, expected)
+
+
+class TestThreadSafety:
+    # Each filter is run with more than one set of parameters, so the
+    # threads build kernels, maps, and tables at the same time.
+    cases = [
+        ('box_blur', {'size': 3}),
+        ('box_blur', {'size': 5}),
+        ('box_blur_3d', {'size': 3}),
+        ('colorize', {'colorkey': 's'}),
+        ('colorize', {'colorkey': 'r'}),
+        ('contrast', {}),
+        ('flip', {'axis': f.Z}),
+        ('gaussian_blur', {'sigma': 2}),
+        ('gaussian_blur', {'sigma': 20}),
+        ('gaussian_blur_3d', {'sigma': 2}),
+        ('glow', {'sigma': 4}),
+        ('grow', {'factor': 1.25}),
+        ('grow', {'factor': 2, 'quality': 'nearest'}),
+        ('inverse', {}),
+        ('linear_to_polar', {}),
+        ('motion_blur', {'amount': 3, 'axis': f.X}),
+        ('motion_blur', {'amount': 5, 'axis': f.Y}),
+        ('motion_blur', {'amount': 3, 'axis': f.Z}),
+        ('pinch', {'amount': 0.5, 'radius': 40, 'scale': (0, 1, 1)}),
+        ('pinch', {'amount': 0.25, 'radius': 20, 'scale': (0, 1, 1)}),
+        ('polar_to_linear', {}),
+        ('ripple', {
+            'wave': (0, 8, 8), 'amp': (0, 2, 2), 'distaxis': (0, f.X, f.Y)
+        }),
+        ('rotate_90', {}),
+        ('shrink', {'factor': 0.3}),
+        ('skew', {'slope': 0.5}),
+        ('skew', {'slope': -0.25}),
+        ('twirl', {'radius': 40, 'strength': 0.5}),
+        ('twirl', {'radius': 20, 'strength': 1.5}),
+    ]
+
+    def test_cases(self):
+        """Every filter should be run by the thread safety tests."""
+        assert {name for name, _ in self.cases} == set(filters)
+
+    def test_filters_concurrent(self):
+        """Given many threads running every filter at once on image
+        data of several shapes, the filters should give the same
+        results as running them one at a time.
+        """
+        rng = np.random.default_rng(1138)
+        images = [rng.random((3, 24, 32)), rng.random((2, 33, 17))]
+        tasks = [
+            (i, j) for i in range(len(self.cases))
+            for j in range(len(images))
+        ]
+        expected = {
+            (i, j): self.run(i, images[j]) for i, j in tasks
+        }
+
+        # Start with empty caches, so the threads race to fill them.
+        for module in f, maps, utility:
+            for value in vars(module).values():
+                if hasattr(value, 'cache_clear'):
+                    value.cache_clear()
+        work = tasks * 8
+        random.Random(0).shuffle(work)
+        with ThreadPoolExecutor(16) as executor:
+            results = executor.map(
+                lambda task: (task, self.run(task[0], images[task[1]])),
+                work
+            )
+            for task, result in results:
+                assert (result == expected[task]).all(), task
+
+    def run(self, i, a):
+        """Run one of the cases."""
+        name, kwargs = self.cases[i]
+        return filters[name](a, **kwargs)
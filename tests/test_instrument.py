@@ -0,0 +1,107 @@
+"""
+test_instrument
+~~~~~~~~~~~~~~~
+
+Unit tests for the imgfilt.instrument module.
+"""
+import json
+
+import numpy as np
+import pytest as pt
+
+from imgfilt import imgfilt as f
+from imgfilt import instrument as i
+from imgfilt.utility import will_square
+
+
+# Fixtures.
+@pt.fixture
+def video_2_3_3():
+    """An array of video data for testing."""
+    yield np.array([
+        [
+            [1.0, 0.5, 0.0, ],
+            [0.5, 0.0, 0.5, ],
+            [0.0, 0.5, 1.0, ],
+        ],
+        [
+            [0.0, 0.5, 1.0, ],
+            [0.5, 1.0, 0.5, ],
+            [1.0, 0.5, 0.0, ],
+        ],
+    ], dtype=float)
+
+
+# Test cases.
+class TestRecord:
+    def test_record_decorators(self, video_2_3_3):
+        """Within :func:`record`, filter calls and the work done by
+        their decorators should be recorded.
+        """
+        with i.record() as recorder:
+            f.filter_colorize(video_2_3_3, colorkey='s')
+        assert [(r.name, r.step) for r in recorder.records] == [
+            ('uses_uint8', 'to uint8'),
+            ('uses_uint8', 'from uint8'),
+            ('uses_uint8', 'to uint8'),
+            ('uses_uint8', 'from uint8'),
+            ('processes_by_grayscale_frame', 'stack frames'),
+            ('colorize', ''),
+        ]
+        to_uint8 = recorder.records[0]
+        assert to_uint8.dtype_in == 'float64'
+        assert to_uint8.dtype_out == 'uint8'
+        assert to_uint8.nbytes == 9
+        colorize = recorder.records[-1]
+        assert colorize.frames == 2
+        assert colorize.nbytes == 2 * 3 * 3 * 3 * 8
+
+    def test_record_padding(self):
+        """Within :func:`record`, the padding done to square an image
+        should be recorded.
+        """
+        @will_square
+        def spam(a):
+            return a
+
+        with i.record() as recorder:
+            spam(np.zeros((3, 5)))
+        assert ('will_square', 'pad') in [
+            (r.name, r.step) for r in recorder.records
+        ]
+
+    def test_not_recording(self, video_2_3_3):
+        """Outside of :func:`record`, nothing should be recorded."""
+        with i.record() as recorder:
+            pass
+        f.filter_box_blur(video_2_3_3, size=2)
+        assert recorder.records == []
+
+    def test_chrome_trace(self, tmp_path, video_2_3_3):
+        """:meth:`Recorder.dump_chrome_trace` should save the records
+        as complete events in the Chrome trace format.
+        """
+        path = tmp_path / 'trace.json'
+        with i.record() as recorder:
+            f.filter_inverse(video_2_3_3)
+        recorder.dump_chrome_trace(path)
+        with open(path) as fh:
+            trace = json.load(fh)
+        event, = trace['traceEvents']
+        assert event['name'] == 'inverse'
+        assert event['cat'] == 'filter'
+        assert event['ph'] == 'X'
+        assert event['args']['frames'] == 2
+
+    def test_summary(self, video_2_3_3):
+        """:meth:`Recorder.summary` should total the time spent in
+        each filter.
+        """
+        with i.record() as recorder:
+            f.filter_inverse(video_2_3_3)
+            f.filter_inverse(video_2_3_3)
+        summary = recorder.summary()
+        assert list(summary) == ['inverse']
+        assert summary['inverse'] == sum(
+            r.duration for r in recorder.records
+        )
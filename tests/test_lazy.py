@@ -0,0 +1,96 @@
+"""
+test_lazy
+~~~~~~~~~
+
+Unit tests for the imgfilt.lazy module.
+"""
+import numpy as np
+import pytest as pt
+
+import imgfilt as f
+from imgfilt import lazy as lz
+from imgfilt import settings
+from imgfilt.utility import has_halo
+
+
+# Fixtures.
+@pt.fixture
+def video():
+    """Random video data for testing."""
+    yield np.random.default_rng(1138).random((3, 40, 50))
+
+
+# Test cases.
+class TestNode:
+    @pt.mark.parametrize('name,kwargs', [
+        ('box_blur', {'size': 5}),
+        ('colorize', {'white': '#FF0000', 'black': '#0000FF'}),
+        ('gaussian_blur_3d', {'sigma': 1.5}),
+        ('glow', {'sigma': 3}),
+        ('motion_blur', {'amount': 3, 'axis': f.Z}),
+        ('pinch', {'amount': 0.5, 'radius': 20, 'scale': (1, 1)}),
+        ('polar_to_linear', {}),
+        ('ripple', {
+            'wave': (0, 8, 8), 'amp': (0, 2, 2), 'distaxis': (0, f.X, f.Y)
+        }),
+        ('twirl', {'radius': 20, 'strength': 1}),
+    ])
+    @pt.mark.parametrize('key', [
+        (slice(None), slice(20, None)),
+        (1, slice(5, 15), slice(30, 45)),
+        (slice(0, 3, 2), slice(None, None, 3), slice(2, -2)),
+        (Ellipsis, slice(39, 40)),
+    ])
+    def test_crop(self, name, kwargs, key, video):
+        """Given a filter and a slice, the computed node should be the
+        same as slicing the result of the filter.
+        """
+        node = lz.lazy(video).filter(name, **kwargs)[key]
+        expected = f.filters[name](video, **kwargs)[key]
+        assert node.shape == expected.shape
+        assert (node.compute() == expected).all()
+
+    def test_crop_nearest(self, video):
+        """Given a remapping filter using fixed point maps, the
+        computed node should be the same as slicing the result of
+        the filter.
+        """
+        kwargs = {'amount': 0.5, 'radius': 20, 'scale': (1, 1)}
+        with settings.override(quality='nearest'):
+            node = lz.lazy(video).filter('pinch', **kwargs)
+            result = node[:, 10:20, 10:20].compute()
+            expected = f.filter_pinch(video, **kwargs)[:, 10:20, 10:20]
+        assert (result == expected).all()
+
+    def test_only_region(self, video):
+        """When computed, a sliced node should only filter the sliced
+        frames and the region plus the filter's halo.
+        """
+        shapes = []
+
+        @has_halo(lambda **_: 2)
+        def spy(a):
+            shapes.append(a.shape)
+            return a
+
+        spy.by_frame = True
+        node = lz.lazy(video).filter(spy)
+        _ = node[1, 10:20, 45:].compute()
+        assert shapes == [(1, 14, 7)]
+
+    def test_slice_error(self, video):
+        """Given an index that isn't an integer or a slice, the node
+        should raise an :class:`IndexError`.
+        """
+        with pt.raises(IndexError):
+            lz.lazy(video)[[0, 1]].compute()
+
+    def test_abstract(self):
+        """Given a subclass that doesn't define :meth:`Node.region`,
+        creating the node should raise a :class:`TypeError`.
+        """
+        class Incomplete(lz.Node):
+            shape = (1, 2, 3)
+
+        with pt.raises(TypeError):
+            Incomplete()
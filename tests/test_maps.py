@@ -0,0 +1,139 @@
+"""
+test_maps
+~~~~~~~~~
+
+Unit tests for the imgfilt.maps module.
+"""
+import numpy as np
+import pytest as pt
+
+from imgfilt import maps as m
+from imgfilt import settings
+
+
+# Test cases.
+@pt.mark.parametrize('builder', [
+    m.linear_to_polar_maps,
+    m.polar_to_linear_maps,
+])
+class TestPolarMaps:
+    def test_cached(self, builder):
+        """Given the same shape twice, the map builders should return
+        the same maps rather than building them again.
+        """
+        assert builder((3, 5)) is builder((3, 5))
+
+    def test_read_only(self, builder):
+        """Cached maps are shared, so they should be read only."""
+        map_x, map_y = builder((3, 5))
+        assert map_x.shape == map_y.shape == (3, 5)
+        assert map_x.dtype == map_y.dtype == np.float32
+        assert not map_x.flags.writeable
+        assert not map_y.flags.writeable
+
+
+class TestRippleMaps:
+    @pt.mark.parametrize('distaxis', [(0, -1, -2), (0, -2, -1), (0, 0)])
+    def test_matches_full_volume(self, distaxis):
+        """Given ripple parameters, :func:`ripple_maps` should return
+        the same maps as calculating the ripple for every pixel.
+        """
+        shape = (6, 9)
+        wave, amp, offset = (0, 4, 5), (0, 2, 3), (0, 1, 2.5)
+        map_x, map_y = m.ripple_maps(shape, wave, amp, distaxis, offset)
+
+        flex = np.indices(shape, np.float32)
+        *_, da_x, da_y = distaxis
+        cos_x = np.cos((offset[-1] + flex[da_x]) / wave[-1] * 2 * np.pi)
+        cos_y = np.cos((offset[-2] + flex[da_y]) / wave[-2] * 2 * np.pi)
+        assert (map_x == flex[-1] + cos_x * amp[-1]).all()
+        assert (map_y == flex[-2] + cos_y * amp[-2]).all()
+        assert map_x.dtype == map_y.dtype == np.float32
+
+    def test_cached(self):
+        """Given the same parameters twice, even in different types
+        of sequence, :func:`ripple_maps` should return the same maps.
+        """
+        a = m.ripple_maps((6, 9), [0, 4, 5], [0, 2, 3], [0, -1, -2], [0, 0, 0])
+        b = m.ripple_maps((6, 9), (0, 4, 5), (0, 2, 3), (0, -1, -2), (0, 0, 0))
+        assert a is b
+        assert not a[0].flags.writeable
+
+    def test_no_wave(self):
+        """Given a wave of zero, :func:`ripple_maps` should not move
+        the pixels along that axis.
+        """
+        map_x, map_y = m.ripple_maps((2, 3), (0, 0), (2, 2), (-1, -2), (0, 0))
+        assert (map_x == [[0, 1, 2], [0, 1, 2]]).all()
+        assert (map_y == [[0, 0, 0], [1, 1, 1]]).all()
+
+
+@pt.mark.parametrize('builder,args', [
+    (m.pinch_maps, (0.2, 40, (1, 1), (32, 48))),
+    (m.twirl_maps, (1.0, 40, (32, 48))),
+])
+class TestDistortionMaps:
+    def test_coarse(self, builder, args):
+        """Given a resolution below one, the map builders should
+        upsample maps calculated on a coarse grid to the size of
+        the image, staying close to the exact maps.
+        """
+        exact = builder((64, 96), *args, resolution=1)
+        coarse = builder((64, 96), *args, resolution=0.25)
+        for c, e in zip(coarse, exact):
+            assert c.shape == e.shape
+            assert c.dtype == e.dtype
+            assert not c.flags.writeable
+        error = m.map_error(builder, (64, 96), *args, resolution=0.25)
+        assert 0 < error < 1
+
+    def test_setting(self, builder, args):
+        """Given no resolution, the map builders should use the
+        `map_resolution` setting.
+        """
+        with settings.override(map_resolution=0.25):
+            result = builder((64, 96), *args)
+        assert result is builder((64, 96), *args, resolution=0.25)
+        assert result is not builder((64, 96), *args)
+
+
+def test_map_error_linear():
+    """Given maps that change linearly, :func:`map_error` should
+    find the coarse maps are exact, including at the edges.
+    """
+    args = (0.0, 1e6, (1, 1), (3, 5))
+    assert m.map_error(m.pinch_maps, (7, 10), *args, resolution=0.25) == 0
+
+
+def test_fixed_point():
+    """Given float maps, :func:`fixed_point` should convert them to
+    maps that give the same result for nearest neighbor sampling.
+    """
+    import cv2
+
+    a = np.random.default_rng(0).random((64, 96))
+    maps = m.pinch_maps((64, 96), 0.5, 40, (1, 1), (32, 48))
+    fixed = m.pinch_maps((64, 96), 0.5, 40, (1, 1), (32, 48), fixed=True)
+    assert fixed[0].dtype == np.int16
+    assert fixed[1] is None
+    expected = cv2.remap(a, *maps, cv2.INTER_NEAREST)
+    assert (cv2.remap(a, *fixed, cv2.INTER_NEAREST) == expected).all()
+
+
+@pt.mark.parametrize('fixed', [False, True])
+def test_crop_maps(fixed):
+    """Given maps, a region, and a constant border, :func:`crop_maps`
+    should find the part of the image the region reads and maps that
+    give the same result for the region from that part.
+    """
+    import cv2
+
+    a = np.random.default_rng(0).random((64, 96))
+    maps = m.pinch_maps((64, 96), 0.5, 40, (1, 1), (32, 48), fixed=fixed)
+    flags = cv2.INTER_NEAREST, cv2.BORDER_CONSTANT
+    map_x, map_y, part = m.crop_maps(*maps, (10, 20, 30, 40), flags[1])
+    top, left, bottom, right = part
+    assert 0 < top and 0 < left and bottom < 64 and right < 96
+    result = cv2.remap(a[top:bottom, left:right], map_x, map_y, *flags)
+    expected = cv2.remap(a, *maps, *flags)[10:30, 20:40]
+    assert (result == expected).all()
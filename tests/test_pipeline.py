@@ -0,0 +1,361 @@
+"""
+test_pipeline
+~~~~~~~~~~~~~
+
+Unit tests for the imgfilt.pipeline module.
+"""
+import json
+import pickle
+
+import numpy as np
+import pytest as pt
+
+from imgfilt import imgfilt as f
+from imgfilt import pipeline as p
+
+
+# Fixtures.
+@pt.fixture
+def a():
+    """An array for testing."""
+    yield np.array([
+        [0.00, 0.25, 0.50, 0.75, 1.00,],
+        [0.25, 0.50, 0.75, 1.00, 0.75,],
+        [0.50, 0.75, 1.00, 0.75, 0.50,],
+        [0.75, 1.00, 0.75, 0.50, 0.25,],
+        [1.00, 0.75, 0.50, 0.25, 0.00,],
+    ], dtype=float)
+
+
+@pt.fixture
+def spec():
+    """A pipeline definition for testing."""
+    yield [
+        {'filter': 'box_blur', 'size': 2},
+        {'filter': 'inverse'},
+    ]
+
+
+# Test cases.
+class TestPipeline:
+    def test_call(self, a, spec):
+        """When called with image data, a :class:`Pipeline` should
+        apply each of its filters in order.
+        """
+        pipeline = p.Pipeline.from_spec(spec)
+        result = pipeline(a)
+        assert (result == f.filter_inverse(f.filter_box_blur(a, 2))).all()
+
+    def test_from_spec_mapping(self, spec):
+        """Given a mapping with a filters key,
+        :meth:`Pipeline.from_spec` should build the pipeline
+        from the filters key.
+        """
+        pipeline = p.Pipeline.from_spec({'filters': spec})
+        assert pipeline == p.Pipeline([
+            p.Step('box_blur', size=2),
+            p.Step('inverse'),
+        ])
+
+    def test_from_spec_unknown_filter(self):
+        """Given a filter name that doesn't exist,
+        :meth:`Pipeline.from_spec` should raise a ValueError.
+        """
+        with pt.raises(ValueError, match='Unknown filter'):
+            p.Pipeline.from_spec([{'filter': 'spam'}])
+
+    def test_load_json(self, spec, tmp_path):
+        """Given the path to a JSON file, :meth:`Pipeline.load`
+        should build the pipeline defined in the file.
+        """
+        path = tmp_path / 'pipeline.json'
+        path.write_text(json.dumps(spec))
+        pipeline = p.Pipeline.load(path)
+        assert pipeline.to_spec() == spec
+
+    def test_pickle(self, spec):
+        """A :class:`Pipeline` can be pickled to send it to
+        another process.
+        """
+        pipeline = p.Pipeline.from_spec(spec)
+        assert pickle.loads(pickle.dumps(pipeline)) == pipeline
+
+    def test_call_region(self, a):
+        """Given steps with regions, a :class:`Pipeline` should only
+        filter the regions and leave the given data unchanged.
+        """
+        original = a.copy()
+        pipeline = p.Pipeline.from_spec([
+            {'filter': 'inverse', 'roi': [0, 0, 2, 5]},
+            {'filter': 'inverse', 'roi': [1, 0, 5, 5]},
+        ])
+        result = pipeline(a)
+        assert (a == original).all()
+        assert (result[0] == 1 - a[0]).all()
+        assert (result[1] == a[1]).all()
+        assert (result[2:] == 1 - a[2:]).all()
+
+
+class TestApplyToRegion:
+    @pt.mark.parametrize('name,kwargs', [
+        ('box_blur', {'size': 5}),
+        ('gaussian_blur', {'sigma': 1.5}),
+        ('glow', {'sigma': 3}),
+        ('motion_blur', {'amount': 4, 'axis': f.Y}),
+    ])
+    def test_roi(self, name, kwargs):
+        """Given a filter and a region, :func:`apply_to_region`
+        should give the same result as the filter within the region
+        and leave the rest of the image data unchanged.
+        """
+        a = np.random.default_rng(0).random((2, 32, 32))
+        fn = p.get_filter(name)
+        result = p.apply_to_region(fn, a, (10, 4, 20, 12), **kwargs)
+        expected = fn(a, **kwargs)
+        assert np.allclose(result[:, 10:20, 4:12], expected[:, 10:20, 4:12])
+        outside = np.ones(a.shape, dtype=bool)
+        outside[:, 10:20, 4:12] = False
+        assert (result[outside] == a[outside]).all()
+
+    def test_mask(self, a):
+        """Given a mask, :func:`apply_to_region` should filter where
+        the mask is set and blend where it is between zero and one.
+        """
+        mask = np.zeros(a.shape)
+        mask[1, 1:3] = 1.0
+        mask[2, 1] = 0.5
+        result = p.apply_to_region(f.filter_inverse, a, mask=mask)
+        expected = a.copy()
+        expected[1, 1:3] = 1 - a[1, 1:3]
+        expected[2, 1] = 0.5
+        assert (result == expected).all()
+
+    def test_mask_bool(self, a):
+        """Given a boolean mask, :func:`apply_to_region` should use
+        the filtered data only where the mask is `True`.
+        """
+        mask = a > 0.7
+        result = p.apply_to_region(f.filter_inverse, a, mask=mask)
+        assert (result == np.where(mask, 1 - a, a)).all()
+
+    def test_inplace(self, a):
+        """Given inplace, :func:`apply_to_region` should write into
+        the given data.
+        """
+        result = p.apply_to_region(
+            f.filter_inverse, a, (0, 0, 1, 1), inplace=True
+        )
+        assert result is a
+        assert a[0, 0] == 1.0
+
+    @pt.mark.parametrize('name,kwargs', [
+        ('pinch', {'amount': 0.5, 'radius': 12, 'scale': (0, 1, 1)}),
+        ('ripple', {
+            'wave': (1, 8, 8), 'amp': (0, 3, 3), 'distaxis': (0, 1, 2)
+        }),
+        ('linear_to_polar', {}),
+    ])
+    def test_remap(self, name, kwargs):
+        """Given a filter that remaps the image, :func:`apply_to_region`
+        should give the same result as the filter within the region
+        and leave the rest of the image data unchanged.
+        """
+        a = np.random.default_rng(0).random((2, 32, 32))
+        fn = p.get_filter(name)
+        result = p.apply_to_region(fn, a, (10, 4, 20, 12), **kwargs)
+        expected = fn(a, **kwargs)
+        assert np.allclose(result[:, 10:20, 4:12], expected[:, 10:20, 4:12])
+        outside = np.ones(a.shape, dtype=bool)
+        outside[:, 10:20, 4:12] = False
+        assert (result[outside] == a[outside]).all()
+
+    def test_remap_mask(self):
+        """Given a filter that remaps the image and a mask,
+        :func:`apply_to_region` should use the filtered data where
+        the mask is set.
+        """
+        a = np.random.default_rng(0).random((2, 32, 32))
+        kwargs = {'amount': 0.5, 'radius': 12, 'scale': (0, 1, 1)}
+        mask = np.zeros(a.shape[1:], dtype=bool)
+        mask[5:9, 20:30] = True
+        result = p.apply_to_region(f.filter_pinch, a, mask=mask, **kwargs)
+        expected = f.filter_pinch(a, **kwargs)
+        assert np.allclose(result, np.where(mask, expected, a))
+
+    @pt.mark.parametrize('name,kwargs', [
+        ('skew', {'slope': 0.5}),
+        ('twirl', {'radius': 12, 'strength': 2}),
+    ])
+    def test_no_halo(self, name, kwargs):
+        """Given a filter that doesn't declare a halo,
+        :func:`apply_to_region` should filter all of the image data
+        and keep the region.
+        """
+        a = np.random.default_rng(0).random((2, 32, 32))
+        fn = p.get_filter(name)
+        result = p.apply_to_region(fn, a, (10, 4, 20, 12), **kwargs)
+        expected = a.copy()
+        expected[:, 10:20, 4:12] = fn(a, **kwargs)[:, 10:20, 4:12]
+        assert np.allclose(result, expected)
+
+    def test_adds_channels(self, a):
+        """Given a filter that adds color channels,
+        :func:`apply_to_region` should give the rest of the image the
+        same value in each channel.
+        """
+        kwargs = {'white': '#FF0000', 'black': '#0000FF'}
+        fn = f.filter_colorize
+        result = p.apply_to_region(fn, a, (1, 1, 3, 3), **kwargs)
+        expected = np.repeat(a[..., np.newaxis], 3, axis=-1)
+        expected[1:3, 1:3] = f.filter_colorize(a, **kwargs)[1:3, 1:3]
+        assert result.shape == (5, 5, 3)
+        assert (result == expected).all()
+
+    def test_changes_shape(self, a):
+        """Given a filter that changes the shape of the image data,
+        :func:`apply_to_region` should raise a :class:`ValueError`.
+        """
+        with pt.raises(ValueError, match='changed the shape'):
+            p.apply_to_region(f.filter_grow, a, (1, 1, 3, 3), factor=2)
+
+
+class TestIncrementalPipeline:
+    @pt.fixture
+    def pipeline(self):
+        """A pipeline of filters with halos."""
+        yield p.Pipeline.from_spec([
+            {'filter': 'gaussian_blur', 'sigma': 1.5},
+            {'filter': 'box_blur', 'size': 3},
+            {'filter': 'motion_blur', 'amount': 4, 'axis': f.X},
+        ])
+
+    @pt.fixture
+    def image(self):
+        """Random image data for testing."""
+        yield np.random.default_rng(0).random((2, 48, 64))
+
+    def test_diff(self, pipeline, image):
+        """Given changed image data, an :class:`IncrementalPipeline`
+        should only recompute the part of the result the change
+        affects and give the same result as the pipeline.
+        """
+        incremental = p.IncrementalPipeline(pipeline)
+        incremental(image)
+        image[1, 20:22, 30:33] = 0.5
+        result = incremental(image)
+        assert np.allclose(result, pipeline(image))
+        top, left, bottom, right = incremental.last_region
+        assert 0 < top and bottom < 48
+        assert 0 < left and right < 64
+
+    def test_dirty(self, pipeline, image):
+        """Given the dirty region, an :class:`IncrementalPipeline`
+        should recompute the part of the result that region affects.
+        """
+        incremental = p.IncrementalPipeline(pipeline)
+        incremental(image)
+        image[0, 0:4, 60:64] = 1.0
+        result = incremental(image, dirty=(0, 60, 4, 64))
+        assert np.allclose(result, pipeline(image))
+        halo = sum(step.halo for step in pipeline)
+        assert incremental.last_region == (0, 60 - halo, 4 + halo, 64)
+
+    def test_unchanged(self, pipeline, image):
+        """Given the same image data, an :class:`IncrementalPipeline`
+        should not recompute anything.
+        """
+        incremental = p.IncrementalPipeline(pipeline)
+        first = incremental(image)
+        second = incremental(image.copy())
+        assert incremental.last_region is None
+        assert (first == second).all()
+
+    def test_no_halo(self, image):
+        """Given a pipeline with a step that doesn't declare its halo,
+        an :class:`IncrementalPipeline` should apply the whole
+        pipeline.
+        """
+        pipeline = p.Pipeline([p.Step('twirl', radius=20, strength=1)])
+        incremental = p.IncrementalPipeline(pipeline)
+        incremental(image)
+        image[0, 0, 0] = 1.0
+        result = incremental(image)
+        assert incremental.last_region == (0, 0, 48, 64)
+        assert (result == pipeline(image)).all()
+
+    def test_changed_steps(self, pipeline, image):
+        """Given that the steps of the pipeline changed, an
+        :class:`IncrementalPipeline` should apply the whole pipeline.
+        """
+        incremental = p.IncrementalPipeline(pipeline)
+        incremental(image)
+        pipeline.steps[1].kwargs['size'] = 5
+        result = incremental(image)
+        assert incremental.last_region == (0, 0, 48, 64)
+        assert (result == pipeline(image)).all()
+
+
+class TestStep:
+    @pt.mark.parametrize('name,kwargs', [
+        ('gaussian_blur', {'sigma': 0}),
+        ('pinch', {'amount': 0, 'radius': 2, 'scale': (1, 1)}),
+        ('ripple', {'wave': (2, 2), 'amp': (0, 0), 'distaxis': (f.X, f.Y)}),
+        ('skew', {'slope': 0}),
+        ('twirl', {'radius': 2, 'strength': 0}),
+        ('contrast', {}),
+    ])
+    def test_identity(self, name, kwargs, a):
+        """Given parameters that don't change the image data, a
+        :class:`Step` should return the given image data without
+        applying the filter.
+        """
+        step = p.Step(name, **kwargs)
+        assert step.is_identity(a)
+        assert step(a) is a
+
+    def test_identity_matches_filter(self, a):
+        """The identity conditions should only be met when the filter
+        returns the image data unchanged.
+        """
+        blurred = f.filter_gaussian_blur(a, f.MIN_SIGMA)
+        assert np.allclose(blurred, a, rtol=0, atol=1e-20)
+        assert (f.filter_skew(a, 0) == a).all()
+        assert (f.filter_contrast(a) == a).all()
+
+    def test_identity_single_scan(self, a):
+        """The identity check of a contrast step should find the range
+        of the image data for the filter, so the step only scans the
+        image data once, and the second of two calls with different
+        data should not reuse the range of the first.
+        """
+        class Counted(np.ndarray):
+            scans = 0
+
+            def min(self, *args, **kwargs):
+                Counted.scans += 1
+                return super().min(*args, **kwargs)
+
+            def max(self, *args, **kwargs):
+                Counted.scans += 1
+                return super().max(*args, **kwargs)
+
+        step = p.Step('contrast', white=0.5)
+        counted = (a * 0.5).view(Counted)
+        result = step(counted)
+        assert Counted.scans == 2
+        assert np.allclose(result, f.filter_contrast(a, white=0.5))
+        assert np.allclose(step(a), f.filter_contrast(a, white=0.5))
+
+    @pt.mark.parametrize('name,kwargs', [
+        ('gaussian_blur', {'sigma': 0.5}),
+        ('contrast', {'white': 0.5}),
+        ('box_blur', {'size': 1}),
+    ])
+    def test_not_identity(self, name, kwargs, a):
+        """Given parameters that change the image data, or a filter
+        that declares no identity conditions, a :class:`Step` should
+        apply the filter.
+        """
+        step = p.Step(name, **kwargs)
+        assert not step.is_identity(a)
+        assert step(a) is not a
@@ -0,0 +1,112 @@
+"""
+test_settings
+~~~~~~~~~~~~~
+
+Unit tests for the imgfilt.settings module.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest as pt
+
+from imgfilt import settings as s
+
+
+# Test cases.
+class TestOverride:
+    def test_override(self):
+        """Given new values, :func:`override` should change the
+        settings within the context and restore them after.
+        """
+        with s.override(map_resolution=0.5) as new:
+            assert new.map_resolution == 0.5
+            assert s.get_settings() == new
+        assert s.get_settings() == s.Settings()
+
+    def test_invalid(self):
+        """Given an invalid value, :func:`override` should raise a
+        ValueError.
+        """
+        with pt.raises(ValueError):
+            with s.override(map_resolution=0):
+                pass
+
+    def test_quality(self):
+        """Given a quality, :func:`get_quality` should return it, and
+        otherwise return the `quality` setting.
+        """
+        with s.override(quality='cubic'):
+            assert s.get_quality() == 'cubic'
+            assert s.get_quality('nearest') == 'nearest'
+        with pt.raises(ValueError):
+            s.get_quality('best')
+        with pt.raises(ValueError):
+            s.configure(quality='best')
+
+    def test_invalid_gaussian_engine(self):
+        """Given an unknown gaussian engine, :func:`configure` should
+        raise a ValueError.
+        """
+        with pt.raises(ValueError):
+            s.configure(gaussian_engine='fast')
+
+    def test_thread(self):
+        """Changes made by :func:`override` in a thread should not
+        affect other threads.
+        """
+        def change():
+            with s.override(map_resolution=0.25):
+                results.append(s.get_settings().map_resolution)
+
+        results = []
+        thread = threading.Thread(target=change)
+        thread.start()
+        thread.join()
+        assert results == [0.25]
+        assert s.get_settings().map_resolution == 1.0
+
+
+class TestConfigure:
+    @pt.fixture(autouse=True)
+    def restore(self):
+        """Restore the default settings after each test."""
+        yield
+        s.configure(**s.Settings()._asdict())
+
+    def test_threads(self):
+        """Changes made by :func:`configure` should be seen by new
+        threads and threads in a pool.
+        """
+        def quality():
+            return s.get_settings().quality
+
+        s.configure(quality='nearest')
+        results = []
+        thread = threading.Thread(target=lambda: results.append(quality()))
+        thread.start()
+        thread.join()
+        with ThreadPoolExecutor(2) as executor:
+            results.extend(executor.map(lambda _: quality(), range(4)))
+        assert results == ['nearest'] * 5
+
+    def test_from_thread(self):
+        """Changes made by :func:`configure` in a thread should be
+        seen by the thread that started it.
+        """
+        thread = threading.Thread(
+            target=lambda: s.configure(map_resolution=0.25)
+        )
+        thread.start()
+        thread.join()
+        assert s.get_settings().map_resolution == 0.25
+
+    def test_override(self):
+        """Within :func:`override`, the overridden settings should be
+        used rather than the defaults set by :func:`configure`, and
+        the defaults should be used again after.
+        """
+        with s.override(quality='cubic'):
+            s.configure(quality='nearest', map_resolution=0.5)
+            assert s.get_settings().quality == 'cubic'
+        assert s.get_settings().quality == 'nearest'
+        assert s.get_settings().map_resolution == 0.5
@@ -0,0 +1,96 @@
+"""
+test_sharedmem
+~~~~~~~~~~~~~~
+
+Unit tests for the imgfilt.sharedmem module.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest as pt
+
+from imgfilt import imgfilt as f
+from imgfilt import settings
+from imgfilt import sharedmem as sm
+
+
+# Fixtures.
+@pt.fixture
+def video_4_5_5():
+    """An array of video data for testing."""
+    rng = np.random.default_rng(1138)
+    yield rng.random((4, 5, 5))
+
+
+# Test cases.
+class TestSharedArray:
+    def test_attach(self, video_4_5_5):
+        """Given the spec of a :class:`SharedArray`, :func:`attach`
+        should return a view of the same memory.
+        """
+        with sm.SharedArray.from_array(video_4_5_5) as shared:
+            shm, view = sm.attach(shared.spec)
+            view[0, 0, 0] = 2.0
+            assert shared.array[0, 0, 0] == 2.0
+            assert (shared.array[1:] == video_4_5_5[1:]).all()
+            del view
+            shm.close()
+
+
+class TestMapFrames:
+    def test_map_frames(self, video_4_5_5):
+        """Given a function, image data, and a number of processes,
+        :func:`map_frames` should apply the function to each frame
+        of the image data.
+        """
+        result = sm.map_frames(
+            f.filter_box_blur, video_4_5_5, size=2, processes=2
+        )
+        assert (result == f.filter_box_blur(video_4_5_5, size=2)).all()
+
+    def test_no_frames(self):
+        """Given image data with no frames, :func:`map_frames` should
+        return an empty result without calling the function.
+        """
+        a = np.zeros((0, 5, 5))
+        result = sm.map_frames(f.filter_inverse, a, processes=2)
+        assert result.shape == (0, 5, 5)
+        out = np.zeros((0, 5, 5))
+        assert sm.map_frames(f.filter_inverse, a, processes=2, out=out) is out
+
+    def test_map_frames_shared_out(self, video_4_5_5):
+        """Given shared input, a shared output, and an executor,
+        :func:`map_frames` should write the result into the output.
+        """
+        with ProcessPoolExecutor(2) as executor:
+            with sm.SharedArray.from_array(video_4_5_5) as src:
+                with sm.SharedArray(video_4_5_5.shape, float) as dst:
+                    result = sm.map_frames(
+                        f.filter_inverse, src, processes=executor, out=dst
+                    )
+                    assert result is dst.array
+                    assert (result == 1 - video_4_5_5).all()
+
+    def test_filter_processes(self, video_4_5_5):
+        """Filters that process by frame should spread the frames
+        across processes when passed a number of processes.
+        """
+        kwargs = {
+            'wave': (0, 2, 2),
+            'amp': (0, 1, 1),
+            'distaxis': (0, f.X, f.Y),
+        }
+        expected = f.filter_ripple(video_4_5_5, **kwargs)
+        result = f.filter_ripple(video_4_5_5, processes=2, **kwargs)
+        assert (result == expected).all()
+
+    def test_settings(self, video_4_5_5):
+        """Workers started by :func:`map_frames` should use the
+        settings of the calling process.
+        """
+        kwargs = {'radius': 4, 'strength': 1.0}
+        with settings.override(map_resolution=0.5):
+            expected = f.filter_twirl(video_4_5_5, **kwargs)
+            result = f.filter_twirl(video_4_5_5, processes=2, **kwargs)
+        assert (result == expected).all()
+        assert not (result == f.filter_twirl(video_4_5_5, **kwargs)).all()
@@ -0,0 +1,93 @@
+"""
+test_temporal
+~~~~~~~~~~~~~
+"""
+import cv2
+import numpy as np
+import pytest as pt
+
+from imgfilt import imgfilt as f
+from imgfilt import settings
+from imgfilt import temporal as t
+
+
+# Fixtures.
+@pt.fixture
+def frames():
+    """A video with a different random frame every frame."""
+    rng = np.random.default_rng(0)
+    return rng.random((7, 3, 4))
+
+
+# Utility functions.
+def reference(frames, kernel):
+    """Filter along the Z axis with OpenCV."""
+    flat = frames.reshape(len(frames), -1)
+    kernel = np.asarray(kernel, float)
+    result = cv2.sepFilter2D(flat, -1, np.ones(1), kernel)
+    return result.reshape(frames.shape)
+
+
+# Tests.
+class TestBoxFrames:
+    @pt.mark.parametrize('size', [1, 2, 3, 6, 9])
+    def test_box_frames(self, frames, size):
+        """Given frames and a size, :func:`box_frames` should average
+        each frame with the frames around it.
+        """
+        result = np.array(list(t.box_frames(frames, size)))
+        assert np.allclose(result, reference(frames, np.ones(size) / size))
+
+    def test_box_frames_long(self):
+        """Given a long video that starts with very bright frames,
+        :func:`box_frames` should not let rounding errors in its
+        running sum build up, and should match
+        :func:`imgfilt.filter_box_blur` along the Z axis.
+        """
+        column = np.random.default_rng(0).random((5000, 1))
+        column[:10] = 1e15
+        expected = f.filter_box_blur(column, 5)
+        result = np.array(list(t.box_frames(column[:, None], 5)))
+        assert np.allclose(result[20:, 0], expected[20:], rtol=0, atol=1e-9)
+
+    def test_box_frames_generator(self, frames):
+        """Given a generator of frames, :func:`box_frames` should only
+        read the frames it needs to yield each frame.
+        """
+        read = []
+
+        def gen():
+            for frame in frames:
+                read.append(frame)
+                yield frame
+
+        result = t.box_frames(gen(), 3)
+        next(result)
+        assert len(read) == 2
+
+
+class TestConvolveFrames:
+    def test_convolve_frames(self, frames):
+        """Given frames and a kernel, :func:`convolve_frames` should
+        convolve the frames with the kernel.
+        """
+        kernel = [0.1, 0.2, 0.3, 0.4]
+        result = np.array(list(t.convolve_frames(frames, kernel)))
+        assert np.allclose(result, reference(frames, kernel))
+
+
+class TestGaussianFrames:
+    @pt.mark.parametrize('engine,sigma,atol', [
+        ('exact', 1.5, 1e-8),
+        ('box', 2, 0.05),
+    ])
+    def test_gaussian_frames(self, frames, engine, sigma, atol):
+        """Given frames and a sigma, :func:`gaussian_frames` should
+        blur the frames with a gaussian using the engine set in
+        the settings.
+        """
+        size = int(round(sigma * 8 + 1)) | 1
+        kernel = cv2.getGaussianKernel(size, sigma, cv2.CV_64F)[:, 0]
+        with settings.override(gaussian_engine=engine):
+            result = np.array(list(t.gaussian_frames(frames, sigma)))
+        assert np.allclose(result, reference(frames, kernel), atol=atol)
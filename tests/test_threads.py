@@ -0,0 +1,131 @@
+"""
+test_threads
+~~~~~~~~~~~~
+
+Unit tests for the imgfilt.threads module.
+"""
+import os
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from threading import Event, Thread
+
+import cv2
+import numpy as np
+import pytest as pt
+
+from imgfilt import sharedmem as sm
+from imgfilt import threads as th
+
+
+# Utility functions.
+def cv2_threads(frame):
+    """Fill a frame with the number of threads OpenCV may use."""
+    return np.full(frame.shape, cv2.getNumThreads())
+
+
+# Test cases.
+class TestThreadPolicy:
+    def test_share(self):
+        """Given a budget and a number of jobs, :class:`ThreadPolicy`
+        should give each job an equal share of the budget, and split
+        that share between worker processes.
+        """
+        policy = th.ThreadPolicy(budget=32, jobs=4)
+        assert policy.share == 8
+        assert policy.split(3) == 2
+        assert policy.split(16) == 1
+        assert th.ThreadPolicy(budget=2, jobs=4).share == 1
+
+
+class TestThreads:
+    def test_threads(self):
+        """Given a budget and a number of jobs, :func:`threads` should
+        set the number of threads OpenCV may use within the context
+        and restore the previous policy after.
+        """
+        previous = th.get_policy()
+        with th.threads(budget=6, jobs=2) as policy:
+            assert th.get_policy() == policy == th.ThreadPolicy(6, 2)
+            assert cv2.getNumThreads() == 3
+            assert th.thread_counts()['cv2'] == 3
+            with th.threads(jobs=3):
+                assert cv2.getNumThreads() == 2
+            assert cv2.getNumThreads() == 3
+        assert th.get_policy() == previous
+        assert cv2.getNumThreads() == previous.share
+
+    def test_threads_overlap(self):
+        """Given blocks in different threads that overlap,
+        :func:`threads` should keep the policy of the block still
+        open when the first ends, and restore the previous policy
+        when the last ends.
+        """
+        previous = th.get_policy()
+        entered, release = Event(), Event()
+
+        def other():
+            with th.threads(budget=6, jobs=2):
+                entered.set()
+                release.wait(5)
+
+        thread = Thread(target=other)
+        with th.threads(budget=8, jobs=1):
+            thread.start()
+            entered.wait(5)
+            assert cv2.getNumThreads() == 3
+        assert th.get_policy() == th.ThreadPolicy(6, 2)
+        assert cv2.getNumThreads() == 3
+        release.set()
+        thread.join()
+        assert th.get_policy() == previous
+        assert cv2.getNumThreads() == previous.share
+
+    def test_invalid(self):
+        """Given a budget or number of jobs below one, :func:`threads`
+        should raise a ValueError and leave the policy alone.
+        """
+        previous = th.get_policy()
+        with pt.raises(ValueError):
+            with th.threads(budget=0):
+                pass
+        with pt.raises(ValueError):
+            th.set_policy(jobs=0)
+        assert th.get_policy() == previous
+
+    def test_workers(self):
+        """Worker processes started by
+        :func:`imgfilt.sharedmem.map_frames` should split the job's
+        share of threads between them, and no more workers should be
+        started than the job's share.
+        """
+        a = np.zeros((9, 2, 2))
+        with th.threads(budget=8, jobs=2):
+            result = sm.map_frames(cv2_threads, a, processes=2)
+            assert (result[1:] == 2).all()
+            result = sm.map_frames(cv2_threads, a, processes=8)
+            assert (result[1:] == 1).all()
+            assert cv2.getNumThreads() == 4
+
+    def test_executor_workers(self):
+        """Given an executor, workers started by
+        :func:`imgfilt.sharedmem.map_frames` should split the job's
+        share of threads by the executor's number of workers.
+        """
+        a = np.zeros((9, 2, 2))
+        with th.threads(budget=8, jobs=1):
+            with ProcessPoolExecutor(4) as executor:
+                result = sm.map_frames(cv2_threads, a, processes=executor)
+        assert (result[1:] == 2).all()
+
+    def test_environment(self):
+        """Given the `IMGFILT_THREADS` and `IMGFILT_JOBS` environment
+        variables, importing imgfilt should apply their policy.
+        """
+        env = {**os.environ, 'IMGFILT_THREADS': '12', 'IMGFILT_JOBS': '4'}
+        code = 'import imgfilt, cv2; print(cv2.getNumThreads())'
+        result = subprocess.run(
+            [sys.executable, '-c', code],
+            env=env, capture_output=True, text=True, check=True
+        )
+        assert result.stdout.strip() == '3'
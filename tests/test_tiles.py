@@ -0,0 +1,69 @@
+"""
+test_tiles
+~~~~~~~~~~
+
+Unit tests for the imgfilt.tiles module.
+"""
+import numpy as np
+import pytest as pt
+
+import imgfilt as f
+from imgfilt import tiles as t
+
+
+# Fixtures.
+@pt.fixture
+def image():
+    """Image data with a flat background and a noisy patch."""
+    a = np.full((2, 70, 90), 0.25)
+    a[:, 20:40, 30:50] = np.random.default_rng(0).random((2, 20, 20))
+    yield a
+
+
+# Test cases.
+class TestTiledEngine:
+    @pt.mark.parametrize('name,kwargs', [
+        ('box_blur', {'size': 5}),
+        ('colorize', {'white': '#FF0000', 'black': '#0000FF'}),
+        ('gaussian_blur', {'sigma': 2}),
+        ('gaussian_blur_3d', {'sigma': 1.5}),
+        ('glow', {'sigma': 3}),
+        ('motion_blur', {'amount': 4, 'axis': f.X}),
+        ('motion_blur', {'amount': 2, 'axis': f.Z}),
+    ])
+    def test_apply(self, name, kwargs, image):
+        """Given a filter with a halo, :meth:`TiledEngine.apply`
+        should give the same result as the filter and skip the flat
+        tiles.
+        """
+        engine = t.TiledEngine(tile=16)
+        result = engine.apply(f.filters[name], image, **kwargs)
+        assert np.allclose(result, f.filters[name](image, **kwargs))
+        assert 0 < engine.skipped_fraction < 1
+
+    def test_no_skip(self, image):
+        """Given `skip_constant` is false, :meth:`TiledEngine.apply`
+        should filter every tile.
+        """
+        engine = t.TiledEngine(tile=16, skip_constant=False)
+        result = engine.apply(f.filter_box_blur, image, size=3)
+        assert np.allclose(result, f.filter_box_blur(image, 3))
+        assert engine.skipped_fraction == 0
+
+    def test_flat(self):
+        """Given flat image data, :meth:`TiledEngine.apply` should
+        skip every tile.
+        """
+        a = np.full((1, 40, 40), 0.5)
+        engine = t.TiledEngine(tile=16)
+        result = engine.apply(f.filter_glow, a, sigma=4)
+        assert (result == f.filter_glow(a, 4)).all()
+        assert engine.skipped_fraction == 1
+
+    def test_no_halo(self, image):
+        """Given a filter that doesn't declare a halo,
+        :meth:`TiledEngine.apply` should raise a :class:`ValueError`.
+        """
+        engine = t.TiledEngine()
+        with pt.raises(ValueError, match='cannot be applied in tiles'):
+            engine.apply(f.filter_twirl, image, radius=4, strength=1)
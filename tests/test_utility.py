@@ -4,7 +4,11 @@ test_utility
 
 Unit tests for the imgfilt.utility module.
 """
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
+import pytest as pt
 
 from imgfilt import utility as u
 
@@ -23,6 +27,81 @@ def test_get_prefixed_functions():
     }
 
 
+def test_handles_channels():
+    """Given a batch and three-dimensional image data, a filter
+    marked with :func:`handles_channels` should be passed groups of
+    frames as the channels of an image.
+    """
+    shapes = []
+
+    @u.processes_by_grayscale_frame
+    @u.handles_channels(lambda **_: u.MAX_CHANNELS)
+    def spam(a):
+        shapes.append(a.shape)
+        return a + 1
+
+    a = np.zeros((5, 2, 3))
+    result = spam(a, batch=2)
+    assert shapes == [(2, 3, 2), (2, 3, 2), (2, 3, 1)]
+    assert (result == 1).all()
+    assert result.shape == a.shape
+
+
+def test_handles_channels_limit():
+    """Given a batch larger than the number of channels the filter
+    can take for its parameters, a filter marked with
+    :func:`handles_channels` should be passed groups no larger than
+    that number.
+    """
+    shapes = []
+
+    @u.processes_by_grayscale_frame
+    @u.handles_channels(lambda size, eggs=3, **_: size + eggs)
+    def spam(a, size, eggs=3):
+        shapes.append(a.shape)
+        return a
+
+    a = np.zeros((5, 2, 3))
+    spam(a, 1, batch=True)
+    assert shapes == [(2, 3, 4), (2, 3, 1)]
+    shapes.clear()
+    spam(a, 1, batch=4, eggs=1)
+    assert shapes == [(2, 3, 2), (2, 3, 2), (2, 3, 1)]
+
+
+def test_shared_cache():
+    """Given many threads calling a function with the same arguments
+    at once, :func:`shared_cache` should build the result once and
+    give every thread that result.
+    """
+    calls = []
+    started = threading.Barrier(8)
+
+    @u.shared_cache(maxsize=4)
+    def spam(size):
+        calls.append(size)
+        return np.zeros(size)
+
+    def call(size):
+        started.wait()
+        return spam(size)
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(call, [3] * 4 + [5] * 4))
+    assert sorted(calls) == [3, 5]
+    assert all(result is results[0] for result in results[:4])
+    assert all(result is results[4] for result in results[4:])
+    assert spam.cache_info().currsize == 2
+
+
+def test_colors_read_only():
+    """:data:`COLORS` should not be changeable, so it can be shared
+    between threads.
+    """
+    with pt.raises(TypeError):
+        u.COLORS['spam'] = u.COLORS['a']
+
+
 def test_will_square():
     """Given an array with the X axis having a different size
     than the Y axis, :func:`will_square` should make the size
@@ -43,3 +122,88 @@ def test_will_square():
         [0.0, 1.0, 1.0, 1.0, 0.0,],
         [0.0, 1.0, 1.0, 1.0, 0.0,],
     ], dtype=float)).all()
+
+
+@pt.mark.parametrize('quality,taps', [
+    ('nearest', 1), ('linear', 2), ('cubic', 4), ('lanczos', 8),
+])
+def test_resampling_weights(quality, taps):
+    """Given a size, factor, and quality, :func:`resampling_weights`
+    should return the indices of the original positions around each
+    new position, kept within the array, and weights that sum to one.
+    """
+    indices, weights = u.resampling_weights(5, 2.5, quality)
+    assert indices.shape == weights.shape == (12, taps)
+    assert indices.min() == 0
+    assert indices.max() == 4
+    assert np.allclose(weights.sum(axis=1), 1)
+
+
+def test_resample_matches_trilinear():
+    """Given linear quality, :func:`resample` should give the same
+    result as :func:`trilinear_interpolation`.
+    """
+    a = np.random.default_rng(0).random((3, 4, 5))
+    result = u.resample(a, 1.5, 'linear')
+    assert np.allclose(result, u.trilinear_interpolation(a, 1.5))
+
+
+@pt.mark.parametrize('shape', [(7,), (5, 6), (3, 4, 5)])
+@pt.mark.parametrize('factor', [2, 3])
+def test_grow_whole(shape, factor):
+    """Given a whole number factor, :func:`grow_whole` should give the
+    same result as :func:`resample`.
+    """
+    a = np.random.default_rng(0).random(shape)
+    for quality in 'nearest', 'linear':
+        result = u.grow_whole(a, factor, quality)
+        assert np.allclose(result, u.resample(a, factor, quality))
+
+
+@pt.mark.parametrize('quality', ['nearest', 'linear'])
+def test_grow_whole_channels(quality):
+    """Given color video, :func:`grow_whole` and :func:`resample`
+    should grow the frames, rows, and columns, but not the color
+    channels, like :func:`trilinear_interpolation`.
+    """
+    a = np.random.default_rng(0).random((2, 8, 8, 3))
+    result = u.grow_whole(a, 2, quality)
+    assert result.shape == (4, 16, 16, 3)
+    assert np.allclose(result, u.resample(a, 2, quality))
+    for channel in range(3):
+        expected = u.grow_whole(a[..., channel], 2, quality)
+        assert np.allclose(result[..., channel], expected)
+    if quality == 'linear':
+        assert np.allclose(result, u.trilinear_interpolation(a, 2))
+
+
+def test_grow_whole_invalid_quality():
+    """Given a quality other than nearest or linear,
+    :func:`grow_whole` should raise a :class:`ValueError`.
+    """
+    with pt.raises(ValueError):
+        u.grow_whole(np.zeros((2, 2)), 2, 'cubic')
+
+
+def test_interpolation_plan():
+    """Given a shape and factor, :func:`interpolation_plan` should
+    return a cached plan that resizes those axes of an array and
+    leaves any axes after them unchanged.
+    """
+    plan = u.interpolation_plan((3, 4, 5), 1.5)
+    assert u.interpolation_plan((3, 4, 5), 1.5) is plan
+    a = np.random.default_rng(0).random((3, 4, 5, 3))
+    result = plan(a)
+    assert result.shape == (*plan.new_shape, 3)
+    for channel in range(3):
+        expected = u.trilinear_interpolation(a[..., channel], 1.5)
+        assert (result[..., channel] == expected).all()
+
+
+def test_interpolation_plan_wrong_shape():
+    """Given an array of a different shape, a
+    :class:`InterpolationPlan` should raise a :class:`ValueError`.
+    """
+    plan = u.InterpolationPlan((3, 4), 2)
+    with pt.raises(ValueError, match='cannot resize'):
+        plan(np.zeros((4, 3)))